@@ -0,0 +1,49 @@
+"""003_fleet_counters
+
+Add the fleet_counters read model backing the dashboard KPIs, seeded from
+the source tables with the same counts as ``count_from_source``
+
+Revision ID: 003_fleet_counters
+Revises: 002_automation
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "003_fleet_counters"
+down_revision = "002_automation"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ── fleet_counters ─────────────────────────────────────────────────────
+    op.create_table(
+        "fleet_counters",
+        sa.Column("key", sa.String(100), primary_key=True),
+        sa.Column("value", sa.Numeric(16, 2), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False,
+                  server_default=sa.text("NOW()")),
+    )
+
+    # Seed before any write path can add a lone delta to an empty model
+    op.execute("""
+        INSERT INTO fleet_counters (key, value)
+        SELECT 'vehicles.' || LOWER(status::text), COUNT(*) FROM vehicles GROUP BY status
+        UNION ALL SELECT 'vehicles.total', COUNT(*) FROM vehicles
+        UNION ALL SELECT 'drivers.' || LOWER(status::text), COUNT(*) FROM drivers GROUP BY status
+        UNION ALL SELECT 'drivers.total', COUNT(*) FROM drivers
+        UNION ALL SELECT 'trips.' || LOWER(status::text), COUNT(*) FROM trips GROUP BY status
+        UNION ALL SELECT 'trips.total', COUNT(*) FROM trips
+        UNION ALL SELECT 'drivers.safety_score_sum', COALESCE(SUM(safety_score), 0) FROM drivers
+        UNION ALL SELECT 'trips.on_time', COUNT(*) FROM trips
+            WHERE status = 'COMPLETED' AND actual_arrival <= scheduled_arrival
+        UNION ALL SELECT 'fuel.total_cost', COALESCE(SUM(total_cost), 0) FROM fuel_logs
+        UNION ALL SELECT 'maintenance.total_cost', COALESCE(SUM(cost), 0) FROM maintenance_logs
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("fleet_counters")
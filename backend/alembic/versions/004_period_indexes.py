@@ -0,0 +1,30 @@
+"""004_period_indexes
+
+Composite (vehicle_id, date) indexes for the half-open month-range cost queries
+
+Revision ID: 004_period_indexes
+Revises: 003_fleet_counters
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+# revision identifiers
+revision = "004_period_indexes"
+down_revision = "003_fleet_counters"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_fuel_logs_vehicle_date", "fuel_logs", ["vehicle_id", "date"])
+    op.create_index("ix_maintenance_logs_vehicle_scheduled", "maintenance_logs", ["vehicle_id", "scheduled_date"])
+    op.create_index("ix_maintenance_logs_scheduled_date", "maintenance_logs", ["scheduled_date"])
+    op.create_index("ix_trips_vehicle_scheduled", "trips", ["vehicle_id", "scheduled_departure"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_trips_vehicle_scheduled", table_name="trips")
+    op.drop_index("ix_maintenance_logs_scheduled_date", table_name="maintenance_logs")
+    op.drop_index("ix_maintenance_logs_vehicle_scheduled", table_name="maintenance_logs")
+    op.drop_index("ix_fuel_logs_vehicle_date", table_name="fuel_logs")
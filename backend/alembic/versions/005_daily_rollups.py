@@ -0,0 +1,53 @@
+"""005_daily_rollups
+
+Add per-day vehicle and driver rollup tables for analytics time series
+
+Revision ID: 005_daily_rollups
+Revises: 004_period_indexes
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "005_daily_rollups"
+down_revision = "004_period_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ── daily_vehicle_rollups ──────────────────────────────────────────────
+    op.create_table(
+        "daily_vehicle_rollups",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("vehicle_id", sa.String(36), primary_key=True),
+        sa.Column("distance_km", sa.Float, nullable=False, server_default="0"),
+        sa.Column("fuel_liters", sa.Float, nullable=False, server_default="0"),
+        sa.Column("fuel_cost", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("maintenance_cost", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("trip_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False,
+                  server_default=sa.text("NOW()")),
+    )
+    op.create_index("ix_daily_vehicle_rollups_vehicle_day", "daily_vehicle_rollups", ["vehicle_id", "day"])
+
+    # ── daily_driver_rollups ───────────────────────────────────────────────
+    op.create_table(
+        "daily_driver_rollups",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("driver_id", sa.String(36), primary_key=True),
+        sa.Column("distance_km", sa.Float, nullable=False, server_default="0"),
+        sa.Column("fuel_liters", sa.Float, nullable=False, server_default="0"),
+        sa.Column("trip_cost", sa.Numeric(14, 2), nullable=False, server_default="0"),
+        sa.Column("trip_count", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False,
+                  server_default=sa.text("NOW()")),
+    )
+    op.create_index("ix_daily_driver_rollups_driver_day", "daily_driver_rollups", ["driver_id", "day"])
+
+
+def downgrade() -> None:
+    op.drop_table("daily_driver_rollups")
+    op.drop_table("daily_vehicle_rollups")
@@ -0,0 +1,31 @@
+"""006_license_monitor
+
+Index drivers.license_expiry for the set-based license monitor and record
+rows scanned per automation run
+
+Revision ID: 006_license_monitor
+Revises: 005_daily_rollups
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "006_license_monitor"
+down_revision = "005_daily_rollups"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_drivers_license_expiry", "drivers", ["license_expiry"])
+    op.add_column(
+        "automation_logs",
+        sa.Column("records_scanned", sa.Integer, nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("automation_logs", "records_scanned")
+    op.drop_index("ix_drivers_license_expiry", table_name="drivers")
@@ -0,0 +1,31 @@
+"""007_maintenance_service_index
+
+Index (vehicle_id, status, odometer_at_service DESC) so the maintenance
+monitor can find each vehicle's latest completed service with one lateral
+index probe
+
+Revision ID: 007_maintenance_service_index
+Revises: 006_license_monitor
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "007_maintenance_service_index"
+down_revision = "006_license_monitor"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_maintenance_logs_vehicle_status_odometer",
+        "maintenance_logs",
+        ["vehicle_id", "status", sa.text("odometer_at_service DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_maintenance_logs_vehicle_status_odometer", table_name="maintenance_logs")
@@ -0,0 +1,49 @@
+"""008_vehicle_fuel_buckets
+
+Add per-vehicle daily fuel/distance buckets for the streaming fuel anomaly
+check, seeded with the trailing 90 days of fuel logs and completed trips
+
+Revision ID: 008_vehicle_fuel_buckets
+Revises: 007_maintenance_service_index
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "008_vehicle_fuel_buckets"
+down_revision = "007_maintenance_service_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "vehicle_fuel_buckets",
+        sa.Column("vehicle_id", sa.String(36), primary_key=True),
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("fuel_liters", sa.Float, nullable=False, server_default="0"),
+        sa.Column("distance_km", sa.Float, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime, nullable=False,
+                  server_default=sa.text("NOW()")),
+    )
+
+    op.execute("""
+        INSERT INTO vehicle_fuel_buckets (vehicle_id, day, fuel_liters, distance_km)
+        SELECT vehicle_id, day, SUM(litres), SUM(km)
+        FROM (
+            SELECT vehicle_id, date AS day, quantity_liters AS litres, 0 AS km
+            FROM fuel_logs
+            WHERE date >= CURRENT_DATE - 89
+            UNION ALL
+            SELECT vehicle_id, actual_departure::date, 0, distance_km
+            FROM trips
+            WHERE status = 'COMPLETED' AND actual_departure >= CURRENT_DATE - 89
+        ) AS recent
+        GROUP BY vehicle_id, day
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("vehicle_fuel_buckets")
@@ -0,0 +1,38 @@
+"""009_event_outbox
+
+Turn domain_events into a transactional outbox: delivery status, attempt
+count, next-claim time, completed handlers and last error, plus a
+(status, available_at) index for the workers' SKIP LOCKED claim query
+
+Revision ID: 009_event_outbox
+Revises: 008_vehicle_fuel_buckets
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "009_event_outbox"
+down_revision = "008_vehicle_fuel_buckets"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows were delivered in-process when they were written
+    op.add_column("domain_events", sa.Column("status", sa.String(20), nullable=False, server_default="done"))
+    op.alter_column("domain_events", "status", server_default="pending")
+    op.add_column("domain_events", sa.Column("attempts", sa.Integer, nullable=False, server_default="0"))
+    op.add_column("domain_events", sa.Column("available_at", sa.DateTime, nullable=False,
+                                             server_default=sa.text("NOW()")))
+    op.add_column("domain_events", sa.Column("completed_handlers", sa.Text, nullable=True))
+    op.add_column("domain_events", sa.Column("last_error", sa.Text, nullable=True))
+    op.add_column("domain_events", sa.Column("processed_at", sa.DateTime, nullable=True))
+    op.create_index("ix_domain_events_status_available", "domain_events", ["status", "available_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_domain_events_status_available", table_name="domain_events")
+    for column in ("processed_at", "last_error", "completed_handlers", "available_at", "attempts", "status"):
+        op.drop_column("domain_events", column)
@@ -0,0 +1,45 @@
+"""010_event_payload_jsonb
+
+Store domain_events.payload as JSONB with a GIN (jsonb_path_ops) index for
+containment lookups by entity id, plus (event_type, created_at) for the
+event audit endpoint
+
+Revision ID: 010_event_payload_jsonb
+Revises: 009_event_outbox
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers
+revision = "010_event_payload_jsonb"
+down_revision = "009_event_outbox"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column(
+        "domain_events", "payload",
+        type_=postgresql.JSONB,
+        existing_nullable=False,
+        postgresql_using="payload::jsonb",
+    )
+    op.create_index(
+        "ix_domain_events_payload", "domain_events", ["payload"],
+        postgresql_using="gin", postgresql_ops={"payload": "jsonb_path_ops"},
+    )
+    op.create_index("ix_domain_events_type_created", "domain_events", ["event_type", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_domain_events_type_created", table_name="domain_events")
+    op.drop_index("ix_domain_events_payload", table_name="domain_events")
+    op.alter_column(
+        "domain_events", "payload",
+        type_=sa.Text,
+        existing_nullable=False,
+        postgresql_using="payload::text",
+    )
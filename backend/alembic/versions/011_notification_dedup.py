@@ -0,0 +1,37 @@
+"""011_notification_dedup
+
+Deduplicate repeated alerts: a dedup key (type, entity, rule) with a unique
+partial index that repeats upsert into, plus an occurrence counter and the
+time of the latest occurrence (the suppression window slides on it)
+
+Revision ID: 011_notification_dedup
+Revises: 010_event_payload_jsonb
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "011_notification_dedup"
+down_revision = "010_event_payload_jsonb"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("notifications", sa.Column("dedup_key", sa.String(255), nullable=True))
+    op.add_column("notifications", sa.Column("occurrence_count", sa.Integer, nullable=False, server_default="1"))
+    op.add_column("notifications", sa.Column("last_occurred_at", sa.DateTime, nullable=True))
+    op.execute("UPDATE notifications SET last_occurred_at = created_at")
+    op.alter_column("notifications", "last_occurred_at", nullable=False, server_default=sa.text("NOW()"))
+    op.create_index(
+        "uq_notifications_dedup_key", "notifications", ["dedup_key"],
+        unique=True, postgresql_where=sa.text("dedup_key IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_notifications_dedup_key", table_name="notifications")
+    for column in ("last_occurred_at", "occurrence_count", "dedup_key"):
+        op.drop_column("notifications", column)
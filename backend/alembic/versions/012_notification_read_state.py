@@ -0,0 +1,57 @@
+"""012_notification_read_state
+
+Per-user read state: a read watermark per user plus individual read
+exceptions after it. Existing global is_read flags are carried over: each
+user's watermark starts just before the oldest unread notification, and
+notifications read after that become exceptions
+
+Revision ID: 012_notification_read_state
+Revises: 011_notification_dedup
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "012_notification_read_state"
+down_revision = "011_notification_dedup"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "notification_read_state",
+        sa.Column("user_id", sa.String(36), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("read_through", sa.DateTime, nullable=False),
+        sa.Column("updated_at", sa.DateTime, nullable=False, server_default=sa.text("NOW()")),
+    )
+    op.create_table(
+        "notification_reads",
+        sa.Column("user_id", sa.String(36), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("notification_id", sa.String(36), sa.ForeignKey("notifications.id", ondelete="CASCADE"),
+                  primary_key=True),
+        sa.Column("read_at", sa.DateTime, nullable=False, server_default=sa.text("NOW()")),
+    )
+
+    op.execute("""
+        INSERT INTO notification_read_state (user_id, read_through)
+        SELECT u.id, COALESCE(
+            (SELECT MIN(created_at) FROM notifications WHERE is_read = false) - INTERVAL '1 microsecond',
+            (SELECT MAX(created_at) FROM notifications),
+            NOW()
+        )
+        FROM users u
+    """)
+    op.execute("""
+        INSERT INTO notification_reads (user_id, notification_id, read_at)
+        SELECT s.user_id, n.id, NOW()
+        FROM notification_read_state s
+        JOIN notifications n ON n.is_read = true AND n.created_at > s.read_through
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("notification_reads")
+    op.drop_table("notification_read_state")
@@ -0,0 +1,57 @@
+"""013_keyset_pagination_indexes
+
+Composite (sort column, id) indexes for the list endpoints, so offset pages
+and keyset cursors (WHERE (sort, id) < (:sort, :id) ORDER BY sort DESC, id
+DESC) are read straight off an index. Indexes that are a strict prefix of a
+new one are dropped.
+
+Revision ID: 013_keyset_pagination_indexes
+Revises: 012_notification_read_state
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+
+# revision identifiers
+revision = "013_keyset_pagination_indexes"
+down_revision = "012_notification_read_state"
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = [
+    ("ix_vehicles_created_id", "vehicles", ["created_at", "id"]),
+    ("ix_drivers_created_id", "drivers", ["created_at", "id"]),
+    ("ix_trips_scheduled_id", "trips", ["scheduled_departure", "id"]),
+    ("ix_fuel_logs_date_id", "fuel_logs", ["date", "id"]),
+    ("ix_fuel_logs_vehicle_date_id", "fuel_logs", ["vehicle_id", "date", "id"]),
+    ("ix_maintenance_logs_scheduled_id", "maintenance_logs", ["scheduled_date", "id"]),
+    ("ix_maintenance_logs_vehicle_scheduled_id", "maintenance_logs", ["vehicle_id", "scheduled_date", "id"]),
+    ("ix_notifications_created_id", "notifications", ["created_at", "id"]),
+    ("ix_notifications_type_created_id", "notifications", ["type", "created_at", "id"]),
+    ("ix_automation_logs_ran_id", "automation_logs", ["ran_at", "id"]),
+    ("ix_automation_logs_job_ran_id", "automation_logs", ["job_name", "ran_at", "id"]),
+]
+
+SUPERSEDED = [
+    ("ix_fuel_logs_date", "fuel_logs", ["date"]),
+    ("ix_fuel_logs_vehicle_date", "fuel_logs", ["vehicle_id", "date"]),
+    ("ix_maintenance_logs_scheduled_date", "maintenance_logs", ["scheduled_date"]),
+    ("ix_maintenance_logs_vehicle_scheduled", "maintenance_logs", ["vehicle_id", "scheduled_date"]),
+    ("ix_notifications_created_at", "notifications", ["created_at"]),
+    ("ix_automation_logs_ran_at", "automation_logs", ["ran_at"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in NEW_INDEXES:
+        op.create_index(name, table, columns)
+    for name, _, _ in SUPERSEDED:
+        # ix_fuel_logs_date came from the initial create_all, so may be absent
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def downgrade() -> None:
+    for name, table, columns in SUPERSEDED:
+        op.create_index(name, table, columns)
+    for name, table, _ in reversed(NEW_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,43 @@
+"""014_analytics_fleet_unique
+
+One fleet-wide analytics_summary row per month: a partial unique index on
+(period_year, period_month) WHERE vehicle_id IS NULL, which the cost ledger
+seeds through with ON CONFLICT DO NOTHING. Duplicate fleet rows left by
+earlier concurrent seeding are removed first, keeping the most recently
+updated one (the next cost recalculation re-sums it from the raw logs).
+
+Revision ID: 014_analytics_fleet_unique
+Revises: 013_keyset_pagination_indexes
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "014_analytics_fleet_unique"
+down_revision = "013_keyset_pagination_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        DELETE FROM analytics_summary
+        WHERE vehicle_id IS NULL
+          AND EXISTS (
+              SELECT 1 FROM analytics_summary newer
+              WHERE newer.vehicle_id IS NULL
+                AND newer.period_year = analytics_summary.period_year
+                AND newer.period_month = analytics_summary.period_month
+                AND (newer.updated_at, newer.id) > (analytics_summary.updated_at, analytics_summary.id)
+          )
+    """)
+    op.create_index(
+        "uq_analytics_fleet_period", "analytics_summary", ["period_year", "period_month"],
+        unique=True, postgresql_where=sa.text("vehicle_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_analytics_fleet_period", table_name="analytics_summary")
@@ -0,0 +1,30 @@
+"""015_rollup_dirty_days
+
+Days whose daily rollups a late write made stale, so the rollup job rebuilds
+them even outside its trailing lookback window
+
+Revision ID: 015_rollup_dirty_days
+Revises: 014_analytics_fleet_unique
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "015_rollup_dirty_days"
+down_revision = "014_analytics_fleet_unique"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "rollup_dirty_days",
+        sa.Column("day", sa.Date, primary_key=True),
+        sa.Column("marked_at", sa.DateTime, nullable=False, server_default=sa.text("NOW()")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("rollup_dirty_days")
@@ -0,0 +1,31 @@
+"""016_event_handler_receipts
+
+(event, handler) receipts written in the same transaction as a handler's
+writes, so redelivered events are not applied twice
+
+Revision ID: 016_event_handler_receipts
+Revises: 015_rollup_dirty_days
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = "016_event_handler_receipts"
+down_revision = "015_rollup_dirty_days"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "event_handler_receipts",
+        sa.Column("event_id", sa.String(36), sa.ForeignKey("domain_events.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("handler", sa.String(255), primary_key=True),
+        sa.Column("applied_at", sa.DateTime, nullable=False, server_default=sa.text("NOW()")),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("event_handler_receipts")
@@ -5,40 +5,51 @@ and stores precomputed values in analytics_summary.
 """
 
 import logging
-from datetime import datetime, date
+import uuid
+from datetime import datetime
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models.models import (
-    FuelLog, MaintenanceLog, Trip, AnalyticsSummary, Notification,
-    NotificationType, NotificationSeverity
-)
-from config import get_settings
+from database import dialect_insert
+from models.models import FuelLog, MaintenanceLog, Trip, AnalyticsSummary
+from automation.periods import in_month, month_of
+from automation.cost_ledger import summary_conflict_target
 
 logger = logging.getLogger(__name__)
-settings = get_settings()
 
 
-async def recalculate_vehicle_costs(db: AsyncSession, vehicle_id: str) -> AnalyticsSummary:
-    """Upsert monthly cost summary for a specific vehicle."""
-    now = datetime.utcnow()
-    year, month = now.year, now.month
-
-    # Fuel costs this month
-    fuel_cost = (await db.execute(
-        select(func.coalesce(func.sum(FuelLog.total_cost), 0)).where(
+async def recalculate_vehicle_costs(
+    db: AsyncSession,
+    vehicle_id: str,
+    year: int | None = None,
+    month: int | None = None,
+    *,
+    update_fleet: bool = True,
+) -> AnalyticsSummary:
+    """Upsert the monthly cost summary for a specific vehicle (default: current month).
+
+    Pass ``update_fleet=False`` when the caller recalculates the fleet-wide
+    row itself, e.g. once per batch in the recalc queue.
+    """
+    if year is None or month is None:
+        year, month = month_of(None)
+
+    # Fuel costs and litres this month
+    fuel_cost, total_litres = (await db.execute(
+        select(
+            func.coalesce(func.sum(FuelLog.total_cost), 0),
+            func.coalesce(func.sum(FuelLog.quantity_liters), 0),
+        ).where(
             FuelLog.vehicle_id == vehicle_id,
-            func.extract("year", FuelLog.date) == year,
-            func.extract("month", FuelLog.date) == month,
+            in_month(FuelLog.date, year, month),
         )
-    )).scalar() or 0
+    )).one()
 
     # Maintenance costs this month
     maint_cost = (await db.execute(
         select(func.coalesce(func.sum(MaintenanceLog.cost), 0)).where(
             MaintenanceLog.vehicle_id == vehicle_id,
-            func.extract("year", MaintenanceLog.scheduled_date) == year,
-            func.extract("month", MaintenanceLog.scheduled_date) == month,
+            in_month(MaintenanceLog.scheduled_date, year, month),
         )
     )).scalar() or 0
 
@@ -49,115 +60,97 @@ async def recalculate_vehicle_costs(db: AsyncSession, vehicle_id: str) -> Analyt
             func.coalesce(func.sum(Trip.distance_km), 0)
         ).where(
             Trip.vehicle_id == vehicle_id,
-            func.extract("year", Trip.scheduled_departure) == year,
-            func.extract("month", Trip.scheduled_departure) == month,
+            in_month(Trip.scheduled_departure, year, month),
         )
     )).one()
     trip_count, total_dist = trip_stats
 
     # Fuel efficiency (km / litre)
-    total_litres = (await db.execute(
-        select(func.coalesce(func.sum(FuelLog.quantity_liters), 0)).where(
-            FuelLog.vehicle_id == vehicle_id,
-            func.extract("year", FuelLog.date) == year,
-            func.extract("month", FuelLog.date) == month,
-        )
-    )).scalar() or 0
-
     efficiency = float(total_dist) / float(total_litres) if total_litres > 0 else 0
 
-    # Upsert
-    existing = (await db.execute(
-        select(AnalyticsSummary).where(
+    # Upsert (the ledger seeds the same row with ON CONFLICT from the routers)
+    total_cost = float(fuel_cost) + float(maint_cost)
+    stmt = dialect_insert(db)(AnalyticsSummary).values(
+        id=str(uuid.uuid4()),
+        period_year=year, period_month=month, vehicle_id=vehicle_id,
+        total_fuel_cost=float(fuel_cost),
+        total_maintenance_cost=float(maint_cost),
+        total_operational_cost=total_cost,
+        total_trips=trip_count,
+        total_distance_km=float(total_dist),
+        avg_fuel_efficiency=efficiency,
+        updated_at=datetime.utcnow(),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        **summary_conflict_target(vehicle_id),
+        set_={
+            column: stmt.excluded[column]
+            for column in (
+                "total_fuel_cost", "total_maintenance_cost", "total_operational_cost",
+                "total_trips", "total_distance_km", "avg_fuel_efficiency", "updated_at",
+            )
+        },
+    ))
+    await db.commit()
+    summary = (await db.execute(
+        select(AnalyticsSummary)
+        .where(
             AnalyticsSummary.period_year == year,
             AnalyticsSummary.period_month == month,
             AnalyticsSummary.vehicle_id == vehicle_id,
         )
-    )).scalar_one_or_none()
-
-    total_cost = float(fuel_cost) + float(maint_cost)
-    if existing:
-        existing.total_fuel_cost = float(fuel_cost)
-        existing.total_maintenance_cost = float(maint_cost)
-        existing.total_operational_cost = total_cost
-        existing.total_trips = trip_count
-        existing.total_distance_km = float(total_dist)
-        existing.avg_fuel_efficiency = efficiency
-        existing.updated_at = datetime.utcnow()
-        summary = existing
-    else:
-        summary = AnalyticsSummary(
-            period_year=year, period_month=month, vehicle_id=vehicle_id,
-            total_fuel_cost=float(fuel_cost),
-            total_maintenance_cost=float(maint_cost),
-            total_operational_cost=total_cost,
-            total_trips=trip_count,
-            total_distance_km=float(total_dist),
-            avg_fuel_efficiency=efficiency,
-        )
-        db.add(summary)
-
-    await db.commit()
-    await db.refresh(summary)
+        .execution_options(populate_existing=True)
+    )).scalar_one()
 
     # Update fleet-wide summary too
-    await recalculate_fleet_costs(db, year, month)
+    if update_fleet:
+        await recalculate_fleet_costs(db, year, month)
 
     return summary
 
 
-async def recalculate_fleet_costs(db: AsyncSession, year: int, month: int):
-    """Upsert the fleet-wide monthly cost row (vehicle_id = NULL)."""
+async def recalculate_fleet_costs(db: AsyncSession, year: int, month: int, alert: bool = True):
+    """Rebuild the fleet-wide monthly cost row (vehicle_id = NULL) from raw logs.
+
+    Day to day the row is kept current by the running ledger (cost_ledger);
+    this full re-sum is the repair path. ``alert=False`` skips the budget
+    threshold check, for rebuilds (event replay) that must not notify.
+    """
     fuel_cost = (await db.execute(
         select(func.coalesce(func.sum(FuelLog.total_cost), 0)).where(
-            func.extract("year", FuelLog.date) == year,
-            func.extract("month", FuelLog.date) == month,
+            in_month(FuelLog.date, year, month),
         )
     )).scalar() or 0
 
     maint_cost = (await db.execute(
         select(func.coalesce(func.sum(MaintenanceLog.cost), 0)).where(
-            func.extract("year", MaintenanceLog.scheduled_date) == year,
-            func.extract("month", MaintenanceLog.scheduled_date) == month,
+            in_month(MaintenanceLog.scheduled_date, year, month),
         )
     )).scalar() or 0
 
     total_cost = float(fuel_cost) + float(maint_cost)
 
-    existing = (await db.execute(
-        select(AnalyticsSummary).where(
-            AnalyticsSummary.period_year == year,
-            AnalyticsSummary.period_month == month,
-            AnalyticsSummary.vehicle_id.is_(None),
-        )
-    )).scalar_one_or_none()
-
-    if existing:
-        existing.total_fuel_cost = float(fuel_cost)
-        existing.total_maintenance_cost = float(maint_cost)
-        existing.total_operational_cost = total_cost
-        existing.updated_at = datetime.utcnow()
-    else:
-        db.add(AnalyticsSummary(
-            period_year=year, period_month=month, vehicle_id=None,
-            total_fuel_cost=float(fuel_cost),
-            total_maintenance_cost=float(maint_cost),
-            total_operational_cost=total_cost,
-        ))
+    stmt = dialect_insert(db)(AnalyticsSummary).values(
+        id=str(uuid.uuid4()),
+        period_year=year, period_month=month, vehicle_id=None,
+        total_fuel_cost=float(fuel_cost),
+        total_maintenance_cost=float(maint_cost),
+        total_operational_cost=total_cost,
+        updated_at=datetime.utcnow(),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        **summary_conflict_target(None),
+        set_={
+            "total_fuel_cost": stmt.excluded.total_fuel_cost,
+            "total_maintenance_cost": stmt.excluded.total_maintenance_cost,
+            "total_operational_cost": stmt.excluded.total_operational_cost,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
     await db.commit()
+    if not alert:
+        return
 
-    # Budget threshold check
-    if total_cost > settings.BUDGET_THRESHOLD_MONTHLY:
-        from automation.notification_helper import create_notification
-        await create_notification(
-            db,
-            type=NotificationType.FINANCIAL,
-            severity=NotificationSeverity.CRITICAL,
-            title="💸 Monthly Budget Threshold Exceeded",
-            message=(
-                f"Total operational cost for {year}-{month:02d} is "
-                f"₹{total_cost:,.2f}, exceeding the threshold of "
-                f"₹{settings.BUDGET_THRESHOLD_MONTHLY:,.2f}."
-            ),
-        )
-        logger.warning(f"[CostAggregator] Budget threshold exceeded: ₹{total_cost:,.2f}")
+    # Budget threshold check (reads the row just written)
+    from automation.cost_ledger import check_budget_threshold
+    await check_budget_threshold(db, year, month)
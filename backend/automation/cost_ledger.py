@@ -0,0 +1,162 @@
+"""FleetFlow – Running monthly cost ledger.
+
+Fuel and maintenance creates, updates and deletes apply signed deltas to
+the per-vehicle and fleet-wide analytics_summary rows with atomic
+``SET total = total + :delta`` statements, in the same transaction as the
+log change. Budget checks then read the running fleet total instead of
+re-summing raw logs.
+"""
+
+import logging
+import uuid
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import dialect_insert
+from models.models import (
+    FuelLog, MaintenanceLog, AnalyticsSummary, NotificationType, NotificationSeverity,
+)
+from automation.periods import in_month, month_of
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _summary_row(year: int, month: int, vehicle_id: str | None):
+    vehicle_clause = (
+        AnalyticsSummary.vehicle_id.is_(None) if vehicle_id is None
+        else AnalyticsSummary.vehicle_id == vehicle_id
+    )
+    return (
+        AnalyticsSummary.period_year == year,
+        AnalyticsSummary.period_month == month,
+        vehicle_clause,
+    )
+
+
+def summary_conflict_target(vehicle_id: str | None) -> dict:
+    """ON CONFLICT target for a vehicle's or the fleet's monthly row.
+
+    The fleet row (vehicle_id NULL) has its own partial unique index, since
+    NULLs never collide in the (year, month, vehicle_id) one.
+    """
+    if vehicle_id is None:
+        return {
+            "index_elements": [AnalyticsSummary.period_year, AnalyticsSummary.period_month],
+            "index_where": AnalyticsSummary.vehicle_id.is_(None),
+        }
+    return {"index_elements": [AnalyticsSummary.period_year, AnalyticsSummary.period_month, AnalyticsSummary.vehicle_id]}
+
+
+async def _seed_row(db: AsyncSession, year: int, month: int, vehicle_id: str | None) -> bool:
+    """Create a missing ledger row from the current (already flushed) log totals.
+
+    Returns False if a concurrent transaction seeded it first; its totals
+    cannot include this transaction's change, so the caller applies the
+    delta to that row instead.
+    """
+    fuel_q = select(func.coalesce(func.sum(FuelLog.total_cost), 0)).where(in_month(FuelLog.date, year, month))
+    maint_q = select(func.coalesce(func.sum(MaintenanceLog.cost), 0)).where(
+        in_month(MaintenanceLog.scheduled_date, year, month)
+    )
+    if vehicle_id is not None:
+        fuel_q = fuel_q.where(FuelLog.vehicle_id == vehicle_id)
+        maint_q = maint_q.where(MaintenanceLog.vehicle_id == vehicle_id)
+
+    fuel_cost = float((await db.execute(fuel_q)).scalar() or 0)
+    maint_cost = float((await db.execute(maint_q)).scalar() or 0)
+    result = await db.execute(
+        dialect_insert(db)(AnalyticsSummary)
+        .values(
+            id=str(uuid.uuid4()),
+            period_year=year, period_month=month, vehicle_id=vehicle_id,
+            total_fuel_cost=fuel_cost,
+            total_maintenance_cost=maint_cost,
+            total_operational_cost=fuel_cost + maint_cost,
+            updated_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(**summary_conflict_target(vehicle_id))
+    )
+    return result.rowcount == 1
+
+
+async def apply_cost_delta(
+    db: AsyncSession,
+    vehicle_id: str,
+    on_date: date,
+    *,
+    fuel: float = 0.0,
+    maintenance: float = 0.0,
+):
+    """Add signed cost deltas to the vehicle's and the fleet's monthly rows (no commit).
+
+    Call after the log change has been added to the session: if a row does
+    not exist yet it is seeded from the log totals, which already include
+    this change.
+    """
+    if not fuel and not maintenance:
+        return
+    year, month = month_of(on_date)
+    now = datetime.utcnow()
+
+    for target in (vehicle_id, None):
+        add_delta = (
+            update(AnalyticsSummary)
+            .where(*_summary_row(year, month, target))
+            .values(
+                total_fuel_cost=AnalyticsSummary.total_fuel_cost + fuel,
+                total_maintenance_cost=AnalyticsSummary.total_maintenance_cost + maintenance,
+                total_operational_cost=AnalyticsSummary.total_operational_cost + fuel + maintenance,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if (await db.execute(add_delta)).rowcount == 0:
+            await db.flush()
+            if not await _seed_row(db, year, month, target):
+                await db.execute(add_delta)
+
+
+async def get_fleet_month_total(db: AsyncSession, year: int, month: int) -> float:
+    """Running fleet-wide operational cost for a month (0 if nothing was logged)."""
+    total = (await db.execute(
+        select(AnalyticsSummary.total_operational_cost).where(*_summary_row(year, month, None))
+    )).scalar()
+    return float(total or 0)
+
+
+def budget_rule(year: int, month: int) -> str:
+    """Dedup rule for the over-budget alert: at most one open notification per month."""
+    return f"budget_exceeded:{year}-{month:02d}"
+
+
+# Long enough that a month's over-budget alert never re-opens within that month
+BUDGET_SUPPRESSION_WINDOW = timedelta(days=31)
+
+
+async def check_budget_threshold(db: AsyncSession, year: int, month: int) -> float:
+    """Notify if the running fleet total for the month exceeds the budget; returns the total.
+
+    Repeats (every cost event once the month is over) bump the month's
+    single notification instead of adding new ones.
+    """
+    total_cost = await get_fleet_month_total(db, year, month)
+    if total_cost > settings.BUDGET_THRESHOLD_MONTHLY:
+        from automation.notification_helper import create_notification
+        await create_notification(
+            db,
+            type=NotificationType.FINANCIAL,
+            severity=NotificationSeverity.CRITICAL,
+            title="💸 Monthly Budget Threshold Exceeded",
+            message=(
+                f"Total operational cost for {year}-{month:02d} is "
+                f"₹{total_cost:,.2f}, exceeding the threshold of "
+                f"₹{settings.BUDGET_THRESHOLD_MONTHLY:,.2f}."
+            ),
+            rule=budget_rule(year, month),
+            suppression_window=BUDGET_SUPPRESSION_WINDOW,
+        )
+        logger.warning(f"[CostLedger] Budget threshold exceeded: ₹{total_cost:,.2f}")
+    return total_cost
@@ -1,29 +1,220 @@
-"""FleetFlow – Lightweight in-process domain event dispatcher."""
+"""FleetFlow – Domain event dispatcher.
 
-import json
+Events are written to the ``domain_events`` outbox with ``enqueue`` in the
+same transaction as the entity change, and delivered to the registered
+handlers by the worker pool in ``automation.outbox``. ``dispatch`` remains
+for fire-and-forget use outside a request transaction.
+
+Delivery is at least once, so handlers must be idempotent. Handlers whose
+writes are not (adding a distance, a count) call ``first_delivery`` in the
+transaction that carries their writes; it records an (event, handler)
+receipt and reports a redelivery, so the writes and the receipt commit or
+roll back together.
+"""
+
+import asyncio
 import logging
+import time
+from contextvars import ContextVar
 from datetime import datetime
 from typing import Any, Callable, Coroutine
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 # Registry: event_type → list of async handler coroutine functions
 _handlers: dict[str, list[Callable[..., Coroutine]]] = {}
+# Per-handler timeout overrides (seconds), keyed by handler_name
+_timeouts: dict[str, float] = {}
+
+# Caps handlers running at once across all events (each typically holds a DB connection)
+_handler_slots = asyncio.Semaphore(settings.EVENT_HANDLER_CONCURRENCY)
+
+# (event id, handler name) of the delivery running in the current task
+_delivery: ContextVar[tuple[str, str] | None] = ContextVar("event_delivery", default=None)
+
+
+class HandlerStats:
+    """Latency and failure counters for one (event type, handler) pair."""
+
+    __slots__ = ("calls", "failures", "timeouts", "total_ms", "max_ms", "last_error")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_error: str | None = None
+
+    def record(self, elapsed_ms: float, error: str | None = None, timed_out: bool = False):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if error is not None:
+            self.failures += 1
+            self.last_error = error
+        if timed_out:
+            self.timeouts += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "last_error": self.last_error,
+        }
+
 
+_stats: dict[tuple[str, str], HandlerStats] = {}
 
-def register(event_type: str):
-    """Decorator to register an async handler for a domain event."""
+
+def register(event_type: str, timeout: float | None = None):
+    """Decorator to register an async handler for a domain event.
+
+    ``timeout`` overrides EVENT_HANDLER_TIMEOUT_SECONDS for this handler.
+    """
     def decorator(fn: Callable[..., Coroutine]):
         _handlers.setdefault(event_type, []).append(fn)
+        if timeout is not None:
+            _timeouts[handler_name(fn)] = timeout
         return fn
     return decorator
 
 
+def registered_handlers() -> dict[str, list[Callable[..., Coroutine]]]:
+    """Copy of the event type → handlers registry."""
+    return {event_type: list(fns) for event_type, fns in _handlers.items()}
+
+
+def handler_stats() -> list[dict]:
+    """Snapshot of per-handler counters, one entry per (event type, handler)."""
+    return [
+        {"event_type": event_type, "handler": name, **stats.as_dict()}
+        for (event_type, name), stats in sorted(_stats.items())
+    ]
+
+
+def handler_name(fn: Callable) -> str:
+    return f"{fn.__module__}.{fn.__qualname__}"
+
+
+async def first_delivery(db: AsyncSession) -> bool:
+    """Record in ``db``'s transaction that the running handler applied its event.
+
+    Returns False if a previous delivery already committed (retry, lease
+    reclaim, replay); the handler should then skip its writes. Always True
+    outside an outbox delivery, e.g. under ``dispatch``.
+    """
+    delivery = _delivery.get()
+    if delivery is None:
+        return True
+    from database import dialect_insert
+    from models.models import EventHandlerReceipt
+
+    event_id, handler = delivery
+    result = await db.execute(
+        dialect_insert(db)(EventHandlerReceipt)
+        .values(event_id=event_id, handler=handler, applied_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[EventHandlerReceipt.event_id, EventHandlerReceipt.handler])
+    )
+    return result.rowcount == 1
+
+
+def enqueue(db: AsyncSession, event_type: str, payload: dict[str, Any], triggered_by: str | None = None):
+    """
+    Add a domain event to the outbox in the caller's transaction (no commit).
+    The event is delivered only if the transaction commits; workers are woken
+    right after the commit instead of waiting for their next poll.
+    """
+    from models.models import DomainEvent
+
+    now = datetime.utcnow()
+    db.add(DomainEvent(
+        event_type=event_type,
+        payload=payload,
+        triggered_by=triggered_by,
+        status="pending",
+        attempts=0,
+        created_at=now,
+        available_at=now,
+    ))
+    if not event.contains(db.sync_session, "after_commit", _wake_outbox):
+        event.listen(db.sync_session, "after_commit", _wake_outbox)
+
+
+def _wake_outbox(session):
+    from automation.outbox import event_outbox
+    event_outbox.wake()
+
+
+async def _run_handler(
+    event_type: str,
+    handler: Callable[..., Coroutine],
+    payload: dict[str, Any],
+    event_id: str | None = None,
+) -> str | None:
+    """Run one handler under the global semaphore and its timeout; returns the error, if any."""
+    name = handler_name(handler)
+    if event_id is not None:
+        _delivery.set((event_id, name))   # gather() runs each handler in its own task, so this stays local
+    stats = _stats.setdefault((event_type, name), HandlerStats())
+    timeout = _timeouts.get(name, settings.EVENT_HANDLER_TIMEOUT_SECONDS)
+
+    async with _handler_slots:
+        started = time.monotonic()
+        error, timed_out = None, False
+        try:
+            # wait_for cancels the handler when the timeout expires
+            await asyncio.wait_for(handler(payload), timeout=timeout)
+        except asyncio.TimeoutError:
+            error, timed_out = f"timed out after {timeout:g}s", True
+        except Exception as exc:
+            error = str(exc) or exc.__class__.__name__
+        stats.record((time.monotonic() - started) * 1000, error, timed_out)
+
+    if error is not None:
+        logger.error(f"[EventDispatcher] handler {handler.__name__} failed for {event_type}: {error}")
+    return error
+
+
+async def run_handlers(
+    event_type: str,
+    payload: dict[str, Any],
+    skip: set[str] | frozenset[str] = frozenset(),
+    event_id: str | None = None,
+) -> tuple[list[str], dict[str, str]]:
+    """
+    Run every registered handler for the event except those named in ``skip``.
+    Handlers are independent and run concurrently, bounded by the global
+    EVENT_HANDLER_CONCURRENCY semaphore and each handler's timeout.
+    ``event_id`` identifies a stored event, enabling ``first_delivery``.
+    Returns ``(succeeded, failed)`` where failed maps handler name → error.
+    """
+    handlers = [h for h in _handlers.get(event_type, []) if handler_name(h) not in skip]
+    errors = await asyncio.gather(*(_run_handler(event_type, h, payload, event_id) for h in handlers))
+
+    succeeded: list[str] = []
+    failed: dict[str, str] = {}
+    for handler, error in zip(handlers, errors):
+        if error is None:
+            succeeded.append(handler_name(handler))
+        else:
+            failed[handler_name(handler)] = error
+    return succeeded, failed
+
+
 async def dispatch(event_type: str, payload: dict[str, Any], db=None, triggered_by: str | None = None):
     """
-    Fire a domain event asynchronously.
-    - Persists the event to domain_events table (if db provided)
-    - Calls all registered async handlers
+    Fire a domain event immediately, outside the outbox.
+    - Records the event in domain_events as already processed (if db provided)
+    - Calls all registered async handlers once, without retries
     """
     logger.info(f"[EventDispatcher] dispatching event={event_type}")
 
@@ -33,21 +224,17 @@ async def dispatch(event_type: str, payload: dict[str, Any], db=None, triggered_
             from models.models import DomainEvent
             event_row = DomainEvent(
                 event_type=event_type,
-                payload=json.dumps(payload),
+                payload=payload,
                 triggered_by=triggered_by,
+                status="done",
+                processed_at=datetime.utcnow(),
             )
             db.add(event_row)
             await db.commit()
         except Exception as exc:
             logger.warning(f"[EventDispatcher] failed to persist event {event_type}: {exc}")
 
-    # Invoke handlers (do not block each other)
-    handlers = _handlers.get(event_type, [])
-    for handler in handlers:
-        try:
-            await handler(payload)
-        except Exception as exc:
-            logger.error(f"[EventDispatcher] handler {handler.__name__} failed for {event_type}: {exc}")
+    await run_handlers(event_type, payload)
 
 
 # ── Domain Event Name Constants ─────────────────────────────────────────────
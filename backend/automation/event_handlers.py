@@ -1,8 +1,18 @@
-"""FleetFlow – Event handlers wired to domain events."""
+"""FleetFlow – Event handlers wired to domain events.
+
+Events are delivered at least once, so every handler here is idempotent:
+cache invalidation and recalc-queue marks are naturally so, alerts are
+deduplicated notifications, and additive writes are guarded by
+``first_delivery``. The streaming fuel buckets are not maintained here at
+all: routers update them in the same transaction as the log or trip.
+"""
 
 import logging
+from datetime import date
+from sqlalchemy import update, func
 from database import async_session
-from automation.event_dispatcher import register, Events
+from automation.event_dispatcher import register, first_delivery, Events
+from automation.periods import month_of
 
 logger = logging.getLogger(__name__)
 
@@ -23,43 +33,70 @@ async def on_trip_completed(payload: dict):
     if not vehicle_id or not distance_km:
         return
 
+    from models.models import Vehicle
     async with async_session() as db:
-        try:
-            from sqlalchemy import select
-            from models.models import Vehicle
-            result = await db.execute(select(Vehicle).where(Vehicle.id == vehicle_id))
-            vehicle = result.scalar_one_or_none()
-            if vehicle:
-                vehicle.odometer_km = (vehicle.odometer_km or 0) + float(distance_km)
-                await db.commit()
-                logger.info(f"[Handler] Odometer updated for vehicle={vehicle_id}, +{distance_km} km")
-        except Exception as exc:
-            logger.error(f"[Handler] TripCompleted odometer update failed: {exc}")
-            await db.rollback()
+        if not await first_delivery(db):
+            logger.info(f"[Handler] Odometer already updated for vehicle={vehicle_id} by this event")
+            return
+        await db.execute(
+            update(Vehicle).where(Vehicle.id == vehicle_id)
+            .values(odometer_km=func.coalesce(Vehicle.odometer_km, 0) + float(distance_km))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        logger.info(f"[Handler] Odometer updated for vehicle={vehicle_id}, +{distance_km} km")
+
+
+def _event_day(payload: dict) -> date:
+    """Day the event's record belongs to; falls back to today."""
+    raw = payload.get("date")
+    return date.fromisoformat(raw) if raw else date.today()
+
+
+def _event_period(payload: dict) -> tuple[int, int]:
+    """(year, month) the event's log belongs to; falls back to the current month."""
+    return month_of(_event_day(payload))
 
 
 @register(Events.FUEL_LOGGED)
 async def on_fuel_logged(payload: dict):
-    """Trigger cost aggregation and anomaly detection when fuel is logged."""
+    """Queue cost aggregation when fuel is logged."""
+    vehicle_id = payload.get("vehicle_id")
+    if not vehicle_id:
+        return
+    from automation.recalc_queue import recalc_queue
+    recalc_queue.mark_dirty(vehicle_id, *_event_period(payload))
+
+
+@register(Events.FUEL_LOGGED)
+async def check_fuel_anomaly_on_log(payload: dict):
+    """Check the vehicle's fuel buckets (already including this log) for an anomaly."""
     vehicle_id = payload.get("vehicle_id")
     if not vehicle_id:
         return
-    from automation.cost_aggregator import recalculate_vehicle_costs
     from automation.tasks.fuel_anomaly import check_vehicle_fuel_anomaly
     async with async_session() as db:
-        await recalculate_vehicle_costs(db, vehicle_id)
         await check_vehicle_fuel_anomaly(db, vehicle_id)
 
 
 @register(Events.MAINTENANCE_CREATED)
 async def on_maintenance_created(payload: dict):
-    """Trigger cost aggregation when maintenance is logged."""
+    """Queue cost aggregation when maintenance is logged."""
     vehicle_id = payload.get("vehicle_id")
     if not vehicle_id:
         return
-    from automation.cost_aggregator import recalculate_vehicle_costs
-    async with async_session() as db:
-        await recalculate_vehicle_costs(db, vehicle_id)
+    from automation.recalc_queue import recalc_queue
+    recalc_queue.mark_dirty(vehicle_id, *_event_period(payload))
+
+
+@register(Events.TRIP_DISPATCHED)
+@register(Events.TRIP_COMPLETED)
+@register(Events.FUEL_LOGGED)
+@register(Events.MAINTENANCE_CREATED)
+async def invalidate_kpis(payload: dict):
+    """Drop the cached dashboard KPIs whenever fleet figures change."""
+    from automation.kpi_engine import invalidate_dashboard_kpis
+    invalidate_dashboard_kpis()
 
 
 @register(Events.DRIVER_LICENSE_EXPIRING)
@@ -90,4 +127,5 @@ async def on_driver_license_expiring(payload: dict):
             message=message,
             entity_type="driver",
             entity_id=driver_id,
+            rule="license_expired" if days_left <= 0 else "license_expiring",
         )
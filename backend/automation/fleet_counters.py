@@ -0,0 +1,158 @@
+"""FleetFlow – Incrementally maintained fleet KPI counters.
+
+Routers record signed deltas (status moves, spend) in the same transaction
+as the entity change, so the dashboard reads a handful of rows instead of
+recounting whole tables. A nightly reconciliation job rebuilds the counters
+from scratch and reports any drift.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import select, func, case, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import dialect_insert
+from models.models import (
+    FleetCounter, Vehicle, Driver, Trip, FuelLog, MaintenanceLog, TripStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+# ── Counter keys ──────────────────────────────────────────────────────────
+VEHICLES_TOTAL = "vehicles.total"
+DRIVERS_TOTAL = "drivers.total"
+DRIVERS_SAFETY_SUM = "drivers.safety_score_sum"
+TRIPS_TOTAL = "trips.total"
+TRIPS_ON_TIME = "trips.on_time"
+FUEL_COST = "fuel.total_cost"
+MAINTENANCE_COST = "maintenance.total_cost"
+
+# Keys every seeded read model has; a missing one means it was never seeded
+BASE_KEYS = (VEHICLES_TOTAL, DRIVERS_TOTAL, TRIPS_TOTAL)
+
+
+def status_key(entity: str, status) -> str:
+    """Counter key for an entity status, e.g. ("vehicles", ACTIVE) → "vehicles.active"."""
+    return f"{entity}.{getattr(status, 'value', status)}"
+
+
+class CounterDeltas(defaultdict):
+    """Accumulates signed counter deltas for one unit of work."""
+
+    def __init__(self):
+        super().__init__(float)
+
+    def status_change(self, entity: str, old, new):
+        """Record an entity moving between statuses; None means created / deleted."""
+        if getattr(old, "value", old) == getattr(new, "value", new):
+            return
+        if old is None:
+            self[f"{entity}.total"] += 1
+        else:
+            self[status_key(entity, old)] -= 1
+        if new is None:
+            self[f"{entity}.total"] -= 1
+        else:
+            self[status_key(entity, new)] += 1
+
+
+def is_on_time(trip: Trip) -> bool:
+    """Whether a trip arrived no later than scheduled (tz-insensitive)."""
+    if trip.actual_arrival is None or trip.scheduled_arrival is None:
+        return False
+    return trip.actual_arrival.replace(tzinfo=None) <= trip.scheduled_arrival.replace(tzinfo=None)
+
+
+async def apply_counter_deltas(db: AsyncSession, deltas: dict[str, float]):
+    """Apply deltas with atomic ``value = value + :delta`` upserts (no commit).
+
+    A key's first use inserts it; concurrent first uses of the same key
+    resolve through ON CONFLICT rather than a primary-key violation.
+    """
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    for key, delta in deltas.items():
+        if not delta:
+            continue
+        stmt = insert(FleetCounter).values(key=key, value=delta, updated_at=now)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[FleetCounter.key],
+            set_={"value": FleetCounter.value + stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+        ))
+
+
+async def read_counters(db: AsyncSession) -> dict[str, float]:
+    rows = (await db.execute(select(FleetCounter.key, FleetCounter.value))).all()
+    return {key: float(value or 0) for key, value in rows}
+
+
+async def count_from_source(db: AsyncSession) -> dict[str, float]:
+    """Recount every counter from the source tables."""
+    actual: dict[str, float] = {}
+
+    for entity, model in (("vehicles", Vehicle), ("drivers", Driver), ("trips", Trip)):
+        rows = (await db.execute(
+            select(model.status, func.count(model.id)).group_by(model.status)
+        )).all()
+        for status, count in rows:
+            actual[status_key(entity, status)] = float(count)
+        actual[f"{entity}.total"] = float(sum(count for _, count in rows))
+
+    actual[DRIVERS_SAFETY_SUM] = float((await db.execute(
+        select(func.coalesce(func.sum(Driver.safety_score), 0))
+    )).scalar() or 0)
+
+    actual[TRIPS_ON_TIME] = float((await db.execute(
+        select(func.coalesce(func.sum(case(
+            ((Trip.status == TripStatus.COMPLETED) & (Trip.actual_arrival <= Trip.scheduled_arrival), 1),
+            else_=0,
+        )), 0))
+    )).scalar() or 0)
+
+    actual[FUEL_COST] = float((await db.execute(
+        select(func.coalesce(func.sum(FuelLog.total_cost), 0))
+    )).scalar() or 0)
+    actual[MAINTENANCE_COST] = float((await db.execute(
+        select(func.coalesce(func.sum(MaintenanceLog.cost), 0))
+    )).scalar() or 0)
+
+    return actual
+
+
+async def rebuild_fleet_counters(db: AsyncSession) -> dict[str, tuple[float, float]]:
+    """Rebuild all counters from scratch and commit.
+
+    Counts and writes under an exclusive lock on fleet_counters (PostgreSQL;
+    SQLite serialises writers anyway). Every write path updates a counter in
+    the same transaction as its source change, so writers wait for the
+    rebuild and then apply their delta on top of it, instead of committing
+    between the recount and the overwrite and being erased.
+
+    Returns the drift found as ``{key: (stored, actual)}`` for keys that disagreed.
+    """
+    if db.bind.dialect.name == "postgresql":
+        # Waits for in-flight counter writers to commit; reads below then see their changes
+        await db.execute(text("LOCK TABLE fleet_counters IN EXCLUSIVE MODE"))
+    actual = await count_from_source(db)
+    stored = await read_counters(db)
+
+    drift = {
+        key: (stored.get(key, 0.0), actual.get(key, 0.0))
+        for key in stored.keys() | actual.keys()
+        if round(stored.get(key, 0.0) - actual.get(key, 0.0), 2) != 0
+    }
+
+    now = datetime.utcnow()
+    for key in stored.keys() - actual.keys():
+        actual[key] = 0.0
+    # Absolute values under the lock; ON CONFLICT covers SQLite's first seed racing a delta
+    stmt = dialect_insert(db)(FleetCounter).values(
+        [{"key": key, "value": value, "updated_at": now} for key, value in actual.items()]
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[FleetCounter.key],
+        set_={"value": stmt.excluded.value, "updated_at": stmt.excluded.updated_at},
+    ))
+    await db.commit()
+    return drift
@@ -0,0 +1,162 @@
+"""FleetFlow – Streaming fuel anomaly state.
+
+Keeps one row per (vehicle, day) with the litres fuelled and km driven on
+completed trips, for the trailing 90 days. Fuel-log creates, edits and
+deletes and trip completions/deletes apply signed deltas with an atomic
+upsert in the same transaction as the change (so each lands exactly once,
+whatever happens to event delivery), and the anomaly check reads at most 90
+small primary-key rows instead of re-aggregating fuel_logs and trips.
+
+The nightly fuel anomaly scan rebuilds the buckets from raw history, which
+prunes expired days and repairs any drift.
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import select, func, delete, text, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import dialect_insert
+from models.models import FuelLog, Trip, TripStatus, VehicleFuelBucket
+
+logger = logging.getLogger(__name__)
+
+RECENT_DAYS = 30
+BASELINE_DAYS = 90
+
+
+@dataclass
+class FuelWindows:
+    """Per-vehicle recent/baseline litres and distance, aligned by index."""
+    vehicle_ids: list[str]
+    recent_fuel: np.ndarray
+    recent_dist: np.ndarray
+    baseline_fuel: np.ndarray
+    baseline_dist: np.ndarray
+
+
+async def add_to_bucket(
+    db: AsyncSession,
+    vehicle_id: str,
+    day: date,
+    *,
+    litres: float = 0.0,
+    km: float = 0.0,
+    today: date | None = None,
+):
+    """Add signed litres/km to the vehicle's bucket for ``day`` (no commit)."""
+    if not litres and not km:
+        return
+    today = today or date.today()
+    if day <= today - timedelta(days=BASELINE_DAYS):
+        return  # outside every window
+
+    insert_ = dialect_insert(db)
+    stmt = insert_(VehicleFuelBucket).values(
+        vehicle_id=vehicle_id, day=day, fuel_liters=litres, distance_km=km, updated_at=datetime.utcnow(),
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[VehicleFuelBucket.vehicle_id, VehicleFuelBucket.day],
+        set_={
+            "fuel_liters": VehicleFuelBucket.fuel_liters + stmt.excluded.fuel_liters,
+            "distance_km": VehicleFuelBucket.distance_km + stmt.excluded.distance_km,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    ))
+
+
+async def load_vehicle_window(db: AsyncSession, vehicle_id: str, today: date | None = None) -> FuelWindows:
+    """Recent/baseline litres and km for one vehicle, summed from its buckets."""
+    today = today or date.today()
+    recent_from = today - timedelta(days=RECENT_DAYS)
+    rows = (await db.execute(
+        select(VehicleFuelBucket.day, VehicleFuelBucket.fuel_liters, VehicleFuelBucket.distance_km)
+        .where(
+            VehicleFuelBucket.vehicle_id == vehicle_id,
+            VehicleFuelBucket.day > today - timedelta(days=BASELINE_DAYS),
+        )
+    )).all()
+
+    sums = np.zeros((2, 2))  # [recent, baseline] x [litres, km]
+    for day, litres, km in rows:
+        sums[0 if day >= recent_from else 1] += (litres or 0, km or 0)
+    return FuelWindows(
+        [vehicle_id],
+        sums[0:1, 0], sums[0:1, 1],
+        sums[1:2, 0], sums[1:2, 1],
+    )
+
+
+async def rebuild_fuel_state(
+    db: AsyncSession,
+    today: date | None = None,
+    since: date | None = None,
+    until: date | None = None,
+) -> int:
+    """Replace the buckets with the trailing window recomputed from raw logs and commit.
+
+    Buckets are upserted with absolute values and only keys that no longer
+    exist are deleted, so readers never see an emptied table. On PostgreSQL
+    the table is locked against writers (readers go on) for the duration:
+    routers update buckets in the same transaction as the log or trip, so
+    they wait and then apply their delta on top of the rebuilt value.
+
+    ``since``/``until`` limit the rebuild to days in ``[since, until)``;
+    without them every bucket is replaced, which also prunes expired days.
+    Returns the number of bucket rows written.
+    """
+    if db.bind.dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE vehicle_fuel_buckets IN EXCLUSIVE MODE"))
+    today = today or date.today()
+    window_start = today - timedelta(days=BASELINE_DAYS - 1)
+    if since:
+        window_start = max(window_start, since)
+    window_start_dt = datetime.combine(window_start, datetime.min.time())
+    trip_day = func.date(Trip.actual_departure, type_=Date)
+
+    fuel_query = (
+        select(FuelLog.vehicle_id, FuelLog.date, func.sum(FuelLog.quantity_liters))
+        .where(FuelLog.date >= window_start)
+        .group_by(FuelLog.vehicle_id, FuelLog.date)
+    )
+    trip_query = (
+        select(Trip.vehicle_id, trip_day, func.sum(Trip.distance_km))
+        .where(Trip.status == TripStatus.COMPLETED, Trip.actual_departure >= window_start_dt)
+        .group_by(Trip.vehicle_id, trip_day)
+    )
+    stale = delete(VehicleFuelBucket)
+    if since:
+        stale = stale.where(VehicleFuelBucket.day >= since)
+    if until:
+        fuel_query = fuel_query.where(FuelLog.date < until)
+        trip_query = trip_query.where(Trip.actual_departure < datetime.combine(until, datetime.min.time()))
+        stale = stale.where(VehicleFuelBucket.day < until)
+
+    buckets: dict[tuple[str, date], list[float]] = {}
+    for vehicle_id, day, litres in (await db.execute(fuel_query)).all():
+        buckets.setdefault((vehicle_id, day), [0.0, 0.0])[0] = float(litres or 0)
+
+    for vehicle_id, day, km in (await db.execute(trip_query)).all():
+        day = date.fromisoformat(day) if isinstance(day, str) else day
+        buckets.setdefault((vehicle_id, day), [0.0, 0.0])[1] = float(km or 0)
+
+    now = datetime.utcnow()
+    if buckets:
+        stmt = dialect_insert(db)(VehicleFuelBucket)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[VehicleFuelBucket.vehicle_id, VehicleFuelBucket.day],
+            set_={
+                "fuel_liters": stmt.excluded.fuel_liters,
+                "distance_km": stmt.excluded.distance_km,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        ), [
+            {"vehicle_id": vid, "day": day, "fuel_liters": litres, "distance_km": km, "updated_at": now}
+            for (vid, day), (litres, km) in buckets.items()
+        ])
+    # Every live key in range was just stamped with ``now``; the rest have no raw data left
+    await db.execute(stale.where(VehicleFuelBucket.updated_at != now))
+    await db.commit()
+    return len(buckets)
@@ -0,0 +1,111 @@
+"""FleetFlow – Dashboard KPI engine.
+
+Serves every dashboard figure from the incrementally maintained
+fleet_counters read model (see fleet_counters), so a dashboard load costs
+one small query regardless of history size. The result is also cached
+in-process and invalidated by domain events (see event_handlers), so
+repeated loads cost no database work between fleet changes.
+"""
+
+import asyncio
+import logging
+import time
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.models import VehicleStatus, DriverStatus, TripStatus
+from schemas.schemas import DashboardKPIs
+from automation import fleet_counters as fc
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def compute_dashboard_kpis(db: AsyncSession) -> DashboardKPIs:
+    """Compute all dashboard KPIs from the fleet_counters read model."""
+    counters = await fc.read_counters(db)
+    if any(key not in counters for key in fc.BASE_KEYS):
+        # Never seeded (migration 003 seeds existing databases; this covers
+        # create_all): a delta written first must not pass for a seeded model
+        await fc.rebuild_fleet_counters(db)
+        counters = await fc.read_counters(db)
+
+    def count(key: str) -> int:
+        return max(int(counters.get(key, 0)), 0)
+
+    total_vehicles = count(fc.VEHICLES_TOTAL)
+    active_vehicles = count(fc.status_key("vehicles", VehicleStatus.ACTIVE))
+    total_drivers = count(fc.DRIVERS_TOTAL)
+    completed_trips = count(fc.status_key("trips", TripStatus.COMPLETED))
+    on_time_count = count(fc.TRIPS_ON_TIME)
+
+    avg_safety = counters.get(fc.DRIVERS_SAFETY_SUM, 0) / total_drivers if total_drivers > 0 else 100
+    fleet_util = (active_vehicles / total_vehicles * 100) if total_vehicles > 0 else 0
+    on_time = (on_time_count / completed_trips * 100) if completed_trips > 0 else 0
+
+    return DashboardKPIs(
+        total_vehicles=total_vehicles,
+        active_vehicles=active_vehicles,
+        total_drivers=total_drivers,
+        available_drivers=count(fc.status_key("drivers", DriverStatus.AVAILABLE)),
+        total_trips=count(fc.TRIPS_TOTAL),
+        completed_trips=completed_trips,
+        in_progress_trips=count(fc.status_key("trips", TripStatus.IN_PROGRESS)),
+        total_fuel_cost=counters.get(fc.FUEL_COST, 0.0),
+        total_maintenance_cost=counters.get(fc.MAINTENANCE_COST, 0.0),
+        avg_safety_score=round(float(avg_safety), 1),
+        fleet_utilization_pct=round(fleet_util, 1),
+        on_time_delivery_pct=round(on_time, 1),
+    )
+
+
+class KPICache:
+    """Single-entry in-process cache for the dashboard KPIs.
+
+    A generation counter guards against a stale compute overwriting a fresher
+    invalidation: if an event arrives while the KPIs are being computed, the
+    result is returned to the caller but not cached.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self._ttl = ttl_seconds
+        self._value: DashboardKPIs | None = None
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._generation += 1
+        self._value = None
+
+    def _fresh(self) -> DashboardKPIs | None:
+        if self._value is not None and time.monotonic() < self._expires_at:
+            return self._value
+        return None
+
+    async def get(self, db: AsyncSession) -> DashboardKPIs:
+        cached = self._fresh()
+        if cached is not None:
+            return cached
+
+        # Collapse concurrent misses (many dashboards refreshing at once) into one compute
+        async with self._lock:
+            cached = self._fresh()
+            if cached is not None:
+                return cached
+            generation = self._generation
+            value = await compute_dashboard_kpis(db)
+            if generation == self._generation:
+                self._value = value
+                self._expires_at = time.monotonic() + self._ttl
+            return value
+
+
+# Singleton instance shared across the app
+kpi_cache = KPICache(ttl_seconds=settings.KPI_CACHE_TTL_SECONDS)
+
+
+def invalidate_dashboard_kpis():
+    """Drop the cached dashboard KPIs; the next request recomputes them."""
+    kpi_cache.invalidate()
+    logger.debug("[KPIEngine] dashboard KPI cache invalidated")
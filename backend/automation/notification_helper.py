@@ -1,14 +1,48 @@
-"""FleetFlow – Reusable helper to create and broadcast notifications."""
+"""FleetFlow – Reusable helper to create and broadcast notifications.
+
+Alerts that monitors raise repeatedly for the same condition (a licence
+still expiring, the month still over budget) pass a ``rule`` name. Together
+with the type and entity it forms a dedup key, and a repeat within the
+suppression window (NOTIFICATION_SUPPRESSION_HOURS since the last
+occurrence, unless the caller passes its own) is folded into the existing
+row: ``occurrence_count`` is bumped, title/message/severity are refreshed
+and nothing new is broadcast. The key is enforced by a unique partial
+index, so concurrent workers upsert into the same row.
+"""
 
-import json
 import logging
-from datetime import datetime
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from database import dialect_insert
 from models.models import Notification, NotificationType, NotificationSeverity
 from automation.ws_manager import ws_manager
+from config import get_settings
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def dedup_key(type: NotificationType, entity_type: str | None, entity_id: str | None, rule: str) -> str:
+    return f"{type.value}:{entity_type or ''}:{entity_id or ''}:{rule}"
+
+
+def _ws_payload(notif) -> dict:
+    """WebSocket representation of a notification (ORM object or row mapping)."""
+    get = notif.get if isinstance(notif, dict) else lambda key: getattr(notif, key)
+    return {
+        "event": "new_notification",
+        "id": get("id"),
+        "type": get("type").value,
+        "severity": get("severity").value,
+        "title": get("title"),
+        "message": get("message"),
+        "entity_type": get("entity_type"),
+        "entity_id": get("entity_id"),
+        "created_at": get("created_at").isoformat(),
+    }
 
 
 async def create_notification(
@@ -20,34 +54,119 @@ async def create_notification(
     message: str,
     entity_type: str | None = None,
     entity_id: str | None = None,
-) -> Notification:
-    """Persist a notification and broadcast it via WebSocket."""
-    notif = Notification(
+    rule: str | None = None,
+    suppression_window: timedelta | None = None,
+) -> dict:
+    """Persist one notification and broadcast it via WebSocket; returns the stored row.
+
+    With a ``rule``, a repeat inside the suppression window updates the
+    existing notification instead (see the module docstring).
+    """
+    rows = await create_notifications_bulk(db, [dict(
         type=type,
         severity=severity,
         title=title,
         message=message,
         entity_type=entity_type,
         entity_id=entity_id,
-    )
-    db.add(notif)
+        rule=rule,
+    )], suppression_window=suppression_window)
+    return rows[0]
+
+
+async def create_notifications_bulk(
+    db: AsyncSession,
+    notifications: list[dict],
+    *,
+    suppression_window: timedelta | None = None,
+) -> list[dict]:
+    """Persist many notifications in one multi-row INSERT … RETURNING, commit,
+    and hand the new ones to the broadcaster as one batch.
+
+    Each item takes the same keyword fields as ``create_notification``.
+    Returns the stored rows as dicts, in input order; no per-row refresh
+    SELECT is needed. Deduplicated repeats come back as the existing row
+    (``occurrence_count`` > 1) and are not broadcast.
+    """
+    if not notifications:
+        return []
+
+    now = datetime.utcnow()
+    params = []
+    for item in notifications:
+        item = dict(item)
+        rule = item.pop("rule", None)
+        row = {
+            "id": str(uuid.uuid4()),
+            "severity": NotificationSeverity.INFO,
+            "entity_type": None,
+            "entity_id": None,
+            "is_read": False,
+            "created_at": now,
+            "last_occurred_at": now,
+            "occurrence_count": 1,
+            **item,
+        }
+        row["dedup_key"] = dedup_key(row["type"], row["entity_type"], row["entity_id"], rule) if rule else None
+        params.append(row)
+
+    plain = [p for p in params if p["dedup_key"] is None]
+    keyed: dict[str, dict] = {}
+    for p in params:
+        if p["dedup_key"] is not None:
+            if p["dedup_key"] in keyed:   # repeated within this call: fold into the first, keep the latest text
+                first = keyed[p["dedup_key"]]
+                first.update({k: p[k] for k in ("severity", "title", "message")})
+                first["occurrence_count"] += 1
+            else:
+                keyed[p["dedup_key"]] = p
+
+    stored: dict[str, dict] = {}
+    columns = list(Notification.__table__.c)
+    if plain:
+        result = await db.execute(insert(Notification).returning(*columns, sort_by_parameter_order=True), plain)
+        stored.update((row["id"], dict(row)) for row in result.mappings())
+    if keyed:
+        stored.update(await _upsert_deduplicated(db, list(keyed.values()), now, suppression_window))
     await db.commit()
-    await db.refresh(notif)
 
-    # Broadcast to all connected WS clients
+    fresh = [stored[p["id"]] for p in params if p["id"] in stored]
     try:
-        await ws_manager.broadcast_notification({
-            "event": "new_notification",
-            "id": notif.id,
-            "type": notif.type.value,
-            "severity": notif.severity.value,
-            "title": notif.title,
-            "message": notif.message,
-            "entity_type": notif.entity_type,
-            "entity_id": notif.entity_id,
-            "created_at": notif.created_at.isoformat(),
-        })
+        await ws_manager.broadcast_notifications([_ws_payload(row) for row in fresh])
     except Exception as exc:
-        logger.warning(f"WS broadcast failed: {exc}")
+        logger.warning(f"WS batch broadcast failed: {exc}")
+
+    by_key = {row["dedup_key"]: row for row in stored.values() if row["dedup_key"]}
+    return [stored.get(p["id"]) or by_key[p["dedup_key"]] for p in params]
+
+
+async def _upsert_deduplicated(db: AsyncSession, params: list[dict], now: datetime,
+                               window: timedelta | None) -> dict[str, dict]:
+    """Insert keyed notifications or fold them into the live row holding their key.
+
+    Returns every stored row by id; a repeat keeps the existing row's id.
+    """
+    window = window or timedelta(hours=settings.NOTIFICATION_SUPPRESSION_HOURS)
+    keys = [p["dedup_key"] for p in params]
+
+    # A row whose window has lapsed gives up its key, so the next occurrence is a new alert
+    await db.execute(
+        update(Notification)
+        .where(Notification.dedup_key.in_(keys), Notification.last_occurred_at < now - window)
+        .values(dedup_key=None)
+        .execution_options(synchronize_session=False)
+    )
 
-    return notif
+    stmt = dialect_insert(db)(Notification).values(params)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Notification.dedup_key],
+        index_where=Notification.dedup_key.isnot(None),
+        set_={
+            "occurrence_count": Notification.occurrence_count + stmt.excluded.occurrence_count,
+            "last_occurred_at": stmt.excluded.last_occurred_at,
+            "severity": stmt.excluded.severity,
+            "title": stmt.excluded.title,
+            "message": stmt.excluded.message,
+        },
+    ).returning(*Notification.__table__.c)
+    return {row["id"]: dict(row) for row in (await db.execute(stmt)).mappings()}
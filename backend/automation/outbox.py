@@ -0,0 +1,281 @@
+"""FleetFlow – Transactional outbox worker pool for domain events.
+
+Routers ``enqueue`` events into ``domain_events`` in the same transaction
+as the entity change, so an event exists if and only if the change
+committed. A pool of EVENT_WORKERS async workers claims pending rows with
+``SELECT ... FOR UPDATE SKIP LOCKED`` (workers never block on each other's
+rows), leases them for EVENT_LEASE_SECONDS, and runs the registered
+handlers. Handlers that already succeeded are recorded on the row and
+skipped on retry; failures are retried with exponential backoff and jitter
+until EVENT_MAX_ATTEMPTS, then the row is parked as ``failed``.
+
+A worker that crashes mid-event simply lets its lease expire: the row is
+claimable again once ``available_at`` passes. The lease is renewed as each
+claimed event starts, so events waiting behind slow ones in a batch are not
+reclaimed, and an outcome is recorded only while the lease is still held.
+
+Delivery is therefore at least once: a handler can be re-run after its
+writes committed (crash before the outcome is recorded, a timeout that
+fires after commit, a lost lease). Handlers must be idempotent; those that
+are not by nature guard their writes with ``first_delivery`` (see
+event_dispatcher).
+"""
+
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from models.models import DomainEvent
+from automation.event_dispatcher import run_handlers
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+CLAIMABLE = ("pending", "processing")   # "processing" rows are claimable once their lease expires
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+
+class OutboxMetrics:
+    """In-process delivery counters plus a sliding window of recent completions."""
+
+    def __init__(self, window_seconds: float = THROUGHPUT_WINDOW_SECONDS):
+        self.window_seconds = window_seconds
+        self.started_at = time.monotonic()
+        self.delivered = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.handler_errors = 0
+        self._recent: deque[tuple[float, float]] = deque()   # (completed monotonic, lag seconds)
+
+    def record_delivery(self, lag_seconds: float):
+        self.delivered += 1
+        self._recent.append((time.monotonic(), lag_seconds))
+        self._trim()
+
+    def _trim(self):
+        cutoff = time.monotonic() - self.window_seconds
+        while self._recent and self._recent[0][0] < cutoff:
+            self._recent.popleft()
+
+    def snapshot(self) -> dict:
+        self._trim()
+        lags = sorted(lag for _, lag in self._recent)
+        window = min(self.window_seconds, max(time.monotonic() - self.started_at, 1e-9))
+        return {
+            "delivered_total": self.delivered,
+            "retried_total": self.retried,
+            "failed_total": self.dead_lettered,
+            "handler_errors_total": self.handler_errors,
+            "throughput_per_second": round(len(lags) / window, 3),
+            "lag_avg_seconds": round(sum(lags) / len(lags), 3) if lags else 0.0,
+            "lag_p95_seconds": round(lags[int(0.95 * (len(lags) - 1))], 3) if lags else 0.0,
+            "lag_max_seconds": round(lags[-1], 3) if lags else 0.0,
+        }
+
+
+class EventOutbox:
+    """Pool of workers draining the domain_events outbox."""
+
+    def __init__(
+        self,
+        workers: int,
+        batch_size: int,
+        poll_interval: float,
+        lease_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retry_max_seconds: float,
+    ):
+        self._workers = workers
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._lease = timedelta(seconds=lease_seconds)
+        self._max_attempts = max_attempts
+        self._retry_base = retry_base_seconds
+        self._retry_max = retry_max_seconds
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self.metrics = OutboxMetrics()
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def wake(self):
+        """Signal idle workers that new events were committed."""
+        self._wakeup.set()
+
+    def start(self):
+        if self.running:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run(i), name=f"event-outbox-{i}")
+            for i in range(self._workers)
+        ]
+        logger.info(f"[Outbox] started {self._workers} workers")
+
+    async def stop(self):
+        """Stop the workers; in-flight events finish or fall back to lease expiry."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("[Outbox] workers stopped")
+
+    def backoff(self, attempts: int) -> float:
+        """Exponential backoff with full jitter for the given attempt number."""
+        ceiling = min(self._retry_base * 2 ** max(attempts - 1, 0), self._retry_max)
+        return random.uniform(ceiling / 2, ceiling)
+
+    async def _run(self, worker: int):
+        while True:
+            try:
+                claimed = await self.claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"[Outbox] worker={worker} claim failed: {exc}")
+                claimed = []
+
+            for row in claimed:
+                if await self.renew(row):
+                    await self.process(row)
+
+            if len(claimed) < self._batch_size:
+                # Drained (or failing): sleep until woken or the next poll
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self._poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def claim(self) -> list:
+        """Lease up to batch_size due events to this worker and return them."""
+        now = datetime.utcnow()
+        async with async_session() as db:
+            rows = (await db.execute(
+                select(
+                    DomainEvent.id, DomainEvent.event_type, DomainEvent.payload,
+                    DomainEvent.attempts, DomainEvent.completed_handlers, DomainEvent.created_at,
+                )
+                .where(DomainEvent.status.in_(CLAIMABLE), DomainEvent.available_at <= now)
+                .order_by(DomainEvent.available_at)
+                .limit(self._batch_size)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                return []
+            # Re-check claimability so databases without SKIP LOCKED never double-claim
+            leased = set((await db.execute(
+                update(DomainEvent)
+                .where(
+                    DomainEvent.id.in_([row.id for row in rows]),
+                    DomainEvent.status.in_(CLAIMABLE),
+                    DomainEvent.available_at <= now,
+                )
+                .values(status="processing", attempts=DomainEvent.attempts + 1, available_at=now + self._lease)
+                .returning(DomainEvent.id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all())
+            await db.commit()
+        return [row for row in rows if row.id in leased]
+
+    def _holds_lease(self, row):
+        """Row is still leased by this claim (a reclaim bumps ``attempts``)."""
+        return (
+            DomainEvent.id == row.id,
+            DomainEvent.status == "processing",
+            DomainEvent.attempts == row.attempts + 1,
+        )
+
+    async def renew(self, row) -> bool:
+        """Restart the lease just before processing; False if it was already lost."""
+        async with async_session() as db:
+            result = await db.execute(
+                update(DomainEvent).where(*self._holds_lease(row))
+                .values(available_at=datetime.utcnow() + self._lease)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            logger.warning(f"[Outbox] event={row.id} lease lost before processing, skipping")
+        return result.rowcount == 1
+
+    async def process(self, row) -> bool:
+        """Run the event's outstanding handlers and record the outcome on the row."""
+        attempt = row.attempts + 1
+        done = set(json.loads(row.completed_handlers or "[]"))
+        succeeded, failed = await run_handlers(row.event_type, row.payload, skip=done, event_id=row.id)
+        done.update(succeeded)
+
+        now = datetime.utcnow()
+        values = {"completed_handlers": json.dumps(sorted(done))}
+        if not failed:
+            values.update(status="done", processed_at=now, last_error=None)
+        else:
+            self.metrics.handler_errors += len(failed)
+            values["last_error"] = "; ".join(f"{name}: {error}" for name, error in failed.items())[:2000]
+            if attempt >= self._max_attempts:
+                values.update(status="failed", processed_at=now)
+            else:
+                values.update(status="pending", available_at=now + timedelta(seconds=self.backoff(attempt)))
+
+        async with async_session() as db:
+            result = await db.execute(
+                update(DomainEvent).where(*self._holds_lease(row)).values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            # Reclaimed meanwhile; the new holder records the outcome (guarded handlers won't re-apply)
+            logger.warning(f"[Outbox] event={row.id} lease lost while processing, outcome not recorded")
+            return not failed
+
+        if not failed:
+            self.metrics.record_delivery((now - row.created_at).total_seconds())
+        elif values["status"] == "failed":
+            self.metrics.dead_lettered += 1
+            logger.error(f"[Outbox] event={row.id} {row.event_type} failed after {attempt} attempts")
+        else:
+            self.metrics.retried += 1
+            logger.warning(f"[Outbox] event={row.id} {row.event_type} attempt {attempt} failed, will retry")
+        return not failed
+
+    async def backlog(self, db: AsyncSession) -> dict:
+        """Outstanding work in the outbox table (shared by all app instances)."""
+        counts = dict((await db.execute(
+            select(DomainEvent.status, func.count(DomainEvent.id))
+            .where(DomainEvent.status.in_(("pending", "processing", "failed")))
+            .group_by(DomainEvent.status)
+        )).all())
+        oldest = (await db.execute(
+            select(func.min(DomainEvent.created_at)).where(DomainEvent.status.in_(CLAIMABLE))
+        )).scalar()
+        return {
+            "pending": counts.get("pending", 0),
+            "processing": counts.get("processing", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_pending_age_seconds": (
+                round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0
+            ),
+        }
+
+
+# Singleton instance shared across the app
+event_outbox = EventOutbox(
+    workers=settings.EVENT_WORKERS,
+    batch_size=settings.EVENT_CLAIM_BATCH,
+    poll_interval=settings.EVENT_POLL_INTERVAL_SECONDS,
+    lease_seconds=settings.EVENT_LEASE_SECONDS,
+    max_attempts=settings.EVENT_MAX_ATTEMPTS,
+    retry_base_seconds=settings.EVENT_RETRY_BASE_SECONDS,
+    retry_max_seconds=settings.EVENT_RETRY_MAX_SECONDS,
+)
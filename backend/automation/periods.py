@@ -0,0 +1,31 @@
+"""FleetFlow – Reporting period helpers.
+
+Builds sargable half-open range predicates (``col >= start AND col < end``)
+for calendar months. Unlike ``EXTRACT(year/month FROM col)`` these can use
+plain and composite b-tree indexes on the date column.
+"""
+
+from datetime import date, datetime
+from sqlalchemy import and_, DateTime
+
+
+def month_bounds(year: int, month: int) -> tuple[date, date]:
+    """Return ``(first day of month, first day of next month)``."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def month_of(value: date | datetime | None) -> tuple[int, int]:
+    """Return ``(year, month)`` for a date, defaulting to the current UTC month."""
+    value = value or datetime.utcnow()
+    return value.year, value.month
+
+
+def in_month(column, year: int, month: int):
+    """Half-open predicate selecting rows of ``column`` within the given month."""
+    start, end = month_bounds(year, month)
+    if isinstance(column.type, DateTime):
+        start = datetime.combine(start, datetime.min.time())
+        end = datetime.combine(end, datetime.min.time())
+    return and_(column >= start, column < end)
@@ -0,0 +1,210 @@
+"""FleetFlow – Cross-worker WebSocket fan-out over PostgreSQL LISTEN/NOTIFY.
+
+Each uvicorn worker holds its own WebSocket connections, so a notification
+created in worker A must reach sockets held by worker B. Every worker keeps
+one dedicated asyncpg connection LISTENing on WS_BACKPLANE_CHANNEL;
+``ws_manager`` broadcasts publish a single NOTIFY (through the regular
+connection pool) and each worker, the publisher included, delivers the
+frame to its local sockets when the notification arrives.
+
+Frames must fit the NOTIFY payload limit: ``ws_manager`` splits large
+notification batches, and any frame still too large is delivered to this
+worker's sockets only.
+
+If the listener connection drops, the supervisor reconnects with
+exponential backoff; while it is down, publishes are delivered to local
+sockets directly so this worker's clients still get them. On databases
+other than PostgreSQL the backplane stays in local-only mode.
+
+Domain event handlers need no backplane: the transactional outbox already
+lets any worker claim any event.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Awaitable, Callable
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from database import engine
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# PostgreSQL rejects NOTIFY payloads of 8000 bytes or more; leave room for the envelope
+MAX_PAYLOAD_BYTES = 7800
+
+Deliver = Callable[[dict], Awaitable[None]]
+
+
+class Backplane:
+    """LISTEN/NOTIFY pub/sub with a supervised dedicated listener connection."""
+
+    def __init__(self, channel: str, retry_base_seconds: float = 0.5, retry_max_seconds: float = 30.0):
+        self.channel = channel
+        self.origin = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._retry_base = retry_base_seconds
+        self._retry_max = retry_max_seconds
+        self._deliver: Deliver | None = None
+        self._conn = None
+        self._connected = asyncio.Event()
+        self._lost = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._drain_task: asyncio.Task | None = None
+        self._inbox: asyncio.Queue[dict] = asyncio.Queue()
+        self.published = 0
+        self.received = 0
+        self.reconnects = 0
+
+    @property
+    def enabled(self) -> bool:
+        return make_url(settings.DATABASE_URL).get_backend_name() == "postgresql"
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    def start(self, deliver: Deliver):
+        """Begin listening; ``deliver`` receives every envelope published by any worker."""
+        self._deliver = deliver
+        if not self.enabled:
+            logger.info("[Backplane] non-PostgreSQL database – local delivery only")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._supervise(), name="ws-backplane")
+            self._drain_task = asyncio.create_task(self._drain(), name="ws-backplane-deliver")
+
+    async def stop(self):
+        for task in (self._task, self._drain_task):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._task, self._drain_task) if t), return_exceptions=True)
+        self._task = self._drain_task = None
+        self._deliver = None
+        await self._close()
+
+    async def wait_connected(self, timeout: float | None = None) -> bool:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def publish(self, envelope: dict):
+        """Send an envelope to every worker.
+
+        Works without ``start`` too (e.g. from CLI scripts), since publishing
+        only needs a pooled connection. A started worker whose listener is
+        down delivers to its own sockets instead.
+        """
+        if not self.enabled or (self._deliver is not None and not self.connected):
+            await self._deliver_local(envelope)
+            return
+        message = json.dumps({**envelope, "origin": self.origin}, separators=(",", ":"))
+        if len(message.encode()) > MAX_PAYLOAD_BYTES:
+            await self._deliver_local(envelope)
+            logger.warning(f"[Backplane] {len(message)}-byte frame exceeds NOTIFY limit – delivered locally only")
+            return
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT pg_notify(:channel, :message)"),
+                                   {"channel": self.channel, "message": message})
+                await conn.commit()
+            self.published += 1
+        except Exception as exc:
+            logger.warning(f"[Backplane] publish failed, delivering locally: {exc}")
+            await self._deliver_local(envelope)
+
+    async def _deliver_local(self, envelope: dict):
+        if self._deliver is not None:
+            await self._deliver(envelope)
+
+    # ── Listener connection ────────────────────────────────────────────────
+
+    async def _supervise(self):
+        attempt = 0
+        while True:
+            try:
+                await self._connect()
+                attempt = 0
+                await self._watch()
+                logger.warning("[Backplane] listener connection lost – reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"[Backplane] connect failed: {exc}")
+            await self._close()
+            attempt += 1
+            self.reconnects += 1
+            await asyncio.sleep(min(self._retry_base * 2 ** (attempt - 1), self._retry_max))
+
+    async def _connect(self):
+        import asyncpg
+
+        url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+        self._lost.clear()
+        self._conn = await asyncpg.connect(url.render_as_string(hide_password=False))
+        self._conn.add_termination_listener(lambda _conn: self._lost.set())
+        await self._conn.add_listener(self.channel, self._on_notify)
+        self._connected.set()
+        logger.info(f"[Backplane] listening on '{self.channel}' as {self.origin}")
+
+    async def _watch(self, interval: float = 30.0):
+        """Return once the listener connection is closed or stops answering."""
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), timeout=interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                # Catches half-open TCP connections the termination listener never sees
+                await self._conn.execute("SELECT 1", timeout=10)
+            except Exception:
+                return
+
+    async def _close(self):
+        self._connected.clear()
+        conn, self._conn = self._conn, None
+        if conn is not None and not conn.is_closed():
+            try:
+                await conn.close(timeout=5)
+            except Exception:
+                conn.terminate()
+
+    def _on_notify(self, _conn, _pid, _channel, payload: str):
+        self.received += 1
+        try:
+            envelope = json.loads(payload)
+        except json.JSONDecodeError:
+            logger.warning("[Backplane] dropped malformed message")
+            return
+        self._inbox.put_nowait(envelope)
+
+    async def _drain(self):
+        """Deliver received envelopes one at a time, preserving publish order."""
+        while True:
+            envelope = await self._inbox.get()
+            try:
+                await self._deliver_local(envelope)
+            except Exception as exc:
+                logger.error(f"[Backplane] local delivery failed: {exc}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "connected": self.connected,
+            "origin": self.origin,
+            "published": self.published,
+            "received": self.received,
+            "reconnects": self.reconnects,
+        }
+
+
+# Singleton instance shared across the app
+backplane = Backplane(settings.WS_BACKPLANE_CHANNEL)
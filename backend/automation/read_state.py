@@ -0,0 +1,233 @@
+"""FleetFlow – Per-user notification read state and cached unread counters.
+
+Read state is a watermark plus exceptions: a notification is read by a user
+if it was created at or before their ``read_through`` watermark, or if it
+has a ``notification_reads`` row for them. "Mark all read" is one upsert
+of the watermark (plus dropping that user's now-redundant exceptions);
+marking one notification read inserts one exception. A user with no
+watermark yet has read everything created before their account existed.
+
+Unread counts are kept per user in memory (LRU-bounded, refreshed from the
+database after UNREAD_COUNTER_TTL_SECONDS) and updated incrementally: new
+notifications reach every worker through ``ws_manager.deliver``, and read
+changes are published on the WebSocket backplane, so the bell badge is
+served without a COUNT on every poll. Each change also pushes an
+``unread_count`` frame to the user's open sockets.
+
+A notification can reach ``deliver`` after a cache miss has already counted
+it (coalescing delays frames, and the count runs after commit). Each loaded
+count therefore remembers the ids of the notifications it saw in its last
+few seconds (``overlap_seconds``, which exceeds that delay), and new
+notifications are added only if they are newer than that and not among them.
+Only counts loaded within the overlap need that check, so a broadcast frame
+never walks every cached user.
+"""
+
+import logging
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, delete, exists, and_, or_, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session, dialect_insert
+from models.models import Notification, NotificationRead, NotificationReadState, User
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def read_through(db: AsyncSession, user_id: str) -> datetime:
+    """The user's watermark (their sign-up time until they first mark all read)."""
+    row = (await db.execute(
+        select(NotificationReadState.read_through, User.created_at)
+        .select_from(User)
+        .outerjoin(NotificationReadState, NotificationReadState.user_id == User.id)
+        .where(User.id == user_id)
+    )).first()
+    if row is None:
+        return datetime.min
+    return row.read_through or row.created_at or datetime.min
+
+
+def read_exception(user_id: str):
+    """EXISTS clause: the user read this notification individually."""
+    return exists().where(
+        NotificationRead.user_id == user_id,
+        NotificationRead.notification_id == Notification.id,
+    )
+
+
+def is_read_clause(user_id: str, watermark: datetime):
+    return or_(Notification.created_at <= watermark, read_exception(user_id))
+
+
+def unread_clause(user_id: str, watermark: datetime):
+    """Unread rows: a ``created_at`` index range above the watermark, minus exceptions."""
+    return and_(Notification.created_at > watermark, ~read_exception(user_id))
+
+
+async def count_unread(db: AsyncSession, user_id: str, overlap: timedelta) -> tuple[int, datetime, set[str]]:
+    """Unread count, plus the ids of every notification created in the last ``overlap``
+    (from the same statement as their share of the count) and where that tail starts."""
+    watermark = await read_through(db, user_id)
+    tail_from = datetime.utcnow() - overlap
+    older = (await db.execute(
+        select(func.count(Notification.id))
+        .where(unread_clause(user_id, watermark), Notification.created_at < tail_from)
+    )).scalar() or 0
+    tail = (await db.execute(
+        select(Notification.id, case((unread_clause(user_id, watermark), 1), else_=0))
+        .where(Notification.created_at >= tail_from)
+    )).all()
+    return older + sum(unread for _, unread in tail), tail_from, {notification_id for notification_id, _ in tail}
+
+
+async def mark_read(db: AsyncSession, user_id: str, notification: Notification) -> bool:
+    """Record one notification as read; returns True if it was unread. Commits."""
+    if notification.created_at <= await read_through(db, user_id):
+        return False
+    insert = dialect_insert(db)
+    result = await db.execute(
+        insert(NotificationRead)
+        .values(user_id=user_id, notification_id=notification.id, read_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=[NotificationRead.user_id, NotificationRead.notification_id])
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def move_watermark(db: AsyncSession, user_id: str, now: datetime | None = None) -> datetime:
+    """Move the user's watermark to ``now``; returns it. Commits."""
+    now = now or datetime.utcnow()
+    insert = dialect_insert(db)
+    stmt = insert(NotificationReadState).values(user_id=user_id, read_through=now, updated_at=now)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[NotificationReadState.user_id],
+        set_={"read_through": stmt.excluded.read_through, "updated_at": stmt.excluded.updated_at},
+    ))
+    # Exceptions at or below the watermark no longer say anything
+    await db.execute(delete(NotificationRead).where(NotificationRead.user_id == user_id))
+    await db.commit()
+    return now
+
+
+class _CachedCount:
+    """One user's unread count and what its database snapshot already included."""
+
+    __slots__ = ("count", "seq", "loaded_at", "tail_from", "seen")
+
+    def __init__(self, count: int, seq: int, loaded_at: float, tail_from: datetime, seen: set[str]):
+        self.count = count           # as of notification sequence ``seq``
+        self.seq = seq
+        self.loaded_at = loaded_at
+        self.tail_from = tail_from   # notifications created before this were all counted
+        self.seen = seen             # ids created since tail_from that the count included
+
+    def counted(self, created_at: datetime, notification_id: str) -> bool:
+        return notification_id in self.seen or created_at < self.tail_from
+
+
+class UnreadCounters:
+    """In-memory unread counts for recently active users.
+
+    New notifications bump one worker-wide sequence; a cached count adds
+    the notifications since its own sequence when it is read, so a frame
+    costs O(items), not O(cached users). Only counts loaded within the last
+    ``overlap`` (whose snapshot may already include a late frame's items)
+    are checked item by item.
+    """
+
+    def __init__(self, max_users: int, ttl_seconds: float, overlap_seconds: float):
+        self._counts: OrderedDict[str, _CachedCount] = OrderedDict()
+        self.max_users = max_users
+        self.ttl = ttl_seconds
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._created = 0   # notifications delivered to this worker so far
+        self._recent: deque[tuple[float, int, datetime, str]] = deque()   # (delivered, seq, created_at, id)
+        self._young: deque[_CachedCount] = deque()   # loaded within the last overlap, oldest first
+        self.hits = 0
+        self.misses = 0
+
+    def _settle(self, entry: _CachedCount) -> int:
+        entry.count = max(0, entry.count + self._created - entry.seq)
+        entry.seq = self._created
+        return entry.count
+
+    def cached(self, user_id: str) -> int | None:
+        entry = self._counts.get(user_id)
+        if entry is None or time.monotonic() - entry.loaded_at > self.ttl:
+            return None
+        self._counts.move_to_end(user_id)
+        return self._settle(entry)
+
+    async def get(self, user_id: str, db: AsyncSession | None = None) -> int:
+        count = self.cached(user_id)
+        if count is not None:
+            self.hits += 1
+            return count
+        self.misses += 1
+        seq = self._created
+        if db is None:
+            async with async_session() as session:
+                count, tail_from, seen = await count_unread(session, user_id, self.overlap)
+        else:
+            count, tail_from, seen = await count_unread(db, user_id, self.overlap)
+        entry = _CachedCount(count, seq, time.monotonic(), tail_from, seen)
+        # Frames delivered while the count ran may hold rows it already saw
+        entry.count -= sum(
+            1 for _, item_seq, created_at, item_id in self._recent
+            if item_seq > seq and entry.counted(created_at, item_id)
+        )
+        self._young.append(entry)
+        self._store(user_id, entry)
+        return self._settle(entry)
+
+    def _store(self, user_id: str, entry: _CachedCount):
+        self._counts[user_id] = entry
+        self._counts.move_to_end(user_id)
+        while len(self._counts) > self.max_users:
+            self._counts.popitem(last=False)
+
+    def on_created(self, items: list[dict]):
+        """New notifications exist; each is one more unread for every user whose count missed it."""
+        now = time.monotonic()
+        horizon = now - self.overlap.total_seconds()
+        while self._young and self._young[0].loaded_at < horizon:
+            self._young.popleft()
+        while self._recent and self._recent[0][0] < horizon:
+            self._recent.popleft()
+        for item in items:
+            self._created += 1
+            created_at = datetime.fromisoformat(item["created_at"])
+            self._recent.append((now, self._created, created_at, item["id"]))
+            for entry in self._young:
+                if entry.counted(created_at, item["id"]):
+                    entry.count -= 1   # settled against the sequence, which counts it once more
+
+    def apply(self, user_id: str, *, delta: int = 0, reset: bool = False) -> int | None:
+        """Apply a read change; returns the new count if this worker tracks the user."""
+        entry = self._counts.get(user_id)
+        if entry is None:
+            return None
+        self._settle(entry)
+        entry.count = 0 if reset else max(0, entry.count + delta)
+        return entry.count
+
+    def stats(self) -> dict:
+        return {"users": len(self._counts), "hits": self.hits, "misses": self.misses}
+
+
+async def publish_read_change(user_id: str, *, delta: int = 0, reset: bool = False):
+    """Tell every worker (this one included) that a user's unread count changed."""
+    from automation.pubsub import backplane
+    await backplane.publish({"kind": "read_state", "user_id": user_id, "delta": delta, "reset": reset})
+
+
+# Singleton instance shared across the app
+unread_counters = UnreadCounters(
+    max_users=settings.UNREAD_COUNTER_MAX_USERS,
+    ttl_seconds=settings.UNREAD_COUNTER_TTL_SECONDS,
+    overlap_seconds=settings.WS_RESUME_OVERLAP_SECONDS,   # same bound: coalescing + commit latency + skew
+)
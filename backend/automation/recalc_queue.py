@@ -0,0 +1,118 @@
+"""FleetFlow – Coalescing cost recalculation queue.
+
+FuelLogged / MaintenanceCreated events only mark (vehicle, period) pairs as
+dirty. A background worker waits for a short quiet window (or a maximum
+delay under sustained load), then recalculates each dirty vehicle once and
+checks each touched period's fleet budget once per flush, so a burst of 300
+fuel receipts costs one budget check instead of 300 fleet re-aggregations.
+Cost totals themselves are kept current by the running ledger (cost_ledger).
+"""
+
+import asyncio
+import logging
+import time
+
+from database import async_session
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class CostRecalcQueue:
+    """Debounced set of dirty (vehicle_id, year, month) keys with a single flush worker."""
+
+    def __init__(self, quiet_seconds: float, max_delay_seconds: float):
+        self._quiet = quiet_seconds
+        self._max_delay = max_delay_seconds
+        self._dirty: set[tuple[str, int, int]] = set()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def mark_dirty(self, vehicle_id: str, year: int, month: int):
+        """Schedule a recalculation of vehicle_id's costs for the given period."""
+        self._dirty.add((vehicle_id, year, month))
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self.start()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="cost-recalc-queue")
+            logger.info("[RecalcQueue] worker started")
+
+    async def stop(self):
+        """Stop the worker and flush whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            first_marked = time.monotonic()
+            # Debounce: keep extending the window while events keep arriving,
+            # but never hold dirty keys longer than the maximum delay.
+            while True:
+                self._wakeup.clear()
+                remaining = self._max_delay - (time.monotonic() - first_marked)
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(self._quiet, remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as exc:
+                logger.error(f"[RecalcQueue] flush failed: {exc}")
+
+    async def flush(self) -> int:
+        """Recalculate all dirty vehicles, then check each touched period's budget once."""
+        async with self._flush_lock:
+            if not self._dirty:
+                return 0
+            batch, self._dirty = self._dirty, set()
+
+            from automation.cost_aggregator import recalculate_vehicle_costs
+            from automation.cost_ledger import check_budget_threshold
+
+            periods = sorted({(year, month) for _, year, month in batch})
+            started = time.monotonic()
+            async with async_session() as db:
+                for vehicle_id, year, month in sorted(batch):
+                    try:
+                        await recalculate_vehicle_costs(db, vehicle_id, year, month, update_fleet=False)
+                    except Exception as exc:
+                        logger.error(f"[RecalcQueue] vehicle={vehicle_id} {year}-{month:02d} failed: {exc}")
+                        await db.rollback()
+                for year, month in periods:
+                    try:
+                        await check_budget_threshold(db, year, month)
+                    except Exception as exc:
+                        logger.error(f"[RecalcQueue] fleet {year}-{month:02d} failed: {exc}")
+                        await db.rollback()
+
+            elapsed = int((time.monotonic() - started) * 1000)
+            logger.info(
+                f"[RecalcQueue] flushed vehicles={len(batch)} periods={len(periods)} duration={elapsed}ms"
+            )
+            return len(batch)
+
+
+# Singleton instance shared across the app
+recalc_queue = CostRecalcQueue(
+    quiet_seconds=settings.COST_RECALC_QUIET_SECONDS,
+    max_delay_seconds=settings.COST_RECALC_MAX_DELAY_SECONDS,
+)
@@ -0,0 +1,377 @@
+"""FleetFlow – Domain event replay engine.
+
+Streams ``domain_events`` in (created_at, id) order through a server-side
+cursor (``yield_per``), so memory stays bounded regardless of history size,
+and feeds them to projections that rebuild derived tables:
+
+- ``analytics``  per-vehicle and fleet monthly cost summaries
+- ``fuel_state`` streaming fuel anomaly buckets, rebuilt from fuel_logs and
+                 trips for the days the replayed events touch
+- ``odometer``   re-applies TripCompleted distance for events that have no
+                 odometer receipt yet (see ``first_delivery``)
+- ``counters``   dashboard counters, re-derived from source after the replay
+- ``handler:<name>`` re-runs one registered event handler as-is
+
+Events are partitioned by ``hash(vehicle_id)`` into bounded queues, one
+worker per partition, so a vehicle's events are applied in order while
+different vehicles replay in parallel. Each worker applies events in
+batches of ``batch_size`` per transaction.
+
+Replay reads only committed history and writes through the same upserts
+the live path uses, so the API can stay up while it runs.
+"""
+
+import asyncio
+import logging
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import async_session
+from models.models import DomainEvent, EventHandlerReceipt, Vehicle
+from automation.event_dispatcher import Events, run_handlers, handler_name, registered_handlers
+from automation.periods import month_of
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReplayEvent:
+    id: str
+    event_type: str
+    payload: dict
+    created_at: datetime
+
+    @property
+    def day(self) -> date:
+        raw = self.payload.get("date")
+        return date.fromisoformat(raw) if raw else self.created_at.date()
+
+
+class Projection:
+    """A derived table rebuilt from events.
+
+    ``apply`` folds an event into per-batch ``state`` (no I/O); ``flush``
+    writes a batch's state inside the worker's transaction. ``reset`` runs
+    once before the replay and ``finalize`` once after every partition is done.
+    """
+
+    name: str = ""
+    event_types: frozenset[str] = frozenset()
+
+    def new_state(self):
+        return {}
+
+    def apply(self, state, event: ReplayEvent):
+        pass
+
+    async def flush(self, db: AsyncSession, state):
+        pass
+
+    async def reset(self, db: AsyncSession, since: datetime | None, until: datetime | None):
+        pass
+
+    async def finalize(self, db: AsyncSession):
+        pass
+
+
+class AnalyticsProjection(Projection):
+    """Monthly cost summaries: each touched (vehicle, month) is recalculated once per batch."""
+
+    name = "analytics"
+    event_types = frozenset({Events.FUEL_LOGGED, Events.MAINTENANCE_CREATED, Events.TRIP_COMPLETED})
+
+    def __init__(self):
+        self.periods: set[tuple[int, int]] = set()
+
+    def new_state(self):
+        return set()
+
+    def apply(self, state, event):
+        vehicle_id = event.payload.get("vehicle_id")
+        if vehicle_id:
+            state.add((vehicle_id, *month_of(event.day)))
+
+    async def flush(self, db, state):
+        from automation.cost_aggregator import recalculate_vehicle_costs
+        for vehicle_id, year, month in sorted(state):
+            await recalculate_vehicle_costs(db, vehicle_id, year, month, update_fleet=False)
+            self.periods.add((year, month))
+
+    async def finalize(self, db):
+        from automation.cost_aggregator import recalculate_fleet_costs
+        for year, month in sorted(self.periods):
+            # A rebuild must not raise live budget alerts
+            await recalculate_fleet_costs(db, year, month, alert=False)
+
+
+class OdometerProjection(Projection):
+    """Adds completed-trip distance to vehicle odometers (one UPDATE per vehicle per batch).
+
+    Shares the live handler's (event, handler) receipts: events it already
+    applied are skipped, and receipts for the rest are written in the same
+    transaction as the odometer updates, so overlapping replays (or a replay
+    racing the outbox) never add a trip twice. Events from before receipts
+    existed carry none, which is why the CLI insists on a bounded window.
+    """
+
+    name = "odometer"
+    event_types = frozenset({Events.TRIP_COMPLETED})
+    handler = "automation.event_handlers.on_trip_completed"
+
+    def new_state(self):
+        return {}
+
+    def apply(self, state, event):
+        vehicle_id = event.payload.get("vehicle_id")
+        if vehicle_id and event.payload.get("distance_km"):
+            state[event.id] = (vehicle_id, float(event.payload["distance_km"]))
+
+    async def flush(self, db, state):
+        if not state:
+            return
+        from database import dialect_insert
+        now = datetime.utcnow()
+        applied = set((await db.execute(
+            dialect_insert(db)(EventHandlerReceipt)
+            .values([{"event_id": event_id, "handler": self.handler, "applied_at": now} for event_id in state])
+            .on_conflict_do_nothing(index_elements=[EventHandlerReceipt.event_id, EventHandlerReceipt.handler])
+            .returning(EventHandlerReceipt.event_id)
+        )).scalars().all())
+        per_vehicle = defaultdict(float)
+        for event_id in applied:
+            vehicle_id, km = state[event_id]
+            per_vehicle[vehicle_id] += km
+        for vehicle_id, km in per_vehicle.items():
+            await db.execute(
+                update(Vehicle).where(Vehicle.id == vehicle_id)
+                .values(odometer_km=Vehicle.odometer_km + km)
+                .execution_options(synchronize_session=False)
+            )
+
+
+class FuelStateProjection(Projection):
+    """Streaming fuel buckets, rebuilt from the raw tables for the affected days.
+
+    Events only locate the damage: edits and deletes emit none and older
+    FuelLogged payloads carry no litres, so the buckets are recomputed from
+    fuel_logs and trips. An unbounded replay rebuilds the whole window; a
+    bounded one rebuilds every day from the earliest touched by a replayed
+    event (or the replay's start) to the latest (or its end).
+    """
+
+    name = "fuel_state"
+    event_types = frozenset({Events.FUEL_LOGGED, Events.TRIP_COMPLETED})
+
+    def __init__(self):
+        self.bounded = (False, False)
+        self.first_day: date | None = None
+        self.last_day: date | None = None
+
+    def new_state(self):
+        return set()
+
+    def apply(self, state, event):
+        state.add(event.day)
+
+    async def flush(self, db, state):
+        for day in state:
+            self.first_day = min(self.first_day or day, day)
+            self.last_day = max(self.last_day or day, day)
+
+    async def reset(self, db, since, until):
+        self.bounded = (since is not None, until is not None)
+        self.first_day = since.date() if since else None
+        self.last_day = until.date() if until else None
+
+    async def finalize(self, db):
+        from automation.fuel_state import rebuild_fuel_state
+        since = self.first_day if self.bounded[0] else None
+        until = self.last_day + timedelta(days=1) if self.bounded[1] else None
+        buckets = await rebuild_fuel_state(db, since=since, until=until)
+        logger.info(f"[Replay] fuel buckets rebuilt for {since or 'window start'}..{until or 'today'}: {buckets} rows")
+
+
+class CounterProjection(Projection):
+    """Dashboard counters are not event-sourced; re-derive them once the replay is done."""
+
+    name = "counters"
+
+    async def finalize(self, db):
+        from automation.fleet_counters import rebuild_fleet_counters
+        from automation.kpi_engine import invalidate_dashboard_kpis
+        drift = await rebuild_fleet_counters(db)
+        invalidate_dashboard_kpis()
+        if drift:
+            logger.warning(f"[Replay] counters corrected: {drift}")
+
+
+class HandlerProjection(Projection):
+    """Re-runs one registered handler per event (handlers manage their own sessions)."""
+
+    def __init__(self, qualified_name: str):
+        self.name = f"handler:{qualified_name}"
+        self.handler = qualified_name
+        self.event_types = frozenset(
+            event_type for event_type, fns in registered_handlers().items()
+            if any(handler_name(fn) == qualified_name for fn in fns)
+        )
+        if not self.event_types:
+            raise ValueError(f"no registered handler named {qualified_name!r}")
+
+    def new_state(self):
+        return []
+
+    def apply(self, state, event):
+        state.append(event)
+
+    async def flush(self, db, state):
+        for event in state:
+            skip = {handler_name(fn) for fn in registered_handlers().get(event.event_type, [])} - {self.handler}
+            # With the event id, handlers guarded by first_delivery skip events they already applied
+            _, failed = await run_handlers(event.event_type, event.payload, skip=skip, event_id=event.id)
+            if failed:
+                raise RuntimeError(f"event {event.id}: {failed[self.handler]}")
+
+
+PROJECTIONS = {
+    p.name: p for p in (AnalyticsProjection, FuelStateProjection, OdometerProjection, CounterProjection)
+}
+
+
+def build_projections(names: list[str]) -> list[Projection]:
+    projections = []
+    for name in names:
+        if name.startswith("handler:"):
+            projections.append(HandlerProjection(name.split(":", 1)[1]))
+        elif name in PROJECTIONS:
+            projections.append(PROJECTIONS[name]())
+        else:
+            raise ValueError(f"unknown projection {name!r} (choose from {', '.join(PROJECTIONS)} or handler:<name>)")
+    return projections
+
+
+@dataclass
+class ReplayStats:
+    read: int = 0
+    applied: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    batches: int = 0
+    elapsed: float = 0.0
+    error: Exception | None = None
+
+    @property
+    def rate(self) -> float:
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+
+def partition_of(payload: dict, partitions: int) -> int:
+    """Stable partition for an event; events without a vehicle go to partition 0."""
+    vehicle_id = payload.get("vehicle_id")
+    if not vehicle_id or partitions == 1:
+        return 0
+    return zlib.crc32(vehicle_id.encode()) % partitions
+
+
+async def replay_events(
+    projections: list[Projection],
+    *,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    event_types: set[str] | None = None,
+    partitions: int = 4,
+    batch_size: int = 500,
+    queue_size: int = 2000,
+    fetch_size: int = 1000,
+) -> ReplayStats:
+    """Replay events in ``[since, until)`` through the projections and return stats."""
+    wanted = set().union(*(p.event_types for p in projections))
+    if event_types:
+        wanted &= event_types
+    stats = ReplayStats()
+    started = time.monotonic()
+
+    async with async_session() as db:
+        for projection in projections:
+            await projection.reset(db, since, until)
+        await db.commit()
+
+    queues = [asyncio.Queue(maxsize=queue_size) for _ in range(partitions)]
+    workers = [asyncio.create_task(_partition_worker(q, projections, batch_size, stats)) for q in queues]
+
+    try:
+        if wanted:
+            query = (
+                select(DomainEvent.id, DomainEvent.event_type, DomainEvent.payload, DomainEvent.created_at)
+                .where(DomainEvent.event_type.in_(wanted))
+                .order_by(DomainEvent.created_at, DomainEvent.id)
+                .execution_options(yield_per=fetch_size)
+            )
+            if since:
+                query = query.where(DomainEvent.created_at >= since)
+            if until:
+                query = query.where(DomainEvent.created_at < until)
+
+            async with async_session() as reader:
+                result = await reader.stream(query)
+                async for row in result:
+                    event = ReplayEvent(row.id, row.event_type, row.payload, row.created_at)
+                    stats.read += 1
+                    # put() blocks when a partition falls behind, bounding memory
+                    await queues[partition_of(event.payload, partitions)].put(event)
+                    if stats.error:
+                        break
+    finally:
+        for q in queues:
+            await q.put(None)
+        await asyncio.gather(*workers)
+
+    if stats.error:
+        raise stats.error
+
+    async with async_session() as db:
+        for projection in projections:
+            await projection.finalize(db)
+        await db.commit()
+
+    stats.elapsed = time.monotonic() - started
+    return stats
+
+
+async def _partition_worker(queue: asyncio.Queue, projections: list[Projection], batch_size: int, stats: ReplayStats):
+    async with async_session() as db:
+        states = {p.name: p.new_state() for p in projections}
+        pending = 0
+
+        async def flush():
+            nonlocal states, pending
+            for projection in projections:
+                await projection.flush(db, states[projection.name])
+            await db.commit()
+            states = {p.name: p.new_state() for p in projections}
+            stats.batches += 1
+            pending = 0
+
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                for projection in projections:
+                    if event.event_type in projection.event_types:
+                        projection.apply(states[projection.name], event)
+                        stats.applied[projection.name] += 1
+                pending += 1
+                if pending >= batch_size:
+                    await flush()
+            if pending:
+                await flush()
+        except Exception as exc:
+            await db.rollback()
+            stats.error = stats.error or exc
+            # Keep draining so the reader never blocks on this partition's full queue
+            while await queue.get() is not None:
+                pass
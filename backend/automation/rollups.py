@@ -0,0 +1,173 @@
+"""FleetFlow – Daily analytics rollups.
+
+Aggregates raw trips, fuel logs and maintenance logs into one row per
+(day, vehicle) and (day, driver), so trend queries read a few hundred
+rollup rows instead of scanning the raw tables. Rebuilding a day range is
+idempotent: rows in the range are replaced wholesale.
+
+Trips are bucketed by scheduled departure day and counted once completed,
+matching the monthly cost aggregator.
+
+Writes that change a day's totals (a trip completed or edited, a fuel or
+maintenance log created, edited or deleted) mark that day dirty in the same
+transaction, however old it is. The periodic job rebuilds the dirty days
+along with the trailing lookback window.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import select, func, delete, insert, and_, or_, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import dialect_insert
+from models.models import (
+    Trip, FuelLog, MaintenanceLog, TripStatus, DailyVehicleRollup, DailyDriverRollup, RollupDirtyDay,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _as_date(value) -> date:
+    # Some drivers hand back DATE() results as ISO strings
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+async def rebuild_rollups(db: AsyncSession, start: date, end: date) -> tuple[int, int]:
+    """Recompute rollups for days in ``[start, end)`` and commit.
+
+    Returns ``(vehicle_rows, driver_rows)`` written.
+    """
+    start_dt = datetime.combine(start, datetime.min.time())
+    end_dt = datetime.combine(end, datetime.min.time())
+    trip_day = func.date(Trip.scheduled_departure, type_=Date)
+    completed_in_range = (
+        Trip.status == TripStatus.COMPLETED,
+        Trip.scheduled_departure >= start_dt,
+        Trip.scheduled_departure < end_dt,
+    )
+
+    vehicle_rows: dict[tuple[date, str], dict] = defaultdict(lambda: {
+        "distance_km": 0.0, "fuel_liters": 0.0, "fuel_cost": 0.0, "maintenance_cost": 0.0, "trip_count": 0,
+    })
+
+    for day, vehicle_id, distance, trips in (await db.execute(
+        select(trip_day, Trip.vehicle_id, func.coalesce(func.sum(Trip.distance_km), 0), func.count(Trip.id))
+        .where(*completed_in_range)
+        .group_by(trip_day, Trip.vehicle_id)
+    )).all():
+        row = vehicle_rows[(_as_date(day), vehicle_id)]
+        row["distance_km"] = float(distance)
+        row["trip_count"] = int(trips)
+
+    for day, vehicle_id, litres, cost in (await db.execute(
+        select(
+            FuelLog.date, FuelLog.vehicle_id,
+            func.coalesce(func.sum(FuelLog.quantity_liters), 0),
+            func.coalesce(func.sum(FuelLog.total_cost), 0),
+        )
+        .where(FuelLog.date >= start, FuelLog.date < end)
+        .group_by(FuelLog.date, FuelLog.vehicle_id)
+    )).all():
+        row = vehicle_rows[(day, vehicle_id)]
+        row["fuel_liters"] = float(litres)
+        row["fuel_cost"] = float(cost)
+
+    for day, vehicle_id, cost in (await db.execute(
+        select(MaintenanceLog.scheduled_date, MaintenanceLog.vehicle_id, func.coalesce(func.sum(MaintenanceLog.cost), 0))
+        .where(MaintenanceLog.scheduled_date >= start, MaintenanceLog.scheduled_date < end)
+        .group_by(MaintenanceLog.scheduled_date, MaintenanceLog.vehicle_id)
+    )).all():
+        vehicle_rows[(day, vehicle_id)]["maintenance_cost"] = float(cost)
+
+    driver_rows = [
+        {
+            "day": _as_date(day), "driver_id": driver_id,
+            "distance_km": float(distance), "fuel_liters": float(litres),
+            "trip_cost": float(cost), "trip_count": int(trips),
+        }
+        for day, driver_id, distance, litres, cost, trips in (await db.execute(
+            select(
+                trip_day, Trip.driver_id,
+                func.coalesce(func.sum(Trip.distance_km), 0),
+                func.coalesce(func.sum(Trip.fuel_consumed_liters), 0),
+                func.coalesce(func.sum(Trip.cost), 0),
+                func.count(Trip.id),
+            )
+            .where(*completed_in_range)
+            .group_by(trip_day, Trip.driver_id)
+        )).all()
+    ]
+
+    await db.execute(delete(DailyVehicleRollup).where(DailyVehicleRollup.day >= start, DailyVehicleRollup.day < end))
+    await db.execute(delete(DailyDriverRollup).where(DailyDriverRollup.day >= start, DailyDriverRollup.day < end))
+    if vehicle_rows:
+        await db.execute(insert(DailyVehicleRollup), [
+            {"day": day, "vehicle_id": vehicle_id, **values}
+            for (day, vehicle_id), values in vehicle_rows.items()
+        ])
+    if driver_rows:
+        await db.execute(insert(DailyDriverRollup), driver_rows)
+    await db.commit()
+
+    return len(vehicle_rows), len(driver_rows)
+
+
+async def mark_rollup_days(db: AsyncSession, *days: date | datetime | None):
+    """Mark days whose rollups a pending write changes (no commit)."""
+    days = {d.date() if isinstance(d, datetime) else d for d in days if d is not None}
+    if not days:
+        return
+    now = datetime.utcnow()
+    stmt = dialect_insert(db)(RollupDirtyDay).values([{"day": d, "marked_at": now} for d in sorted(days)])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[RollupDirtyDay.day], set_={"marked_at": stmt.excluded.marked_at},
+    ))
+
+
+async def pending_rollup_days(db: AsyncSession) -> list[tuple[date, datetime]]:
+    """Committed dirty marks as ``(day, marked_at)``, oldest day first."""
+    rows = (await db.execute(
+        select(RollupDirtyDay.day, RollupDirtyDay.marked_at).order_by(RollupDirtyDay.day)
+    )).all()
+    return [(_as_date(day), marked_at) for day, marked_at in rows]
+
+
+async def clear_rollup_days(db: AsyncSession, marks: list[tuple[date, datetime]]):
+    """Delete the given marks and commit; a day re-marked since (newer marked_at) stays dirty."""
+    if marks:
+        await db.execute(delete(RollupDirtyDay).where(or_(*(
+            and_(RollupDirtyDay.day == day, RollupDirtyDay.marked_at == marked_at) for day, marked_at in marks
+        ))))
+    await db.commit()
+
+
+def day_ranges(days) -> list[tuple[date, date]]:
+    """Collapse days into ``[start, end)`` runs of consecutive days."""
+    ranges: list[tuple[date, date]] = []
+    for day in sorted(set(days)):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1] = (ranges[-1][0], day + timedelta(days=1))
+        else:
+            ranges.append((day, day + timedelta(days=1)))
+    return ranges
+
+
+async def earliest_activity_day(db: AsyncSession) -> date | None:
+    """First day with any trip, fuel or maintenance record (backfill lower bound)."""
+    candidates = [
+        (await db.execute(select(func.min(FuelLog.date)))).scalar(),
+        (await db.execute(select(func.min(MaintenanceLog.scheduled_date)))).scalar(),
+        (await db.execute(select(func.min(Trip.scheduled_departure)))).scalar(),
+    ]
+    days = [c.date() if isinstance(c, datetime) else _as_date(c) for c in candidates if c is not None]
+    return min(days) if days else None
+
+
+def day_batches(start: date, end: date, batch_days: int):
+    """Yield consecutive ``[batch_start, batch_end)`` windows covering ``[start, end)``."""
+    cursor = start
+    while cursor < end:
+        batch_end = min(cursor + timedelta(days=batch_days), end)
+        yield cursor, batch_end
+        cursor = batch_end
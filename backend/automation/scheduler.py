@@ -68,6 +68,31 @@ def setup_scheduler():
         misfire_grace_time=3600,
     )
 
+    # ── Read models: Fleet counter reconciliation (daily at 01:30) ────────
+    from automation.tasks.counter_reconciliation import run_counter_reconciliation
+    scheduler.add_job(
+        run_counter_reconciliation,
+        CronTrigger(hour=1, minute=30),
+        id="counter_reconciliation",
+        name="Fleet Counter Reconciliation",
+        replace_existing=True,
+        misfire_grace_time=3600,
+    )
+
+    # ── Analytics: Incremental daily rollups (every ROLLUP_INTERVAL_MINUTES) ──
+    from automation.tasks.daily_rollup import run_daily_rollup
+    from config import get_settings
+    scheduler.add_job(
+        run_daily_rollup,
+        IntervalTrigger(minutes=get_settings().ROLLUP_INTERVAL_MINUTES),
+        id="daily_rollup",
+        name="Daily Analytics Rollup",
+        replace_existing=True,
+        misfire_grace_time=600,
+        coalesce=True,
+        max_instances=1,
+    )
+
     logger.info("[Scheduler] All automation jobs registered.")
 
 
@@ -0,0 +1,46 @@
+"""FleetFlow – Fleet Counter Reconciliation (daily background job).
+
+Rebuilds the fleet_counters read model from the source tables and reports
+any drift left behind by code paths that changed data without a delta.
+"""
+
+import logging
+import time
+
+from database import async_session
+from models.models import AutomationLog
+from automation.fleet_counters import rebuild_fleet_counters
+from automation.kpi_engine import invalidate_dashboard_kpis
+
+logger = logging.getLogger(__name__)
+
+
+async def run_counter_reconciliation():
+    """Daily job: recount fleet_counters from scratch and log drifted keys."""
+    start = time.monotonic()
+    processed = 0
+    errors = None
+
+    async with async_session() as db:
+        try:
+            drift = await rebuild_fleet_counters(db)
+            processed = len(drift)
+            for key, (stored, actual) in sorted(drift.items()):
+                logger.warning(f"[CounterReconciliation] drift {key}: stored={stored} actual={actual}")
+            invalidate_dashboard_kpis()
+        except Exception as exc:
+            errors = str(exc)
+            logger.error(f"[CounterReconciliation] Error: {exc}")
+            await db.rollback()
+        finally:
+            elapsed = int((time.monotonic() - start) * 1000)
+            log = AutomationLog(
+                job_name="counter_reconciliation",
+                status="error" if errors else "success",
+                records_processed=processed,
+                error_message=errors,
+                duration_ms=elapsed,
+            )
+            db.add(log)
+            await db.commit()
+            logger.info(f"[CounterReconciliation] done – drifted_keys={processed}, duration={elapsed}ms")
@@ -0,0 +1,53 @@
+"""FleetFlow – Incremental Daily Rollup (periodic background job).
+
+Recomputes the daily vehicle/driver rollups for the trailing
+ROLLUP_LOOKBACK_DAYS (including today) plus every older day marked dirty by
+a late write (see rollups.mark_rollup_days), without touching the rest of
+history.
+"""
+
+import logging
+import time
+from datetime import date, timedelta
+
+from database import async_session
+from models.models import AutomationLog
+from automation.rollups import rebuild_rollups, pending_rollup_days, clear_rollup_days, day_ranges
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+async def run_daily_rollup():
+    """Periodic job: refresh the trailing days of the analytics rollups."""
+    start = time.monotonic()
+    processed = 0
+    errors = None
+
+    async with async_session() as db:
+        try:
+            end_day = date.today() + timedelta(days=1)
+            start_day = end_day - timedelta(days=settings.ROLLUP_LOOKBACK_DAYS + 1)
+            marks = await pending_rollup_days(db)
+            trailing = (start_day + timedelta(days=i) for i in range((end_day - start_day).days))
+            for range_start, range_end in day_ranges([*trailing, *(day for day, _ in marks)]):
+                vehicle_rows, driver_rows = await rebuild_rollups(db, range_start, range_end)
+                processed += vehicle_rows + driver_rows
+            await clear_rollup_days(db, marks)
+        except Exception as exc:
+            errors = str(exc)
+            logger.error(f"[DailyRollup] Error: {exc}")
+            await db.rollback()
+        finally:
+            elapsed = int((time.monotonic() - start) * 1000)
+            log = AutomationLog(
+                job_name="daily_rollup",
+                status="error" if errors else "success",
+                records_processed=processed,
+                error_message=errors,
+                duration_ms=elapsed,
+            )
+            db.add(log)
+            await db.commit()
+            logger.info(f"[DailyRollup] done – rows={processed}, duration={elapsed}ms")
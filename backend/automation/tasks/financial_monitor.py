@@ -3,15 +3,11 @@
 import logging
 import time
 from datetime import datetime
-from sqlalchemy import select, func
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import async_session
-from models.models import (
-    FuelLog, MaintenanceLog, AutomationLog,
-    NotificationType, NotificationSeverity
-)
-from automation.notification_helper import create_notification
+from models.models import AutomationLog, NotificationType, NotificationSeverity
+from automation.notification_helper import create_notifications_bulk
+from automation.cost_ledger import get_fleet_month_total, budget_rule, BUDGET_SUPPRESSION_WINDOW
 from config import get_settings
 
 logger = logging.getLogger(__name__)
@@ -29,29 +25,14 @@ async def run_financial_monitor():
             now = datetime.utcnow()
             year, month = now.year, now.month
 
-            fuel_cost = (await db.execute(
-                select(func.coalesce(func.sum(FuelLog.total_cost), 0)).where(
-                    func.extract("year", FuelLog.date) == year,
-                    func.extract("month", FuelLog.date) == month,
-                )
-            )).scalar() or 0
-
-            maint_cost = (await db.execute(
-                select(func.coalesce(func.sum(MaintenanceLog.cost), 0)).where(
-                    func.extract("year", MaintenanceLog.scheduled_date) == year,
-                    func.extract("month", MaintenanceLog.scheduled_date) == month,
-                )
-            )).scalar() or 0
-
-            total = float(fuel_cost) + float(maint_cost)
+            total = await get_fleet_month_total(db, year, month)
             threshold = settings.BUDGET_THRESHOLD_MONTHLY
 
             logger.info(f"[FinancialMonitor] {year}-{month:02d} total=₹{total:,.2f} threshold=₹{threshold:,.2f}")
 
             if total > threshold:
                 pct_over = ((total - threshold) / threshold) * 100
-                await create_notification(
-                    db,
+                rows = await create_notifications_bulk(db, [dict(
                     type=NotificationType.FINANCIAL,
                     severity=NotificationSeverity.CRITICAL,
                     title="💸 Monthly Budget Exceeded",
@@ -59,8 +40,9 @@ async def run_financial_monitor():
                         f"Fleet operational cost for {year}-{month:02d} is ₹{total:,.2f} "
                         f"({pct_over:.1f}% over threshold of ₹{threshold:,.2f})."
                     ),
-                )
-                processed += 1
+                    rule=budget_rule(year, month),
+                )], suppression_window=BUDGET_SUPPRESSION_WINDOW)
+                processed += len(rows)
 
         except Exception as exc:
             errors = str(exc)
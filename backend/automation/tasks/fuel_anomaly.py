@@ -1,114 +1,219 @@
 """FleetFlow – Fuel Anomaly Detector.
 
 Compares last-30-day consumption (L/100km) against the 90-day baseline.
-If deviation exceeds FUEL_ANOMALY_THRESHOLD_PCT → creates an anomaly notification.
+
+Windowed litres and distance come from two grouped queries (fuel logs and
+completed trips, split into recent/baseline with CASE), for one vehicle or
+the whole fleet. Deviation is then flagged according to FUEL_ANOMALY_MODE:
+
+- ``threshold``: |deviation| >= FUEL_ANOMALY_THRESHOLD_PCT (original behaviour)
+- ``zscore``:    |z| of the deviation against the rest of its peer group
+                 (same make and fuel type) >= FUEL_ANOMALY_SCORE
+- ``mad``:       robust z (median / median absolute deviation, or mean
+                 absolute deviation when the MAD is 0) within the peer
+                 group >= FUEL_ANOMALY_SCORE
+
+Peer groups smaller than FUEL_ANOMALY_MIN_PEERS fall back to threshold mode.
+The per-event check has no peers to compare against and always uses threshold;
+it evaluates the incrementally maintained buckets in ``automation.fuel_state``,
+which the nightly scan rebuilds from raw history.
 """
 
 import logging
 import time
 from datetime import datetime, timedelta
-from sqlalchemy import select, func
+from collections import defaultdict
+import numpy as np
+from sqlalchemy import select, func, case
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import async_session
 from models.models import (
-    Vehicle, FuelLog, Trip, AutomationLog,
+    Vehicle, FuelLog, Trip, TripStatus, AutomationLog,
     NotificationType, NotificationSeverity
 )
-from automation.notification_helper import create_notification
+from automation.notification_helper import create_notifications_bulk
+from automation.fuel_state import (
+    FuelWindows, RECENT_DAYS, BASELINE_DAYS, load_vehicle_window, rebuild_fuel_state,
+)
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+MAD_SCALE = 0.6745  # makes the MAD-based score comparable to a normal z-score
+MEANAD_SCALE = 0.7979  # same, for the mean absolute deviation (MAD = 0 fallback)
 
-async def check_vehicle_fuel_anomaly(db: AsyncSession, vehicle_id: str):
-    """Check a single vehicle for fuel consumption anomaly (called on FuelLogged event)."""
-    now = datetime.utcnow()
 
-    # 30-day window
-    last_30 = now - timedelta(days=30)
-    last_90 = now - timedelta(days=90)
-
-    recent_fuel = (await db.execute(
-        select(func.sum(FuelLog.quantity_liters)).where(
-            FuelLog.vehicle_id == vehicle_id,
-            FuelLog.date >= last_30.date(),
-        )
-    )).scalar() or 0
+async def load_fuel_windows(db: AsyncSession, now: datetime, vehicle_id: str | None = None) -> FuelWindows:
+    """Fetch windowed fuel and distance sums with one grouped query per table."""
+    last_30 = now - timedelta(days=RECENT_DAYS)
+    last_90 = now - timedelta(days=BASELINE_DAYS)
 
-    recent_dist = (await db.execute(
-        select(func.sum(Trip.distance_km)).where(
-            Trip.vehicle_id == vehicle_id,
-            Trip.status == "completed",
-            Trip.actual_departure >= last_30,
+    def window_sum(value, column, recent_from):
+        # (recent, baseline) split; rows are already limited to the 90-day window
+        return (
+            func.coalesce(func.sum(case((column >= recent_from, value), else_=0)), 0),
+            func.coalesce(func.sum(case((column < recent_from, value), else_=0)), 0),
         )
-    )).scalar() or 0
 
-    if recent_dist <= 0 or recent_fuel <= 0:
-        return  # Not enough data
+    fuel_query = (
+        select(FuelLog.vehicle_id, *window_sum(FuelLog.quantity_liters, FuelLog.date, last_30.date()))
+        .where(FuelLog.date >= last_90.date())
+        .group_by(FuelLog.vehicle_id)
+    )
+    trip_query = (
+        select(Trip.vehicle_id, *window_sum(Trip.distance_km, Trip.actual_departure, last_30))
+        .where(Trip.status == TripStatus.COMPLETED, Trip.actual_departure >= last_90)
+        .group_by(Trip.vehicle_id)
+    )
+    if vehicle_id:
+        fuel_query = fuel_query.where(FuelLog.vehicle_id == vehicle_id)
+        trip_query = trip_query.where(Trip.vehicle_id == vehicle_id)
+
+    fuel = {vid: (float(r), float(b)) for vid, r, b in (await db.execute(fuel_query)).all()}
+    dist = {vid: (float(r), float(b)) for vid, r, b in (await db.execute(trip_query)).all()}
+
+    vehicle_ids = sorted(fuel.keys() & dist.keys())
+    fuel_arr = np.array([fuel[v] for v in vehicle_ids], dtype=float).reshape(-1, 2)
+    dist_arr = np.array([dist[v] for v in vehicle_ids], dtype=float).reshape(-1, 2)
+    return FuelWindows(vehicle_ids, fuel_arr[:, 0], dist_arr[:, 0], fuel_arr[:, 1], dist_arr[:, 1])
+
+
+def efficiency_deviation(w: FuelWindows) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return ``(valid, recent_l100, baseline_l100, deviation_pct)``; deviation is signed."""
+    valid = (w.recent_fuel > 0) & (w.recent_dist > 0) & (w.baseline_fuel > 0) & (w.baseline_dist > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recent = np.where(valid, w.recent_fuel / w.recent_dist * 100, np.nan)
+        baseline = np.where(valid, w.baseline_fuel / w.baseline_dist * 100, np.nan)
+        deviation = (recent - baseline) / baseline * 100
+    return valid, recent, baseline, deviation
+
+
+def peer_scores(deviation: np.ndarray, groups: np.ndarray, mode: str, min_peers: int) -> np.ndarray:
+    """Score each deviation against its peer group; NaN where the group is too small.
+
+    zscore compares each vehicle with the mean / std of the *other* members:
+    including itself caps |z| at (n-1)/sqrt(n), so a group of 5 could never
+    reach a score of 3. NaN (threshold fallback) where the others all agree.
+    mad falls back to the mean absolute deviation when over half the group
+    shares one value (MAD = 0); a group that is entirely identical scores 0.
+    """
+    scores = np.full(deviation.shape, np.nan)
+    for group in np.unique(groups):
+        members = groups == group
+        values = deviation[members]
+        n = values.size
+        if n < min_peers:
+            continue
+        if mode == "mad":
+            center = np.median(values)
+            spread = np.median(np.abs(values - center)) / MAD_SCALE
+            if spread == 0:
+                spread = np.mean(np.abs(values - center)) / MEANAD_SCALE
+            scores[members] = (values - center) / spread if spread > 0 else 0.0
+        else:
+            # Leave-one-out mean and (population) std, vectorised over the group
+            others_mean = (values.sum() - values) / (n - 1)
+            others_sq = (np.square(values).sum() - np.square(values)) / (n - 1)
+            others_std = np.sqrt(np.maximum(others_sq - np.square(others_mean), 0.0))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores[members] = np.where(others_std > 0, (values - others_mean) / others_std, np.nan)
+    return scores
+
+
+def flag_anomalies(deviation: np.ndarray, groups: np.ndarray | None = None, mode: str | None = None) -> np.ndarray:
+    """Boolean mask of anomalous deviations for the configured (or given) mode."""
+    mode = mode or settings.FUEL_ANOMALY_MODE
+    by_threshold = np.abs(deviation) >= settings.FUEL_ANOMALY_THRESHOLD_PCT
+    if mode == "threshold" or groups is None:
+        return by_threshold
+    scores = peer_scores(deviation, groups, mode, settings.FUEL_ANOMALY_MIN_PEERS)
+    by_score = np.abs(scores) >= settings.FUEL_ANOMALY_SCORE
+    return np.where(np.isnan(scores), by_threshold, by_score)
+
+
+def _anomaly_notification(vehicle_id: str, label: str, recent: float, baseline: float, deviation: float) -> dict:
+    direction = "higher" if recent > baseline else "lower"
+    return dict(
+        type=NotificationType.OPERATIONAL,
+        severity=NotificationSeverity.WARNING,
+        title=f"⛽ Fuel Anomaly – {label}",
+        message=(
+            f"Vehicle {label} fuel consumption is {abs(deviation):.1f}% {direction} than the 3-month average "
+            f"({recent:.2f} vs {baseline:.2f} L/100km)."
+        ),
+        entity_type="vehicle",
+        entity_id=vehicle_id,
+        rule="fuel_anomaly",
+    )
 
-    # L/100km in last 30 days
-    recent_efficiency = (float(recent_fuel) / float(recent_dist)) * 100
 
-    # 90-day baseline
-    baseline_fuel = (await db.execute(
-        select(func.sum(FuelLog.quantity_liters)).where(
-            FuelLog.vehicle_id == vehicle_id,
-            FuelLog.date >= last_90.date(),
-            FuelLog.date < last_30.date(),
-        )
-    )).scalar() or 0
-
-    baseline_dist = (await db.execute(
-        select(func.sum(Trip.distance_km)).where(
-            Trip.vehicle_id == vehicle_id,
-            Trip.status == "completed",
-            Trip.actual_departure >= last_90,
-            Trip.actual_departure < last_30,
-        )
-    )).scalar() or 0
-
-    if baseline_dist <= 0 or baseline_fuel <= 0:
-        return  # No baseline
-
-    baseline_efficiency = (float(baseline_fuel) / float(baseline_dist)) * 100
-    deviation_pct = abs(recent_efficiency - baseline_efficiency) / baseline_efficiency * 100
-
-    if deviation_pct >= settings.FUEL_ANOMALY_THRESHOLD_PCT:
-        vehicle = (await db.execute(
-            select(Vehicle).where(Vehicle.id == vehicle_id)
-        )).scalar_one_or_none()
-        veh_label = vehicle.registration_number if vehicle else vehicle_id
-
-        direction = "higher" if recent_efficiency > baseline_efficiency else "lower"
-        await create_notification(
-            db,
-            type=NotificationType.OPERATIONAL,
-            severity=NotificationSeverity.WARNING,
-            title=f"⛽ Fuel Anomaly – {veh_label}",
-            message=(
-                f"Vehicle {veh_label} fuel consumption is {deviation_pct:.1f}% {direction} than the 3-month average "
-                f"({recent_efficiency:.2f} vs {baseline_efficiency:.2f} L/100km)."
-            ),
-            entity_type="vehicle",
-            entity_id=vehicle_id,
-        )
-        logger.warning(f"[FuelAnomaly] {veh_label}: {deviation_pct:.1f}% deviation detected")
+async def check_vehicle_fuel_anomaly(db: AsyncSession, vehicle_id: str):
+    """Check a single vehicle for fuel consumption anomaly (called on FuelLogged event).
+
+    Reads the vehicle's streaming fuel buckets, not the raw log tables.
+    """
+    windows = await load_vehicle_window(db, vehicle_id)
+    valid, recent, baseline, deviation = efficiency_deviation(windows)
+    if not valid.any() or not flag_anomalies(deviation[valid], mode="threshold")[0]:
+        return
+
+    vehicle = (await db.execute(
+        select(Vehicle.registration_number).where(Vehicle.id == vehicle_id)
+    )).scalar_one_or_none()
+    veh_label = vehicle or vehicle_id
+    await create_notifications_bulk(db, [
+        _anomaly_notification(vehicle_id, veh_label, recent[0], baseline[0], deviation[0])
+    ])
+    logger.warning(f"[FuelAnomaly] {veh_label}: {abs(deviation[0]):.1f}% deviation detected")
+
+
+async def scan_fleet(db: AsyncSession, now: datetime | None = None) -> tuple[int, int]:
+    """Flag anomalies across the whole fleet; returns ``(vehicles_evaluated, anomalies)``."""
+    windows = await load_fuel_windows(db, now or datetime.utcnow())
+    valid, recent, baseline, deviation = efficiency_deviation(windows)
+    if not valid.any():
+        return 0, 0
+
+    ids = [vid for vid, ok in zip(windows.vehicle_ids, valid) if ok]
+    recent, baseline, deviation = recent[valid], baseline[valid], deviation[valid]
+
+    info = {
+        row.id: row for row in (await db.execute(
+            select(Vehicle.id, Vehicle.registration_number, Vehicle.make, Vehicle.fuel_type)
+            .where(Vehicle.id.in_(ids))
+        )).all()
+    }
+    group_index: dict[tuple, int] = defaultdict(lambda: len(group_index))
+    groups = np.array([
+        group_index[(info[vid].make, info[vid].fuel_type) if vid in info else None] for vid in ids
+    ])
+
+    flagged = np.flatnonzero(flag_anomalies(deviation, groups))
+    notifications = []
+    for i in flagged:
+        vid = ids[i]
+        label = info[vid].registration_number if vid in info else vid
+        notifications.append(_anomaly_notification(vid, label, recent[i], baseline[i], deviation[i]))
+        logger.warning(f"[FuelAnomalyScan] {label}: {abs(deviation[i]):.1f}% deviation detected")
+
+    await create_notifications_bulk(db, notifications)
+    return len(ids), len(notifications)
 
 
 async def run_fuel_anomaly_scan():
-    """Daily job: scan all vehicles for fuel anomalies."""
+    """Daily job: scan all vehicles for fuel anomalies in one batch."""
     start = time.monotonic()
+    scanned = 0
     processed = 0
     errors = None
 
     async with async_session() as db:
         try:
-            vehicles = (await db.execute(select(Vehicle))).scalars().all()
-            for vehicle in vehicles:
-                await check_vehicle_fuel_anomaly(db, vehicle.id)
-                processed += 1
+            buckets = await rebuild_fuel_state(db)
+            logger.info(f"[FuelAnomalyScan] rebuilt {buckets} fuel state buckets")
+            scanned, processed = await scan_fleet(db)
         except Exception as exc:
             errors = str(exc)
             logger.error(f"[FuelAnomalyScan] Error: {exc}")
@@ -118,10 +223,11 @@ async def run_fuel_anomaly_scan():
             log = AutomationLog(
                 job_name="fuel_anomaly_scan",
                 status="error" if errors else "success",
+                records_scanned=scanned,
                 records_processed=processed,
                 error_message=errors,
                 duration_ms=elapsed,
             )
             db.add(log)
             await db.commit()
-            logger.info(f"[FuelAnomalyScan] done – processed={processed}, duration={elapsed}ms")
+            logger.info(f"[FuelAnomalyScan] done – scanned={scanned}, anomalies={processed}, duration={elapsed}ms")
@@ -3,29 +3,33 @@
 import logging
 import time
 from datetime import datetime, timedelta, date
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update
 
 from database import async_session
 from models.models import (
     Driver, DriverStatus, AutomationLog,
     NotificationType, NotificationSeverity
 )
-from automation.notification_helper import create_notification
-from automation.event_dispatcher import dispatch, Events
+from automation.notification_helper import create_notifications_bulk
+from automation.fleet_counters import CounterDeltas, apply_counter_deltas
+from automation.kpi_engine import invalidate_dashboard_kpis
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+NOT_SUSPENDABLE = (DriverStatus.SUSPENDED, DriverStatus.OFF_DUTY)
+
 
 async def run_license_monitor():
     """
-    Daily job: checks all driver license expiry dates.
+    Daily job: checks driver license expiry dates as set-based work.
     - < LICENSE_WARN_DAYS → WARNING notification
-    - Expired → auto-suspend + CRITICAL notification
+    - Expired → auto-suspend (one UPDATE) + CRITICAL notification
+    Notifications are written with one multi-row INSERT and one WS batch.
     """
     start = time.monotonic()
+    scanned = 0
     processed = 0
     errors = None
 
@@ -34,42 +38,61 @@ async def run_license_monitor():
             today = date.today()
             warn_date = today + timedelta(days=settings.LICENSE_WARN_DAYS)
 
-            drivers = (await db.execute(select(Driver))).scalars().all()
+            # Only drivers inside the expiry horizon (ix_drivers_license_expiry)
+            drivers = (await db.execute(
+                select(
+                    Driver.id, Driver.full_name, Driver.employee_id,
+                    Driver.license_expiry, Driver.status,
+                ).where(Driver.license_expiry <= warn_date)
+            )).all()
+            scanned = len(drivers)
+
+            # Expired → suspend everyone eligible in a single statement
+            suspended_ids = set((await db.execute(
+                update(Driver)
+                .where(Driver.license_expiry < today, Driver.status.notin_(NOT_SUSPENDABLE))
+                .values(status=DriverStatus.SUSPENDED, updated_at=datetime.utcnow())
+                .returning(Driver.id)
+                .execution_options(synchronize_session=False)
+            )).scalars().all())
 
+            if suspended_ids:
+                deltas = CounterDeltas()
+                for driver in drivers:
+                    if driver.id in suspended_ids:
+                        deltas.status_change("drivers", driver.status, DriverStatus.SUSPENDED)
+                await apply_counter_deltas(db, deltas)
+                await db.commit()
+                invalidate_dashboard_kpis()
+                logger.warning(f"[LicenseMonitor] suspended {len(suspended_ids)} drivers with expired licenses")
+
+            notifications = []
             for driver in drivers:
                 expiry = driver.license_expiry
-                days_left = (expiry - today).days
-
                 if expiry < today:
-                    # Expired → suspend
-                    if driver.status not in (DriverStatus.SUSPENDED, DriverStatus.OFF_DUTY):
-                        driver.status = DriverStatus.SUSPENDED
-                        await db.commit()
-                        logger.warning(f"Driver {driver.full_name} suspended – license expired {expiry}")
-
-                    await create_notification(
-                        db,
+                    notifications.append(dict(
                         type=NotificationType.COMPLIANCE,
                         severity=NotificationSeverity.CRITICAL,
                         title=f"🚨 License EXPIRED – {driver.full_name}",
                         message=f"Driver {driver.full_name} (ID: {driver.employee_id}) license expired {expiry}. Auto-suspended.",
                         entity_type="driver",
                         entity_id=driver.id,
-                    )
-                    processed += 1
-
-                elif expiry <= warn_date:
-                    # Expiring soon → warn
-                    await create_notification(
-                        db,
+                        rule="license_expired",
+                    ))
+                else:
+                    days_left = (expiry - today).days
+                    notifications.append(dict(
                         type=NotificationType.COMPLIANCE,
                         severity=NotificationSeverity.WARNING,
                         title=f"⚠️ License Expiring – {driver.full_name}",
                         message=f"Driver {driver.full_name} license expires in {days_left} days ({expiry}). Please renew.",
                         entity_type="driver",
                         entity_id=driver.id,
-                    )
-                    processed += 1
+                        rule="license_expiring",
+                    ))
+
+            await create_notifications_bulk(db, notifications)
+            processed = len(notifications)
 
         except Exception as exc:
             errors = str(exc)
@@ -80,10 +103,11 @@ async def run_license_monitor():
             log = AutomationLog(
                 job_name="license_monitor",
                 status="error" if errors else "success",
+                records_scanned=scanned,
                 records_processed=processed,
                 error_message=errors,
                 duration_ms=elapsed,
             )
             db.add(log)
             await db.commit()
-            logger.info(f"[LicenseMonitor] done – processed={processed}, duration={elapsed}ms")
+            logger.info(f"[LicenseMonitor] done – scanned={scanned}, processed={processed}, duration={elapsed}ms")
@@ -2,89 +2,114 @@
 
 import logging
 import time
-from datetime import datetime, date
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+import uuid
+from datetime import datetime, date, timedelta
+from sqlalchemy import select, insert, exists, func, true
+from sqlalchemy.orm import aliased
 
 from database import async_session
 from models.models import (
     Vehicle, MaintenanceLog, MaintenanceStatus, AutomationLog,
     NotificationType, NotificationSeverity
 )
-from automation.notification_helper import create_notification
+from automation.notification_helper import create_notifications_bulk
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
 
+def due_vehicles_query(km_interval: float):
+    """Vehicles past the service interval that have no open auto-scheduled service.
+
+    Each vehicle is joined LATERAL to its latest completed service (served by
+    ix_maintenance_logs_vehicle_status_odometer) and anti-joined to its open
+    ``preventive_auto`` record, so the whole fleet is evaluated in one query.
+    """
+    completed = aliased(MaintenanceLog)
+    last_service = (
+        select(completed.odometer_at_service.label("km"))
+        .where(
+            completed.vehicle_id == Vehicle.id,
+            completed.status == MaintenanceStatus.COMPLETED,
+        )
+        .order_by(completed.odometer_at_service.desc())
+        .limit(1)
+        .lateral("last_service")
+    )
+
+    open_alert = aliased(MaintenanceLog)
+    has_open_alert = exists().where(
+        open_alert.vehicle_id == Vehicle.id,
+        open_alert.status == MaintenanceStatus.SCHEDULED,
+        open_alert.maintenance_type == "preventive_auto",
+    )
+
+    km_since_service = (Vehicle.odometer_km - func.coalesce(last_service.c.km, 0)).label("km_since_service")
+    return (
+        select(
+            Vehicle.id, Vehicle.registration_number, Vehicle.make, Vehicle.model,
+            Vehicle.odometer_km, km_since_service,
+        )
+        .select_from(Vehicle)
+        .outerjoin(last_service, true())
+        .where(km_since_service >= km_interval, ~has_open_alert)
+    )
+
+
 async def run_maintenance_monitor():
     """
     Daily job: checks if any vehicle's odometer has exceeded the service interval
-    since the last completed maintenance.
+    since the last completed maintenance, and bulk-schedules a service for each.
     """
     start = time.monotonic()
+    scanned = 0
     processed = 0
     errors = None
 
     async with async_session() as db:
         try:
-            vehicles = (await db.execute(select(Vehicle))).scalars().all()
             km_interval = settings.MAINTENANCE_KM_INTERVAL
+            scanned = (await db.execute(select(func.count(Vehicle.id)))).scalar() or 0
+            due = (await db.execute(due_vehicles_query(km_interval))).all()
 
-            for vehicle in vehicles:
-                # Find last completed maintenance for this vehicle
-                last_service = (await db.execute(
-                    select(MaintenanceLog)
-                    .where(
-                        MaintenanceLog.vehicle_id == vehicle.id,
-                        MaintenanceLog.status == MaintenanceStatus.COMPLETED,
-                    )
-                    .order_by(MaintenanceLog.odometer_at_service.desc())
-                    .limit(1)
-                )).scalar_one_or_none()
-
-                last_service_km = last_service.odometer_at_service if last_service else 0
-                km_since_service = vehicle.odometer_km - last_service_km
-
-                if km_since_service >= km_interval:
-                    # Check if we already have an open maintenance alert
-                    existing_alert = (await db.execute(
-                        select(MaintenanceLog).where(
-                            MaintenanceLog.vehicle_id == vehicle.id,
-                            MaintenanceLog.status == MaintenanceStatus.SCHEDULED,
-                            MaintenanceLog.maintenance_type == "preventive_auto",
-                        )
-                    )).scalar_one_or_none()
+            if due:
+                sched = date.today() + timedelta(days=7)
+                now = datetime.utcnow()
+                await db.execute(insert(MaintenanceLog), [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "vehicle_id": vehicle.id,
+                        "description": f"Auto-scheduled: {vehicle.km_since_service:.0f} km since last service",
+                        "maintenance_type": "preventive_auto",
+                        "status": MaintenanceStatus.SCHEDULED,
+                        "cost": 0,
+                        "scheduled_date": sched,
+                        "odometer_at_service": vehicle.odometer_km,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for vehicle in due
+                ])
+                await db.commit()
 
-                    if not existing_alert:
-                        # Auto-create a maintenance record
-                        from datetime import timedelta
-                        sched = date.today() + timedelta(days=7)
-                        new_maint = MaintenanceLog(
-                            vehicle_id=vehicle.id,
-                            description=f"Auto-scheduled: {km_since_service:.0f} km since last service",
-                            maintenance_type="preventive_auto",
-                            scheduled_date=sched,
-                            odometer_at_service=vehicle.odometer_km,
-                        )
-                        db.add(new_maint)
-                        await db.commit()
-
-                        await create_notification(
-                            db,
-                            type=NotificationType.MAINTENANCE,
-                            severity=NotificationSeverity.WARNING,
-                            title=f"🔧 Maintenance Due – {vehicle.registration_number}",
-                            message=(
-                                f"Vehicle {vehicle.registration_number} ({vehicle.make} {vehicle.model}) "
-                                f"has driven {km_since_service:.0f} km since last service "
-                                f"(threshold: {km_interval:.0f} km). Scheduled for {sched}."
-                            ),
-                            entity_type="vehicle",
-                            entity_id=vehicle.id,
-                        )
-                        processed += 1
+                await create_notifications_bulk(db, [
+                    dict(
+                        type=NotificationType.MAINTENANCE,
+                        severity=NotificationSeverity.WARNING,
+                        title=f"🔧 Maintenance Due – {vehicle.registration_number}",
+                        message=(
+                            f"Vehicle {vehicle.registration_number} ({vehicle.make} {vehicle.model}) "
+                            f"has driven {vehicle.km_since_service:.0f} km since last service "
+                            f"(threshold: {km_interval:.0f} km). Scheduled for {sched}."
+                        ),
+                        entity_type="vehicle",
+                        entity_id=vehicle.id,
+                        rule="maintenance_due",
+                    )
+                    for vehicle in due
+                ])
+                processed = len(due)
 
         except Exception as exc:
             errors = str(exc)
@@ -95,10 +120,11 @@ async def run_maintenance_monitor():
             log = AutomationLog(
                 job_name="maintenance_monitor",
                 status="error" if errors else "success",
+                records_scanned=scanned,
                 records_processed=processed,
                 error_message=errors,
                 duration_ms=elapsed,
             )
             db.add(log)
             await db.commit()
-            logger.info(f"[MaintenanceMonitor] done – processed={processed}, duration={elapsed}ms")
+            logger.info(f"[MaintenanceMonitor] done – scanned={scanned}, processed={processed}, duration={elapsed}ms")
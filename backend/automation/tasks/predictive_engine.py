@@ -2,23 +2,97 @@
 
 Uses historical odometer growth rate (km/day) to estimate the date
 by which each vehicle will hit the next maintenance threshold.
+
+The whole fleet is handled at once: two grouped queries fetch 90-day
+distance and last-service odometers, predictions are computed as NumPy
+arrays, and results are written with a single
+``INSERT ... ON CONFLICT (period_year, period_month, vehicle_id) DO UPDATE``.
 """
 
 import logging
 import time
 from datetime import datetime, date, timedelta
+import numpy as np
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import async_session
+from database import async_session, dialect_insert
 from models.models import (
-    Vehicle, Trip, MaintenanceLog, MaintenanceStatus, AnalyticsSummary, AutomationLog
+    Vehicle, Trip, MaintenanceLog, MaintenanceStatus, TripStatus, AnalyticsSummary, AutomationLog
 )
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+WINDOW_DAYS = 90
+
+
+async def predict_fleet(db: AsyncSession, now: datetime | None = None) -> int:
+    """Predict the next service for every vehicle with recent trips; returns rows upserted."""
+    now = now or datetime.utcnow()
+    year, month = now.year, now.month
+    window_start = now - timedelta(days=WINDOW_DAYS)
+
+    # Query 1: vehicles with completed trips in the window, with their distance total
+    km_90 = (
+        select(Trip.vehicle_id, func.sum(Trip.distance_km).label("km"))
+        .where(Trip.status == TripStatus.COMPLETED, Trip.actual_departure >= window_start)
+        .group_by(Trip.vehicle_id)
+        .subquery()
+    )
+    fleet = (await db.execute(
+        select(Vehicle.id, Vehicle.odometer_km, km_90.c.km)
+        .join(km_90, km_90.c.vehicle_id == Vehicle.id)
+        .where(km_90.c.km > 0)
+    )).all()
+    if not fleet:
+        return 0
+
+    # Query 2: last completed service odometer per vehicle
+    last_service = dict((await db.execute(
+        select(MaintenanceLog.vehicle_id, func.max(MaintenanceLog.odometer_at_service))
+        .where(MaintenanceLog.status == MaintenanceStatus.COMPLETED)
+        .group_by(MaintenanceLog.vehicle_id)
+    )).all())
+
+    vehicle_ids = [row.id for row in fleet]
+    odometer = np.array([row.odometer_km or 0 for row in fleet], dtype=float)
+    total_km = np.array([row.km for row in fleet], dtype=float)
+    last_km = np.array([last_service.get(vid) or 0 for vid in vehicle_ids], dtype=float)
+
+    km_per_day = total_km / WINDOW_DAYS
+    next_service_km = last_km + settings.MAINTENANCE_KM_INTERVAL
+    km_remaining = np.maximum(next_service_km - odometer, 0)
+    days_to_service = np.floor(km_remaining / km_per_day).astype(np.int64)
+    predicted = np.datetime64(date.today(), "D") + days_to_service.astype("timedelta64[D]")
+
+    rows = [
+        {
+            "period_year": year,
+            "period_month": month,
+            "vehicle_id": vid,
+            "predicted_next_service_km": float(km),
+            "predicted_next_service_date": day.astype(date),
+            "updated_at": now,
+        }
+        for vid, km, day in zip(vehicle_ids, next_service_km, predicted)
+    ]
+
+    insert = dialect_insert(db)
+    stmt = insert(AnalyticsSummary)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[AnalyticsSummary.period_year, AnalyticsSummary.period_month, AnalyticsSummary.vehicle_id],
+        set_={
+            "predicted_next_service_km": stmt.excluded.predicted_next_service_km,
+            "predicted_next_service_date": stmt.excluded.predicted_next_service_date,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    await db.execute(stmt, rows)
+    await db.commit()
+    return len(rows)
+
 
 async def run_predictive_maintenance():
     """Daily job: estimate next service date for each vehicle."""
@@ -28,72 +102,7 @@ async def run_predictive_maintenance():
 
     async with async_session() as db:
         try:
-            vehicles = (await db.execute(select(Vehicle))).scalars().all()
-            now = datetime.utcnow()
-            year, month = now.year, now.month
-
-            for vehicle in vehicles:
-                # Average km/day from trips in the last 90 days
-                ninety_days_ago = now - timedelta(days=90)
-                trip_data = (await db.execute(
-                    select(func.sum(Trip.distance_km), func.count(Trip.id)).where(
-                        Trip.vehicle_id == vehicle.id,
-                        Trip.status == "completed",
-                        Trip.actual_departure >= ninety_days_ago,
-                    )
-                )).one()
-                total_km_90, trip_count = trip_data
-                total_km_90 = float(total_km_90 or 0)
-
-                if total_km_90 <= 0:
-                    continue  # No trip data — skip prediction
-
-                km_per_day = total_km_90 / 90.0
-
-                # Find last service odometer
-                last_service = (await db.execute(
-                    select(MaintenanceLog)
-                    .where(
-                        MaintenanceLog.vehicle_id == vehicle.id,
-                        MaintenanceLog.status == MaintenanceStatus.COMPLETED,
-                    )
-                    .order_by(MaintenanceLog.odometer_at_service.desc())
-                    .limit(1)
-                )).scalar_one_or_none()
-
-                last_service_km = last_service.odometer_at_service if last_service else 0
-                next_service_km = last_service_km + settings.MAINTENANCE_KM_INTERVAL
-                km_remaining = max(next_service_km - vehicle.odometer_km, 0)
-                days_to_service = int(km_remaining / km_per_day) if km_per_day > 0 else None
-                predicted_date = date.today() + timedelta(days=days_to_service) if days_to_service is not None else None
-
-                # Upsert into analytics_summary
-                existing = (await db.execute(
-                    select(AnalyticsSummary).where(
-                        AnalyticsSummary.period_year == year,
-                        AnalyticsSummary.period_month == month,
-                        AnalyticsSummary.vehicle_id == vehicle.id,
-                    )
-                )).scalar_one_or_none()
-
-                if existing:
-                    existing.predicted_next_service_km = next_service_km
-                    existing.predicted_next_service_date = predicted_date
-                    existing.updated_at = datetime.utcnow()
-                else:
-                    db.add(AnalyticsSummary(
-                        period_year=year, period_month=month, vehicle_id=vehicle.id,
-                        predicted_next_service_km=next_service_km,
-                        predicted_next_service_date=predicted_date,
-                    ))
-
-                await db.commit()
-                processed += 1
-                logger.info(
-                    f"[PredictiveEngine] {vehicle.registration_number}: "
-                    f"next service ~{predicted_date} ({km_remaining:.0f} km remaining)"
-                )
-
+            processed = await predict_fleet(db)
         except Exception as exc:
             errors = str(exc)
             logger.error(f"[PredictiveEngine] Error: {exc}")
@@ -1,70 +1,491 @@
-"""FleetFlow – WebSocket Connection Manager for real-time notifications."""
+"""FleetFlow – WebSocket Connection Manager for real-time notifications.
+
+Every connection owns a bounded outbound queue drained by its own writer
+task, so a broadcast is one non-blocking enqueue per socket and a stalled
+client only ever delays itself. A client whose queue overflows is handled
+per WS_SLOW_CONSUMER_POLICY:
+
+- ``resync``: its backlog is discarded and replaced by a single
+  ``{"event": "resync"}`` frame telling it to refetch over REST; further
+  frames are dropped until the writer has sent the resync.
+- ``disconnect``: the socket is closed (the client reconnects and refetches).
+
+Broadcast notifications only reach sockets whose subscription matches
+them (see ``ws_topics``); each frame is serialised once per broadcast,
+and a batch once per distinct subset of its items.
+
+A single heartbeat task pings every socket each
+WS_HEARTBEAT_INTERVAL_SECONDS with ``{"event": "ping"}``; anything the
+client sends (its ``pong`` reply included) marks it alive, and sockets
+silent for WS_IDLE_TIMEOUT_SECONDS are reaped. This catches half-open TCP
+connections, which otherwise linger until a send finally fails.
+
+Reconnecting clients can resume from their last-seen notification
+(``resume``, backed by ``ws_resume``): live frames are held back while the
+missed notifications are looked up, then sent after the replay frame.
+
+Notification storms are coalesced: broadcasts within WS_COALESCE_WINDOW_MS
+are published together as ``notification_batch`` frames, and when a frame
+would carry WS_SUMMARY_THRESHOLD or more notifications of one kind (type,
+severity, entity type) they are collapsed into a single
+``notification_summary`` item with their count.
+"""
 
 import asyncio
 import json
 import logging
+import time
+from collections import defaultdict
+from datetime import datetime
 from typing import Dict, List
 from fastapi import WebSocket
 
+from automation.pubsub import backplane, MAX_PAYLOAD_BYTES
+from automation.ws_topics import Subscription, TopicIndex, role_subscription
+from automation.ws_resume import resume_service
+from automation.read_state import unread_counters
+from config import get_settings
+
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Budget for a batch frame's items inside one backplane message
+BATCH_FRAME_BYTES = MAX_PAYLOAD_BYTES - 200
+RESYNC_FRAME = json.dumps({"event": "resync"})
+PING_FRAME = json.dumps({"event": "ping"})
+SLOW_CONSUMER_CLOSE_CODE = 4008
+IDLE_CLOSE_CODE = 4009
+
+
+class ClientConnection:
+    """One WebSocket with its bounded send queue and writer task."""
+
+    def __init__(self, websocket: WebSocket, user_id: str, role: str | None,
+                 manager: "ConnectionManager", queue_size: int):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.role = role
+        self.subscription: Subscription = role_subscription(role)
+        self._manager = manager
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self._resync_pending = False
+        self._held: list[str] | None = None   # live frames deferred while a resume replay is built
+        self._held_overflow = False
+        self._closing = False
+        self._closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.last_seen = time.monotonic()
+        self._writer = asyncio.create_task(self._write_loop(), name=f"ws-writer-{user_id}")
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def touch(self):
+        """Record inbound traffic; the client is alive."""
+        self.last_seen = time.monotonic()
+
+    def enqueue(self, message: str) -> bool:
+        """Queue a frame without waiting; returns False if it was dropped."""
+        if self._closing:
+            return False
+        if self._held is not None:
+            if len(self._held) >= self._queue.maxsize:
+                self.dropped += len(self._held) + 1
+                self._manager.dropped_total += len(self._held) + 1
+                self._held.clear()
+                self._held_overflow = True
+                return False
+            if not self._held_overflow:
+                self._held.append(message)
+            return not self._held_overflow
+        if self._resync_pending:
+            self.dropped += 1
+            self._manager.dropped_total += 1
+            return False
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self._on_overflow()
+            return False
+
+    def hold(self):
+        """Defer live frames until ``release``."""
+        self._held, self._held_overflow = [], False
+
+    def release(self, first: str):
+        """Send ``first`` and then the frames held since ``hold``.
+
+        If the held frames overflowed, a resync is sent in their place.
+        """
+        held, self._held = self._held or [], None
+        if self._held_overflow:
+            self._manager.resyncs_total += 1
+            first, held = RESYNC_FRAME, []
+        for message in (first, *held):
+            self.enqueue(message)
+
+    def _on_overflow(self):
+        backlog = self._queue.qsize() + 1   # the frame that did not fit
+        self.dropped += backlog
+        self._manager.dropped_total += backlog
+        if self._manager.slow_consumer_policy == "disconnect":
+            self._closing = True
+            self._manager.slow_disconnects_total += 1
+            logger.warning(f"WS slow consumer disconnected: user={self.user_id}, backlog={backlog}")
+            asyncio.get_running_loop().create_task(self.close(SLOW_CONSUMER_CLOSE_CODE))
+            return
+        # Replace the backlog with one resync frame
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(RESYNC_FRAME)
+        self._resync_pending = True
+        self._manager.resyncs_total += 1
+        logger.warning(f"WS slow consumer resynced: user={self.user_id}, dropped={backlog}")
+
+    async def _write_loop(self):
+        try:
+            while True:
+                message = await self._queue.get()
+                await asyncio.wait_for(self.websocket.send_text(message), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+                if message is RESYNC_FRAME:
+                    self._resync_pending = False
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.info(f"WS writer stopped: user={self.user_id}: {exc or exc.__class__.__name__}")
+            await self.close()
+
+    async def close(self, code: int = 1000):
+        """Stop the writer, close the socket and unregister the connection."""
+        if self._closed:
+            return
+        self._closed = self._closing = True
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        try:
+            # A half-open socket can stall the close frame like any other send
+            await asyncio.wait_for(self.websocket.close(code=code), timeout=settings.WS_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            pass
+        await self._manager._remove(self)
+
+
+def summarise(items: list[dict], threshold: int) -> list[dict]:
+    """Collapse every kind with ``threshold`` or more items into one summary item.
+
+    The summary takes the place of the kind's newest item, so ordering is kept.
+    """
+    if threshold <= 0 or len(items) < threshold:
+        return items
+    kinds: dict[tuple, list[int]] = defaultdict(list)
+    for i, item in enumerate(items):
+        kinds[(item["type"], item["severity"], item.get("entity_type"))].append(i)
+    summaries: dict[int, dict] = {}
+    collapsed: set[int] = set()
+    for (type, severity, entity_type), indexes in kinds.items():
+        if len(indexes) < threshold:
+            continue
+        group = [items[i] for i in indexes]
+        titles = [item["title"] for item in group[-3:]]
+        more = len(group) - len(titles)
+        collapsed.update(indexes)
+        summaries[indexes[-1]] = {
+            "event": "notification_summary",
+            "type": type,
+            "severity": severity,
+            "entity_type": entity_type,
+            "count": len(group),
+            "title": f"{len(group)} {type} notifications",
+            "message": "; ".join(titles) + (f" and {more} more" if more else ""),
+            "created_at": group[-1]["created_at"],
+        }
+    if not summaries:
+        return items
+    return [summaries.get(i, item) for i, item in enumerate(items) if i in summaries or i not in collapsed]
 
 
 class ConnectionManager:
     """Manages all active WebSocket connections for notification broadcasting."""
 
-    def __init__(self):
-        # Maps user_id → list of websocket connections (multiple tabs support)
-        self._connections: Dict[str, List[WebSocket]] = {}
+    def __init__(self, queue_size: int, slow_consumer_policy: str,
+                 coalesce_window_ms: int = 0, coalesce_max_items: int = 500, summary_threshold: int = 0,
+                 heartbeat_interval: float = 20.0, idle_timeout: float = 60.0):
+        # Maps user_id → list of connections (multiple tabs support)
+        self._connections: Dict[str, List[ClientConnection]] = {}
+        self._total = 0   # maintained on connect/remove so counts never walk the map
+        self.connects_total = 0
+        self.disconnects_total = 0
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self._heartbeat_task: asyncio.Task | None = None
+        self.pings_sent = 0
+        self.reaped_total = 0
+        self._topics = TopicIndex()
         self._lock = asyncio.Lock()
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.dropped_total = 0
+        self.resyncs_total = 0
+        self.slow_disconnects_total = 0
+        self.coalesce_window = coalesce_window_ms / 1000
+        self.coalesce_max_items = coalesce_max_items
+        self.summary_threshold = summary_threshold
+        self._pending: list[dict] = []
+        self._flush_task: asyncio.Task | None = None
+        self._started = False   # only a started manager (the app) coalesces; scripts publish directly
 
-    async def connect(self, websocket: WebSocket, user_id: str):
+    async def connect(self, websocket: WebSocket, user_id: str, role: str | None = None) -> ClientConnection:
         await websocket.accept()
+        conn = ClientConnection(websocket, user_id, role, self, self.queue_size)
         async with self._lock:
-            self._connections.setdefault(user_id, []).append(websocket)
-        logger.info(f"WS connected: user={user_id}, total_sessions={sum(len(v) for v in self._connections.values())}")
+            self._connections.setdefault(user_id, []).append(conn)
+            self._topics.add(conn, conn.subscription)
+            self._total += 1
+            self.connects_total += 1
+        logger.info(f"WS connected: user={user_id}, total_sessions={self._total}")
+        return conn
 
     async def disconnect(self, websocket: WebSocket, user_id: str):
         async with self._lock:
-            sockets = self._connections.get(user_id, [])
-            if websocket in sockets:
-                sockets.remove(websocket)
-            if not sockets:
-                self._connections.pop(user_id, None)
+            conns = [c for c in self._connections.get(user_id, []) if c.websocket is websocket]
+        for conn in conns:
+            await conn.close()
         logger.info(f"WS disconnected: user={user_id}")
 
-    async def broadcast_notification(self, payload: dict):
-        """Broadcast a notification to ALL connected clients."""
-        message = json.dumps(payload)
-        dead: list[tuple[str, WebSocket]] = []
+    async def _remove(self, conn: ClientConnection):
         async with self._lock:
-            connections_snapshot = {
-                uid: list(sockets)
-                for uid, sockets in self._connections.items()
-            }
-        for uid, sockets in connections_snapshot.items():
-            for ws in sockets:
-                try:
-                    await ws.send_text(message)
-                except Exception:
-                    dead.append((uid, ws))
-        # Clean up dead connections
-        async with self._lock:
-            for uid, ws in dead:
-                sockets = self._connections.get(uid, [])
-                if ws in sockets:
-                    sockets.remove(ws)
+            conns = self._connections.get(conn.user_id, [])
+            if conn in conns:
+                conns.remove(conn)
+                self._topics.remove(conn, conn.subscription)
+                self._total -= 1
+                self.disconnects_total += 1
+            if not conns:
+                self._connections.pop(conn.user_id, None)
 
-    async def send_to_user(self, user_id: str, payload: dict):
-        """Send a notification only to a specific user."""
-        message = json.dumps(payload)
-        async with self._lock:
-            sockets = list(self._connections.get(user_id, []))
-        for ws in sockets:
+    @property
+    def total_connections(self) -> int:
+        return self._total
+
+    def user_connections(self, user_id: str) -> int:
+        return len(self._connections.get(user_id, ()))
+
+    # ── Heartbeats ─────────────────────────────────────────────────────────
+
+    def start(self):
+        self._started = True
+        if self.heartbeat_interval > 0 and (self._heartbeat_task is None or self._heartbeat_task.done()):
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop(), name="ws-heartbeat")
+
+    async def stop(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        self._started = False
+        await self.flush()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except Exception as exc:
+                logger.error(f"WS heartbeat sweep failed: {exc}")
+
+    async def heartbeat(self) -> int:
+        """Ping live sockets and reap idle ones; returns how many were reaped."""
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = []
+        for conns in list(self._connections.values()):
+            for conn in list(conns):
+                if conn.last_seen < cutoff:
+                    idle.append(conn)
+                elif conn.enqueue(PING_FRAME):   # False when the ping was dropped (full queue, closing)
+                    self.pings_sent += 1
+        if idle:
+            self.reaped_total += len(idle)
+            logger.info(f"WS reaping {len(idle)} idle connection(s)")
+            await asyncio.gather(*(conn.close(IDLE_CLOSE_CODE) for conn in idle))
+        return len(idle)
+
+    def subscribe(self, conn: ClientConnection, subscription: Subscription):
+        """Replace a connection's subscription and re-index it."""
+        if conn._closing:
+            return
+        self._topics.remove(conn, conn.subscription)
+        conn.subscription = subscription
+        self._topics.add(conn, subscription)
+
+    async def broadcast_notification(self, payload: dict):
+        """Broadcast a notification to every subscribed client, on every worker."""
+        await self.broadcast_notifications([payload])
+
+    async def broadcast_notifications(self, payloads: list[dict]):
+        """Queue notifications for the next coalesced broadcast to subscribed clients.
+
+        Outside the app (CLI scripts never ``start`` the manager, so nothing
+        would flush the window before they exit) they are published at once.
+        """
+        if self.coalesce_window <= 0 or not self._started:
+            await self._publish(payloads)
+            return
+        self._pending.extend(payloads)
+        if len(self._pending) >= self.coalesce_max_items:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later(), name="ws-coalesce")
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.coalesce_window)
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self):
+        """Publish everything still waiting in the coalescing window."""
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+        self._flush_task = None
+        payloads, self._pending = self._pending, []
+        if payloads:
+            await self._publish(payloads)
+
+    async def _publish(self, payloads: list[dict]):
+        """One notification keeps its own frame; several become batch frames,
+        split so each fits in one backplane message."""
+        if len(payloads) == 1:
+            await backplane.publish({"kind": "broadcast", "frame": payloads[0]})
+            return
+        batch: list[dict] = []
+        size = 0
+        for payload in payloads:
+            item_size = len(json.dumps(payload))
+            if batch and size + item_size > BATCH_FRAME_BYTES:
+                await backplane.publish({"kind": "broadcast", "frame": {"event": "notification_batch", "items": batch}})
+                batch, size = [], 0
+            batch.append(payload)
+            size += item_size
+        if batch:
+            await backplane.publish({"kind": "broadcast", "frame": {"event": "notification_batch", "items": batch}})
+
+    async def deliver(self, envelope: dict):
+        """Deliver a backplane envelope to the sockets held by this worker."""
+        if envelope.get("kind") == "read_state":
+            self._deliver_read_state(envelope)
+            return
+        frame = envelope["frame"]
+        if envelope.get("kind") == "user":
+            self._enqueue_for(self._connections.get(envelope["user_id"], ()), json.dumps(frame))
+        elif frame.get("event") == "new_notification":
+            resume_service.recent.record(frame)
+            unread_counters.on_created([frame])
+            self._enqueue_for(self._subscribers(frame), json.dumps(frame))
+        elif frame.get("event") == "notification_batch":
+            for item in frame["items"]:
+                resume_service.recent.record(item)
+            unread_counters.on_created(frame["items"])
+            self._deliver_batch(frame["items"])
+        else:
+            self._enqueue_for((c for conns in self._connections.values() for c in conns), json.dumps(frame))
+
+    def _deliver_read_state(self, envelope: dict):
+        """Apply a user's read change to the cached count and push it to their sockets."""
+        user_id = envelope["user_id"]
+        count = unread_counters.apply(user_id, delta=envelope.get("delta", 0), reset=envelope.get("reset", False))
+        if count is not None:
+            self._enqueue_for(self._connections.get(user_id, ()), json.dumps({"event": "unread_count", "count": count}))
+
+    def _subscribers(self, notification: dict) -> set[ClientConnection]:
+        return self._topics.match(
+            notification["type"], notification["severity"], notification.get("entity_type"), notification.get("entity_id"),
+        )
+
+    def _deliver_batch(self, items: list[dict]):
+        """Send each socket only the batch items it subscribes to.
+
+        Items are serialised once; sockets wanting the same subset share one
+        frame, summarised once per subset.
+        """
+        encoded = [json.dumps(item) for item in items]
+        wanted: dict[ClientConnection, list[int]] = {}
+        for i, item in enumerate(items):
+            for conn in self._subscribers(item):
+                wanted.setdefault(conn, []).append(i)
+        frames: dict[tuple[int, ...], str] = {}
+        for conn, indexes in wanted.items():
+            key = tuple(indexes)
+            if key not in frames:
+                frames[key] = self._batch_frame([items[i] for i in key], [encoded[i] for i in key])
+            conn.enqueue(frames[key])
+
+    def _batch_frame(self, items: list[dict], encoded: list[str]) -> str:
+        if len(items) == 1:
+            return encoded[0]
+        summarised = summarise(items, self.summary_threshold)
+        if summarised is not items:
+            encoded = [json.dumps(item) for item in summarised]
+        return '{"event": "notification_batch", "items": [' + ", ".join(encoded) + "]}"
+
+    @staticmethod
+    def _enqueue_for(conns, message: str):
+        # Snapshot first: an overflow can close a connection and mutate the lists
+        for conn in list(conns):
+            conn.enqueue(message)
+
+    async def resume(self, conn: ClientConnection, since: datetime | None, since_id: str | None):
+        """Send a reconnecting client what it missed since ``since_id`` / ``since``, then go live."""
+        conn.hold()
+        try:
+            items = await resume_service.missed(conn.subscription, since, since_id)
+        except Exception as exc:
+            logger.warning(f"WS resume failed for user={conn.user_id}: {exc}")
+            items = None
+        conn.release(RESYNC_FRAME if items is None else json.dumps({"event": "notification_replay", "items": items}))
+        if items is not None:
+            # Replayed items carry no per-user read state; the authoritative badge follows
             try:
-                await ws.send_text(message)
-            except Exception:
-                pass
+                count = await unread_counters.get(conn.user_id)
+                conn.enqueue(json.dumps({"event": "unread_count", "count": count}))
+            except Exception as exc:
+                logger.warning(f"WS unread count failed for user={conn.user_id}: {exc}")
+
+    async def send_to_user(self, user_id: str, payload: dict):
+        """Send a notification only to a specific user, on whichever worker holds their sockets."""
+        await backplane.publish({"kind": "user", "user_id": user_id, "frame": payload})
+
+    def stats(self) -> dict:
+        depths = [c.depth for cs in self._connections.values() for c in cs]
+        return {
+            "connections": self._total,
+            "users": len(self._connections),
+            "connects_total": self.connects_total,
+            "disconnects_total": self.disconnects_total,
+            "pings_sent": self.pings_sent,
+            "reaped_total": self.reaped_total,
+            "heartbeat_interval_seconds": self.heartbeat_interval,
+            "idle_timeout_seconds": self.idle_timeout,
+            "queue_capacity": self.queue_size,
+            "queued_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "dropped_total": self.dropped_total,
+            "resyncs_total": self.resyncs_total,
+            "slow_disconnects_total": self.slow_disconnects_total,
+            "slow_consumer_policy": self.slow_consumer_policy,
+            "coalesce_pending": len(self._pending),
+        }
 
 
 # Singleton instance shared across the app
-ws_manager = ConnectionManager()
+ws_manager = ConnectionManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    slow_consumer_policy=settings.WS_SLOW_CONSUMER_POLICY,
+    coalesce_window_ms=settings.WS_COALESCE_WINDOW_MS,
+    coalesce_max_items=settings.WS_COALESCE_MAX_ITEMS,
+    summary_threshold=settings.WS_SUMMARY_THRESHOLD,
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL_SECONDS,
+    idle_timeout=settings.WS_IDLE_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,163 @@
+"""FleetFlow – Delta sync for reconnecting WebSocket clients.
+
+A client that reconnects with the last notification it saw (``since_id``)
+or a timestamp (``since``) is sent only what it missed, as one
+``notification_replay`` frame, before live delivery resumes.
+
+Most reconnects follow a short blip, so every worker keeps the last
+WS_RESUME_BUFFER_SIZE broadcast notifications in memory and answers from
+there without touching the database; after a load balancer restart
+thousands of clients reconnecting at once cost no queries. Older gaps fall
+back to an indexed ``created_at`` range scan, with at most
+WS_RESUME_DB_CONCURRENCY scans running at once. A gap larger than
+WS_RESUME_MAX_ITEMS (or an unknown ``since_id``) is answered with a
+``resync`` frame instead, telling the client to refetch over REST.
+
+Notifications are not delivered in ``created_at`` order: the timestamp is
+taken before commit, the coalescing window holds frames back, and workers'
+clocks drift. Resume therefore looks back WS_RESUME_OVERLAP_SECONDS before
+the client's last-seen point instead of starting strictly after it, and
+re-sends that overlap. That, and live frames held back while the replay is
+being built, mean a client may see a notification twice; clients
+deduplicate by id.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+
+from database import async_session
+from models.models import Notification
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def as_utc_naive(value: datetime) -> datetime:
+    """Notifications store naive UTC timestamps; normalise client-supplied ones to match."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class RecentNotifications:
+    """Ring buffer of recently broadcast notifications, ordered by arrival.
+
+    ``floor`` is the point after which every broadcast notification is
+    known to be in the buffer: the worker's start time, raised to the
+    ``created_at`` of each evicted entry.
+    """
+
+    def __init__(self, size: int):
+        self._items: deque[tuple[datetime, str, dict]] = deque(maxlen=size)
+        self._by_id: dict[str, datetime] = {}
+        self.floor = datetime.utcnow()
+
+    def record(self, item: dict):
+        if item.get("event") != "new_notification":
+            return
+        if len(self._items) == self._items.maxlen:
+            evicted_at, evicted_id, _ = self._items[0]
+            self._by_id.pop(evicted_id, None)
+            self.floor = max(self.floor, evicted_at)
+        created_at = datetime.fromisoformat(item["created_at"])
+        self._items.append((created_at, item["id"], item))
+        self._by_id[item["id"]] = created_at
+
+    def created_at_of(self, notification_id: str) -> datetime | None:
+        return self._by_id.get(notification_id)
+
+    def after(self, since: datetime) -> list[tuple[datetime, str, dict]] | None:
+        """Notifications created at or after ``since``, or None if the buffer may not hold them all."""
+        if since < self.floor:
+            return None
+        return sorted((e for e in self._items if e[0] >= since), key=lambda e: (e[0], e[1]))
+
+
+class ResumeService:
+    """Answers reconnect deltas from the ring buffer, falling back to the database."""
+
+    def __init__(self, buffer_size: int, max_items: int, db_concurrency: int, overlap_seconds: float):
+        self.recent = RecentNotifications(buffer_size)
+        self.max_items = max_items
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self._db_slots = asyncio.Semaphore(db_concurrency)
+        self.served_from_buffer = 0
+        self.served_from_db = 0
+        self.resyncs = 0
+
+    async def missed(self, subscription, since: datetime | None, since_id: str | None) -> list[dict] | None:
+        """Notifications the client missed that match its subscription, oldest first.
+
+        Returns None when the client should resync over REST instead.
+        """
+        if since_id is not None:
+            since = self.recent.created_at_of(since_id) or await self._created_at_from_db(since_id)
+            if since is None:
+                self.resyncs += 1
+                return None
+        # Items committed or delivered late can sort before the last one seen
+        since = as_utc_naive(since) - self.overlap
+
+        entries = self.recent.after(since)
+        if entries is not None:
+            self.served_from_buffer += 1
+            items = [item for _, _, item in entries]
+        else:
+            items = await self._missed_from_db(since)
+            if items is None:
+                self.resyncs += 1
+                return None
+            self.served_from_db += 1
+
+        items = [
+            item for item in items
+            if item["id"] != since_id and subscription.matches(item["type"], item["severity"], item.get("entity_type"), item.get("entity_id"))
+        ]
+        if len(items) > self.max_items:
+            self.resyncs += 1
+            return None
+        return items
+
+    async def _created_at_from_db(self, notification_id: str) -> datetime | None:
+        async with self._db_slots, async_session() as db:
+            return (await db.execute(
+                select(Notification.created_at).where(Notification.id == notification_id)
+            )).scalar_one_or_none()
+
+    async def _missed_from_db(self, since: datetime) -> list[dict] | None:
+        from automation.notification_helper import _ws_payload
+
+        query = (
+            select(Notification)
+            .where(Notification.created_at >= since)
+            .order_by(Notification.created_at, Notification.id)
+        )
+        # Scanned before subscription filtering, so bound it generously
+        limit = self.max_items * 4
+        async with self._db_slots, async_session() as db:
+            rows = (await db.execute(query.limit(limit + 1))).scalars().all()
+        if len(rows) > limit:
+            return None
+        return [_ws_payload(row) for row in rows]
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self.recent._items),
+            "buffer_floor": self.recent.floor.isoformat(),
+            "served_from_buffer": self.served_from_buffer,
+            "served_from_db": self.served_from_db,
+            "resyncs": self.resyncs,
+        }
+
+
+# Singleton instance shared across the app
+resume_service = ResumeService(
+    buffer_size=settings.WS_RESUME_BUFFER_SIZE,
+    max_items=settings.WS_RESUME_MAX_ITEMS,
+    db_concurrency=settings.WS_RESUME_DB_CONCURRENCY,
+    overlap_seconds=settings.WS_RESUME_OVERLAP_SECONDS,
+)
@@ -0,0 +1,155 @@
+"""FleetFlow – WebSocket notification subscriptions and the topic index.
+
+A subscription filters live notifications on three dimensions – type,
+severity and entity – where an empty set means "any". A socket starts out
+subscribed to its role's notification types (fleet managers get every
+type); the client can replace that by sending
+
+    {"action": "subscribe",
+     "types": ["safety"], "severities": ["warning", "critical"],
+     "roles": ["dispatcher"],
+     "entities": [{"entity_type": "vehicle", "entity_id": "<id>"},
+                  {"entity_type": "trip"}]}
+
+``roles`` expands to those roles' types, ``types`` adds to them, and an
+entity without ``entity_id`` matches every entity of that type. Omitting
+both ``types`` and ``roles`` keeps the connection's role default.
+
+``TopicIndex`` keeps, per dimension, the sockets subscribed to each value
+plus those subscribed to any value, so a notification is matched by
+scanning only the smallest candidate set rather than every socket.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass
+
+from models.models import NotificationType, NotificationSeverity, UserRole
+
+ANY = None
+_EMPTY: frozenset = frozenset()
+
+ROLE_NOTIFICATION_TYPES: dict[str, frozenset[str]] = {
+    UserRole.FLEET_MANAGER.value: frozenset(),   # everything
+    UserRole.DISPATCHER.value: frozenset({
+        NotificationType.OPERATIONAL.value, NotificationType.MAINTENANCE.value, NotificationType.SAFETY.value,
+    }),
+    UserRole.SAFETY_OFFICER.value: frozenset({NotificationType.SAFETY.value, NotificationType.COMPLIANCE.value}),
+    UserRole.FINANCIAL_ANALYST.value: frozenset({NotificationType.FINANCIAL.value}),
+}
+
+_TYPES = {t.value for t in NotificationType}
+_SEVERITIES = {s.value for s in NotificationSeverity}
+
+
+@dataclass(frozen=True)
+class Subscription:
+    types: frozenset[str] = _EMPTY
+    severities: frozenset[str] = _EMPTY
+    # (entity_type, entity_id); entity_id None matches every entity of the type
+    entities: frozenset[tuple[str, str | None]] = _EMPTY
+
+    def matches(self, type: str, severity: str, entity_type: str | None, entity_id: str | None) -> bool:
+        return (
+            (not self.types or type in self.types)
+            and (not self.severities or severity in self.severities)
+            and (not self.entities or (entity_type, entity_id) in self.entities
+                 or (entity_type, ANY) in self.entities)
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "types": sorted(self.types),
+            "severities": sorted(self.severities),
+            "entities": [
+                {"entity_type": et, "entity_id": eid} for et, eid in sorted(self.entities, key=lambda e: (e[0], e[1] or ""))
+            ],
+        }
+
+
+def role_subscription(role: str | None) -> Subscription:
+    """Default subscription for a role; unknown roles get every notification."""
+    return Subscription(types=ROLE_NOTIFICATION_TYPES.get(role, _EMPTY))
+
+
+def _choices(values, allowed: set[str], field: str) -> frozenset[str]:
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        raise ValueError(f"'{field}' must be a list of strings")
+    unknown = set(values) - allowed
+    if unknown:
+        raise ValueError(f"unknown {field}: {sorted(unknown)}")
+    return frozenset(values)
+
+
+def parse_subscription(message: dict, role: str | None) -> Subscription:
+    """Build a Subscription from a client ``subscribe`` message; raises ValueError."""
+    if "roles" in message or "types" in message:
+        presets = [
+            ROLE_NOTIFICATION_TYPES[r]
+            for r in _choices(message.get("roles", []), set(ROLE_NOTIFICATION_TYPES), "roles")
+        ]
+        types = frozenset().union(*presets, _choices(message.get("types", []), _TYPES, "types"))
+        # A role without restriction (fleet manager) widens the subscription to every type
+        if any(not preset for preset in presets):
+            types = _EMPTY
+    else:
+        types = role_subscription(role).types
+
+    entities = set()
+    for entity in message.get("entities", []):
+        if not isinstance(entity, dict) or not isinstance(entity.get("entity_type"), str):
+            raise ValueError("each entity needs an 'entity_type'")
+        entity_id = entity.get("entity_id")
+        if entity_id is not None and not isinstance(entity_id, str):
+            raise ValueError("'entity_id' must be a string")
+        entities.add((entity["entity_type"], entity_id))
+
+    return Subscription(
+        types=types,
+        severities=_choices(message.get("severities", []), _SEVERITIES, "severities"),
+        entities=frozenset(entities),
+    )
+
+
+class TopicIndex:
+    """Inverted index from topic values to subscribed connections."""
+
+    def __init__(self):
+        self._types: dict[str | None, set] = defaultdict(set)
+        self._severities: dict[str | None, set] = defaultdict(set)
+        self._entities: dict[tuple | None, set] = defaultdict(set)
+
+    def _dimensions(self, sub: Subscription):
+        yield self._types, sub.types
+        yield self._severities, sub.severities
+        yield self._entities, sub.entities
+
+    def add(self, conn, sub: Subscription):
+        for index, values in self._dimensions(sub):
+            for value in values or (ANY,):
+                index[value].add(conn)
+
+    def remove(self, conn, sub: Subscription):
+        for index, values in self._dimensions(sub):
+            for value in values or (ANY,):
+                members = index.get(value)
+                if members is not None:
+                    members.discard(conn)
+                    if not members:
+                        del index[value]
+
+    def match(self, type: str, severity: str, entity_type: str | None, entity_id: str | None) -> set:
+        """Connections whose subscription matches a notification."""
+        candidates = min(
+            (
+                (self._types.get(type, _EMPTY), self._types.get(ANY, _EMPTY)),
+                (self._severities.get(severity, _EMPTY), self._severities.get(ANY, _EMPTY)),
+                (self._entities.get((entity_type, entity_id), _EMPTY),
+                 self._entities.get((entity_type, ANY), _EMPTY),
+                 self._entities.get(ANY, _EMPTY)),
+            ),
+            key=lambda sets: sum(map(len, sets)),
+        )
+        return {
+            conn for members in candidates for conn in members
+            if conn.subscription.matches(type, severity, entity_type, entity_id)
+        }
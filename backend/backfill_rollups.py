@@ -0,0 +1,47 @@
+"""FleetFlow – Backfill the daily analytics rollups in bounded batches.
+
+Usage:
+    python backfill_rollups.py                       # from first recorded activity to today
+    python backfill_rollups.py --start 2025-01-01 --end 2025-07-01 --batch-days 14
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import date, timedelta
+
+from database import async_session, engine, Base
+from automation.rollups import rebuild_rollups, earliest_activity_day, day_batches
+
+
+async def backfill(start: date | None, end: date | None, batch_days: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with async_session() as session:
+        start = start or await earliest_activity_day(session)
+        if start is None:
+            print("Nothing to backfill – no trips, fuel or maintenance records found.")
+            return
+        end = end or date.today() + timedelta(days=1)
+
+        print(f"Backfilling rollups for [{start}, {end}) in batches of {batch_days} days")
+        totals = [0, 0]
+        began = time.monotonic()
+        for batch_start, batch_end in day_batches(start, end, batch_days):
+            vehicle_rows, driver_rows = await rebuild_rollups(session, batch_start, batch_end)
+            totals[0] += vehicle_rows
+            totals[1] += driver_rows
+            print(f"   {batch_start} → {batch_end}: {vehicle_rows} vehicle rows, {driver_rows} driver rows")
+
+    print(f"✅ Backfilled {totals[0]} vehicle rows and {totals[1]} driver rows "
+          f"in {time.monotonic() - began:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill FleetFlow daily analytics rollups.")
+    parser.add_argument("--start", type=date.fromisoformat, help="first day (inclusive), YYYY-MM-DD")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day (exclusive), YYYY-MM-DD")
+    parser.add_argument("--batch-days", type=int, default=7, help="days rebuilt per transaction")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.start, args.end, max(args.batch_days, 1)))
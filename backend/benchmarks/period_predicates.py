@@ -0,0 +1,105 @@
+"""FleetFlow – Benchmark: EXTRACT() vs half-open month-range predicates.
+
+Builds a synthetic fuel log table (default 5M rows) in a scratch schema,
+then prints EXPLAIN ANALYZE for the per-vehicle monthly cost query written
+both ways. Expect a sequential scan for EXTRACT(year/month ...) and an index
+range scan on (vehicle_id, date) for the half-open predicate.
+
+Usage (PostgreSQL only):
+    cd backend
+    python benchmarks/period_predicates.py --rows 5000000 --vehicles 2000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import get_settings
+from automation.periods import month_bounds
+
+SCHEMA = "bench_periods"
+
+
+async def build_fixture(conn, rows: int, vehicles: int):
+    await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    await conn.execute(text(f"""
+        CREATE TABLE {SCHEMA}.fuel_logs (
+            id bigint PRIMARY KEY,
+            vehicle_id text NOT NULL,
+            date date NOT NULL,
+            total_cost numeric(12, 2) NOT NULL
+        )
+    """))
+    started = time.monotonic()
+    await conn.execute(text(f"""
+        INSERT INTO {SCHEMA}.fuel_logs (id, vehicle_id, date, total_cost)
+        SELECT g,
+               'veh-' || (g % :vehicles),
+               DATE '2021-01-01' + (g % 1826),
+               round((random() * 5000)::numeric, 2)
+        FROM generate_series(1, :rows) AS g
+    """), {"rows": rows, "vehicles": vehicles})
+    await conn.execute(text(f"CREATE INDEX ON {SCHEMA}.fuel_logs (date)"))
+    await conn.execute(text(f"CREATE INDEX ON {SCHEMA}.fuel_logs (vehicle_id, date)"))
+    await conn.execute(text(f"ANALYZE {SCHEMA}.fuel_logs"))
+    print(f"fixture: {rows:,} rows across {vehicles:,} vehicles in {time.monotonic() - started:.1f}s")
+
+
+async def explain(conn, label: str, sql: str, params: dict):
+    plan = (await conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)).scalars().all()
+    print(f"\n── {label} " + "─" * max(0, 60 - len(label)))
+    for line in plan:
+        print(line)
+
+
+async def main(rows: int, vehicles: int, keep: bool):
+    engine = create_async_engine(get_settings().DATABASE_URL)
+    year, month = 2024, 6
+    start, end = month_bounds(year, month)
+    try:
+        async with engine.begin() as conn:
+            await build_fixture(conn, rows, vehicles)
+
+        async with engine.connect() as conn:
+            await explain(
+                conn, "EXTRACT(year/month)",
+                f"""SELECT coalesce(sum(total_cost), 0) FROM {SCHEMA}.fuel_logs
+                    WHERE vehicle_id = :vid
+                      AND extract(year FROM date) = :year
+                      AND extract(month FROM date) = :month""",
+                {"vid": "veh-42", "year": year, "month": month},
+            )
+            await explain(
+                conn, "half-open range",
+                f"""SELECT coalesce(sum(total_cost), 0) FROM {SCHEMA}.fuel_logs
+                    WHERE vehicle_id = :vid AND date >= :start AND date < :end""",
+                {"vid": "veh-42", "start": start, "end": end},
+            )
+            await explain(
+                conn, "fleet-wide half-open range",
+                f"""SELECT coalesce(sum(total_cost), 0) FROM {SCHEMA}.fuel_logs
+                    WHERE date >= :start AND date < :end""",
+                {"start": start, "end": end},
+            )
+    finally:
+        if not keep:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--vehicles", type=int, default=2_000)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema afterwards")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.vehicles, args.keep))
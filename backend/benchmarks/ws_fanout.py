@@ -0,0 +1,107 @@
+"""FleetFlow – Benchmark: cross-worker fan-out latency over LISTEN/NOTIFY.
+
+Starts N listener processes (default 4, standing in for uvicorn workers),
+each running the app's Backplane, then publishes timestamped broadcast
+envelopes from the parent process the same way ws_manager does. Every
+listener records publish → local-delivery latency; the parent prints
+p50 / p95 / p99 / max per worker and overall.
+
+Usage (PostgreSQL only):
+    cd backend
+    python benchmarks/ws_fanout.py --workers 4 --messages 2000 --rate 500
+"""
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+CHANNEL = "fleetflow_ws_bench"
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def listener(worker: int, expected: int, ready, results):
+    from automation.pubsub import Backplane
+
+    async def main():
+        latencies: list[float] = []
+        done = asyncio.Event()
+
+        async def deliver(envelope: dict):
+            latencies.append((time.time() - envelope["frame"]["sent_at"]) * 1000)
+            if len(latencies) >= expected:
+                done.set()
+
+        backplane = Backplane(CHANNEL)
+        backplane.start(deliver)
+        if not await backplane.wait_connected(timeout=10):
+            raise SystemExit(f"worker {worker}: could not connect")
+        ready.put(worker)
+        try:
+            await asyncio.wait_for(done.wait(), timeout=120)
+        except asyncio.TimeoutError:
+            pass
+        await backplane.stop()
+        results.put((worker, latencies))
+
+    asyncio.run(main())
+
+
+async def publish(messages: int, rate: float):
+    from automation.pubsub import Backplane
+
+    backplane = Backplane(CHANNEL)   # not started: publish-only, like a CLI job
+    interval = 1.0 / rate if rate > 0 else 0
+    started = time.perf_counter()
+    for i in range(messages):
+        await backplane.publish({"kind": "broadcast", "frame": {"event": "bench", "seq": i, "sent_at": time.time()}})
+        if interval:
+            delay = started + (i + 1) * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500, help="messages per second (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    ready, results = ctx.Queue(), ctx.Queue()
+    procs = [ctx.Process(target=listener, args=(w, args.messages, ready, results)) for w in range(args.workers)]
+    for p in procs:
+        p.start()
+    for _ in procs:
+        ready.get(timeout=30)
+
+    elapsed = asyncio.run(publish(args.messages, args.rate))
+    print(f"published {args.messages} messages in {elapsed:.2f}s ({args.messages / elapsed:,.0f}/s)\n")
+
+    everything: list[float] = []
+    print(f"{'worker':<8}{'received':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for _ in procs:
+        worker, latencies = results.get(timeout=180)
+        everything.extend(latencies)
+        print(f"{worker:<8}{len(latencies):>10}{percentile(latencies, 50):>10.2f}{percentile(latencies, 95):>10.2f}"
+              f"{percentile(latencies, 99):>10.2f}{max(latencies, default=0):>10.2f}")
+    for p in procs:
+        p.join()
+    print(f"{'all':<8}{len(everything):>10}{percentile(everything, 50):>10.2f}{percentile(everything, 95):>10.2f}"
+          f"{percentile(everything, 99):>10.2f}{max(everything, default=0):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
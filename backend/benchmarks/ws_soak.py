@@ -0,0 +1,175 @@
+"""FleetFlow – Soak test: ConnectionManager holding 10k simulated sockets.
+
+Connects N in-process simulated sockets (default 10,000) to a
+ConnectionManager with a short heartbeat, then broadcasts notifications at
+a steady rate for the test duration. A share of the sockets is half-open:
+they never answer pings and their sends hang, the way a dead TCP peer
+behaves. Healthy sockets answer every ping with a pong.
+
+At the end it checks that every half-open socket was reaped and no healthy
+one was, and prints connect throughput, fan-out cost per broadcast,
+delivery latency (sampled), heartbeat sweep times, peak RSS and the
+manager's stats.
+
+The database is not touched (the backplane runs in local-only mode), so
+this measures the manager itself, not the network stack.
+
+Usage:
+    cd backend
+    python benchmarks/ws_soak.py --sockets 10000 --duration 30 --rate 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
+
+TYPES = ["safety", "financial", "maintenance", "compliance", "operational"]
+ROLES = ["fleet_manager", "dispatcher", "safety_officer", "financial_analyst"]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class SimSocket:
+    """Stands in for a Starlette WebSocket."""
+
+    def __init__(self, half_open: bool, sample: bool, latencies: list[float]):
+        self.half_open = half_open
+        self.sample = sample
+        self.latencies = latencies
+        self.conn = None
+        self.received = 0
+        self.closed_with: int | None = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.half_open:
+            await asyncio.Event().wait()   # never completes, like a dead peer's full send buffer
+        self.received += 1
+        if message == '{"event": "ping"}':
+            self.conn.touch()   # the client's pong
+        elif self.sample:
+            frame = json.loads(message)
+            for item in frame.get("items", [frame]):
+                if "sent_at" in item:
+                    self.latencies.append((time.perf_counter() - item["sent_at"]) * 1000)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+
+async def run(args):
+    from automation.ws_manager import ConnectionManager, IDLE_CLOSE_CODE
+    from automation.pubsub import backplane
+
+    manager = ConnectionManager(
+        queue_size=args.queue_size,
+        slow_consumer_policy="resync",
+        coalesce_window_ms=args.coalesce_ms,
+        heartbeat_interval=args.heartbeat,
+        idle_timeout=args.idle_timeout,
+    )
+    backplane.start(manager.deliver)
+
+    latencies: list[float] = []
+    sockets: list[SimSocket] = []
+    half_open_count = int(args.sockets * args.half_open)
+    started = time.perf_counter()
+    for i in range(args.sockets):
+        sock = SimSocket(half_open=i < half_open_count, sample=i % 100 == 0, latencies=latencies)
+        sock.conn = await manager.connect(sock, f"user-{i % args.users}", ROLES[i % len(ROLES)])
+        sockets.append(sock)
+    connect_secs = time.perf_counter() - started
+    print(f"connected {manager.total_connections} sockets ({half_open_count} half-open) "
+          f"in {connect_secs:.2f}s = {args.sockets / connect_secs:,.0f}/s")
+
+    sweeps: list[float] = []
+
+    async def heartbeats():
+        while True:
+            await asyncio.sleep(args.heartbeat)
+            t0 = time.perf_counter()
+            await manager.heartbeat()
+            sweeps.append((time.perf_counter() - t0) * 1000)
+
+    fanout: list[float] = []
+    sent = 0
+    heartbeat_task = asyncio.create_task(heartbeats())
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        await manager.broadcast_notification({
+            "event": "new_notification",
+            "id": str(sent),
+            "type": random.choice(TYPES),
+            "severity": "info",
+            "title": f"soak {sent}",
+            "message": "soak test",
+            "entity_type": None,
+            "entity_id": None,
+            "created_at": "2026-01-01T00:00:00",
+            "sent_at": t0,
+        })
+        fanout.append((time.perf_counter() - t0) * 1000)
+        sent += 1
+        await asyncio.sleep(max(0.0, 1 / args.rate - (time.perf_counter() - t0)))
+    await asyncio.sleep(args.heartbeat)   # let the last sweep run
+    heartbeat_task.cancel()
+    await manager.flush()
+
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    reaped = sum(1 for s in sockets if s.closed_with == IDLE_CLOSE_CODE)
+    wrongly_reaped = sum(1 for s in sockets if s.closed_with == IDLE_CLOSE_CODE and not s.half_open)
+    delivered = sum(s.received for s in sockets)
+
+    print(f"broadcasts {sent}  frames delivered {delivered:,}")
+    print(f"fan-out per broadcast  p50 {percentile(fanout, 50):.2f} ms  p99 {percentile(fanout, 99):.2f} ms  "
+          f"max {max(fanout, default=0):.2f} ms")
+    print(f"delivery latency (1% sample)  p50 {percentile(latencies, 50):.1f} ms  "
+          f"p99 {percentile(latencies, 99):.1f} ms  max {max(latencies, default=0):.1f} ms")
+    print(f"heartbeat sweeps {len(sweeps)}  p50 {percentile(sweeps, 50):.1f} ms  max {max(sweeps, default=0):.1f} ms")
+    print(f"reaped {reaped}/{half_open_count} half-open, {wrongly_reaped} healthy; "
+          f"{manager.total_connections} still connected")
+    print(f"peak RSS {rss_mb:,.0f} MB")
+    print(json.dumps(manager.stats(), indent=2))
+
+    for sock in sockets:
+        if sock.conn is not None:
+            await sock.conn.close()
+    if reaped != half_open_count or wrongly_reaped:
+        raise SystemExit("FAIL: reaping did not match the half-open sockets")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=4_000, help="distinct user ids (several tabs per user)")
+    parser.add_argument("--half-open", type=float, default=0.05, help="share of sockets that never answer")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of broadcasting")
+    parser.add_argument("--rate", type=float, default=20.0, help="broadcasts per second")
+    parser.add_argument("--heartbeat", type=float, default=1.0, help="heartbeat interval (seconds)")
+    parser.add_argument("--idle-timeout", type=float, default=3.0, help="idle reap threshold (seconds)")
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--coalesce-ms", type=int, default=0)
+    args = parser.parse_args()
+    if args.duration < args.idle_timeout + args.heartbeat:
+        parser.error("--duration must exceed --idle-timeout + --heartbeat for reaping to happen")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
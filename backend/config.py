@@ -1,5 +1,6 @@
 """FleetFlow – Configuration."""
 
+from typing import Literal
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -18,6 +19,40 @@ class Settings(BaseSettings):
     MAINTENANCE_KM_INTERVAL: float = 10000.0     # km before next service reminder
     LICENSE_WARN_DAYS: int = 30                  # days before expiry to warn
     FUEL_ANOMALY_THRESHOLD_PCT: float = 20.0     # % deviation to flag
+    FUEL_ANOMALY_MODE: Literal["threshold", "zscore", "mad"] = "threshold"
+    FUEL_ANOMALY_SCORE: float = 3.0              # |z| / robust z to flag in zscore / mad mode
+    FUEL_ANOMALY_MIN_PEERS: int = 5              # smaller make+fuel groups fall back to threshold
+    NOTIFICATION_SUPPRESSION_HOURS: float = 48.0 # repeats of a deduplicated alert within this window bump its count
+    UNREAD_COUNTER_MAX_USERS: int = 10000        # users whose unread count is cached in memory
+    UNREAD_COUNTER_TTL_SECONDS: float = 300.0    # cached counts are re-read from the database after this
+    KPI_CACHE_TTL_SECONDS: float = 300.0         # upper bound on dashboard KPI staleness
+    COST_RECALC_QUIET_SECONDS: float = 2.0       # flush cost recalcs after this much event silence
+    COST_RECALC_MAX_DELAY_SECONDS: float = 15.0  # ...or at most this long after the first dirty mark
+    ROLLUP_LOOKBACK_DAYS: int = 2                # trailing days refreshed by the rollup job
+    ROLLUP_INTERVAL_MINUTES: int = 15
+    # Domain event outbox
+    EVENT_WORKERS: int = 4                       # concurrent outbox workers per app instance
+    EVENT_CLAIM_BATCH: int = 20                  # events leased per claim
+    EVENT_POLL_INTERVAL_SECONDS: float = 1.0     # idle poll when no commit wakes the workers
+    EVENT_LEASE_SECONDS: float = 60.0            # claimed events become reclaimable after this
+    EVENT_MAX_ATTEMPTS: int = 5                  # then the event is parked as failed
+    EVENT_RETRY_BASE_SECONDS: float = 2.0        # backoff doubles per attempt...
+    EVENT_RETRY_MAX_SECONDS: float = 300.0       # ...up to this ceiling
+    EVENT_HANDLER_CONCURRENCY: int = 8           # handlers running at once across all events
+    EVENT_HANDLER_TIMEOUT_SECONDS: float = 30.0  # default per-handler timeout (cancelled after)
+    WS_BACKPLANE_CHANNEL: str = "fleetflow_ws"  # LISTEN/NOTIFY channel for cross-worker fan-out
+    WS_SEND_QUEUE_SIZE: int = 256                # outbound frames buffered per socket
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0        # a single send stalled this long closes the socket
+    WS_SLOW_CONSUMER_POLICY: Literal["resync", "disconnect"] = "resync"
+    WS_COALESCE_WINDOW_MS: int = 250             # notifications within this window share one frame (0 = off)
+    WS_COALESCE_MAX_ITEMS: int = 500             # flush the window early once this many are pending
+    WS_SUMMARY_THRESHOLD: int = 10               # this many of one kind in a frame collapse into a summary
+    WS_RESUME_BUFFER_SIZE: int = 2000            # recent notifications kept in memory for reconnect deltas
+    WS_RESUME_MAX_ITEMS: int = 500               # larger gaps get a resync frame instead of a replay
+    WS_RESUME_DB_CONCURRENCY: int = 4            # reconnect range scans allowed at once
+    WS_RESUME_OVERLAP_SECONDS: float = 5.0       # resume re-sends this far back (> coalesce window + commit latency + clock skew)
+    WS_HEARTBEAT_INTERVAL_SECONDS: float = 20.0  # server pings every socket this often
+    WS_IDLE_TIMEOUT_SECONDS: float = 60.0        # sockets silent this long (no pong) are reaped
 
     class Config:
         env_file = ".env"
@@ -1,5 +1,6 @@
 """FleetFlow – Async SQLAlchemy database engine & session."""
 
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from config import get_settings
@@ -20,3 +21,8 @@ async def get_db() -> AsyncSession:  # type: ignore[misc]
             yield session
         finally:
             await session.close()
+
+
+def dialect_insert(db: AsyncSession):
+    """INSERT construct supporting ON CONFLICT for the session's backend (PostgreSQL or SQLite)."""
+    return postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
@@ -10,7 +10,8 @@ from database import engine, Base
 # Import all models so they register with Base.metadata
 from models.models import (  # noqa: F401
     User, Vehicle, Driver, Trip, MaintenanceLog, FuelLog,
-    Notification, DomainEvent, AnalyticsSummary, AutomationLog,
+    Notification, DomainEvent, EventHandlerReceipt, AnalyticsSummary, AutomationLog, FleetCounter,
+    DailyVehicleRollup, DailyDriverRollup, RollupDirtyDay, VehicleFuelBucket,
 )
 
 from routers.auth_router import router as auth_router
@@ -23,6 +24,7 @@ from routers.analytics_router import router as analytics_router
 from routers.notification_router import router as notification_router
 from routers.websocket_router import router as websocket_router
 from routers.search_router import router as search_router
+from routers.event_router import router as event_router
 
 settings = get_settings()
 
@@ -33,8 +35,16 @@ async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
 
-    # Register domain event handlers
+    # Register domain event handlers and start the outbox workers
     import automation.event_handlers  # noqa: F401 – registers handlers via decorators
+    from automation.outbox import event_outbox
+    event_outbox.start()
+
+    # Cross-worker WebSocket fan-out
+    from automation.ws_manager import ws_manager
+    from automation.pubsub import backplane
+    backplane.start(ws_manager.deliver)
+    ws_manager.start()
 
     # Start background scheduler
     from automation.scheduler import start_scheduler, stop_scheduler
@@ -43,6 +53,11 @@ async def lifespan(app: FastAPI):
     yield
 
     stop_scheduler()
+    await event_outbox.stop()
+    await ws_manager.stop()
+    await backplane.stop()
+    from automation.recalc_queue import recalc_queue
+    await recalc_queue.stop()
     await engine.dispose()
 
 
@@ -73,6 +88,7 @@ app.include_router(analytics_router)
 app.include_router(notification_router)
 app.include_router(websocket_router)
 app.include_router(search_router)
+app.include_router(event_router)
 
 
 @app.get("/api/health")
@@ -4,8 +4,9 @@ import uuid
 from datetime import datetime, date
 from sqlalchemy import (
     String, Integer, Float, Boolean, Text, Date, DateTime,
-    ForeignKey, Index, Enum as SAEnum, Numeric,
+    ForeignKey, Index, Enum as SAEnum, Numeric, JSON, text,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from database import Base
 import enum
@@ -99,6 +100,10 @@ class Vehicle(Base):
     maintenance_logs: Mapped[list["MaintenanceLog"]] = relationship(back_populates="vehicle")
     fuel_logs: Mapped[list["FuelLog"]] = relationship(back_populates="vehicle")
 
+    __table_args__ = (
+        Index("ix_vehicles_created_id", "created_at", "id"),   # list order / keyset cursor
+    )
+
 
 # ── Drivers ──────────────────────────────────────────────────────────────
 
@@ -111,7 +116,7 @@ class Driver(Base):
     phone: Mapped[str] = mapped_column(String(20), nullable=False)
     email: Mapped[str | None] = mapped_column(String(255), nullable=True)
     license_number: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
-    license_expiry: Mapped[date] = mapped_column(Date, nullable=False)
+    license_expiry: Mapped[date] = mapped_column(Date, nullable=False, index=True)
     status: Mapped[DriverStatus] = mapped_column(SAEnum(DriverStatus), default=DriverStatus.AVAILABLE)
     total_trips: Mapped[int] = mapped_column(Integer, default=0)
     safety_score: Mapped[float] = mapped_column(Float, default=100.0)
@@ -121,6 +126,10 @@ class Driver(Base):
     # relationships
     trips: Mapped[list["Trip"]] = relationship(back_populates="driver")
 
+    __table_args__ = (
+        Index("ix_drivers_created_id", "created_at", "id"),   # list order / keyset cursor
+    )
+
 
 # ── Trips ────────────────────────────────────────────────────────────────
 
@@ -154,6 +163,8 @@ class Trip(Base):
 
     __table_args__ = (
         Index("ix_trips_status_scheduled", "status", "scheduled_departure"),
+        Index("ix_trips_vehicle_scheduled", "vehicle_id", "scheduled_departure"),
+        Index("ix_trips_scheduled_id", "scheduled_departure", "id"),   # list order / keyset cursor
     )
 
 
@@ -179,6 +190,21 @@ class MaintenanceLog(Base):
     # relationships
     vehicle: Mapped["Vehicle"] = relationship(back_populates="maintenance_logs")
 
+    __table_args__ = (
+        # (…, id) so list pages and keyset cursors are served in index order
+        Index("ix_maintenance_logs_vehicle_scheduled_id", "vehicle_id", "scheduled_date", "id"),
+        Index("ix_maintenance_logs_scheduled_id", "scheduled_date", "id"),
+    )
+
+
+# Latest completed service per vehicle (maintenance monitor / predictive engine)
+Index(
+    "ix_maintenance_logs_vehicle_status_odometer",
+    MaintenanceLog.vehicle_id,
+    MaintenanceLog.status,
+    MaintenanceLog.odometer_at_service.desc(),
+)
+
 
 # ── Fuel & Expense Logs ─────────────────────────────────────────────────
 
@@ -187,7 +213,7 @@ class FuelLog(Base):
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     vehicle_id: Mapped[str] = mapped_column(ForeignKey("vehicles.id"), nullable=False, index=True)
-    date: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    date: Mapped[date] = mapped_column(Date, nullable=False)
     fuel_type: Mapped[FuelType] = mapped_column(SAEnum(FuelType), nullable=False)
     quantity_liters: Mapped[float] = mapped_column(Float, nullable=False)
     price_per_liter: Mapped[float] = mapped_column(Numeric(8, 2), nullable=False)
@@ -202,6 +228,12 @@ class FuelLog(Base):
     # relationships
     vehicle: Mapped["Vehicle"] = relationship(back_populates="fuel_logs")
 
+    __table_args__ = (
+        # (…, id) so list pages and keyset cursors are served in index order
+        Index("ix_fuel_logs_vehicle_date_id", "vehicle_id", "date", "id"),
+        Index("ix_fuel_logs_date_id", "date", "id"),
+    )
+
 
 # ── Automation: Notifications ─────────────────────────────────────────────
 
@@ -229,8 +261,39 @@ class Notification(Base):
     message: Mapped[str] = mapped_column(Text, nullable=False)
     entity_type: Mapped[str | None] = mapped_column(String(50), nullable=True)   # "driver", "vehicle", "trip"
     entity_id: Mapped[str | None] = mapped_column(String(36), nullable=True)
-    is_read: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    is_read: Mapped[bool] = mapped_column(Boolean, default=False, index=True)   # legacy global flag; see NotificationReadState
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Deduplication (see automation/notification_helper.py): "<type>:<entity_type>:<entity_id>:<rule>"
+    dedup_key: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    occurrence_count: Mapped[int] = mapped_column(Integer, default=1)
+    last_occurred_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # At most one open row per dedup key; repeats upsert into it
+        Index("uq_notifications_dedup_key", "dedup_key", unique=True,
+              postgresql_where=text("dedup_key IS NOT NULL"), sqlite_where=text("dedup_key IS NOT NULL")),
+        Index("ix_notifications_created_id", "created_at", "id"),   # list order / keyset cursor / resume scans
+        Index("ix_notifications_type_created_id", "type", "created_at", "id"),
+    )
+
+
+class NotificationReadState(Base):
+    """Per-user read watermark: every notification created at or before
+    ``read_through`` is read by that user ("mark all read" moves it)."""
+    __tablename__ = "notification_read_state"
+
+    user_id: Mapped[str] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    read_through: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class NotificationRead(Base):
+    """Exceptions to the watermark: notifications a user read one by one after it."""
+    __tablename__ = "notification_reads"
+
+    user_id: Mapped[str] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    notification_id: Mapped[str] = mapped_column(ForeignKey("notifications.id", ondelete="CASCADE"), primary_key=True)
+    read_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
 # ── Automation: Domain Events ─────────────────────────────────────────────
@@ -240,9 +303,33 @@ class DomainEvent(Base):
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     event_type: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
-    payload: Mapped[str] = mapped_column(Text, nullable=False)   # JSON string
+    payload: Mapped[dict] = mapped_column(JSON().with_variant(JSONB, "postgresql"), nullable=False)
     triggered_by: Mapped[str | None] = mapped_column(String(36), nullable=True)   # user_id
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    # Outbox delivery state (see automation/outbox.py)
+    status: Mapped[str] = mapped_column(String(20), default="pending")   # pending | processing | done | failed
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    available_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)   # next claim / lease expiry
+    completed_handlers: Mapped[str | None] = mapped_column(Text, nullable=True)   # JSON list of handler names
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    processed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_domain_events_status_available", "status", "available_at"),
+        Index("ix_domain_events_type_created", "event_type", "created_at"),
+        # Containment lookups (payload @> '{"vehicle_id": ...}') on PostgreSQL
+        Index("ix_domain_events_payload", "payload",
+              postgresql_using="gin", postgresql_ops={"payload": "jsonb_path_ops"}),
+    )
+
+
+class EventHandlerReceipt(Base):
+    """An (event, handler) pair whose writes have committed; see event_dispatcher.first_delivery."""
+    __tablename__ = "event_handler_receipts"
+
+    event_id: Mapped[str] = mapped_column(ForeignKey("domain_events.id", ondelete="CASCADE"), primary_key=True)
+    handler: Mapped[str] = mapped_column(String(255), primary_key=True)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
 # ── Automation: Analytics Summary ─────────────────────────────────────────
@@ -266,6 +353,9 @@ class AnalyticsSummary(Base):
 
     __table_args__ = (
         Index("ix_analytics_period_vehicle", "period_year", "period_month", "vehicle_id", unique=True),
+        # NULLs never collide above, so the fleet-wide row needs its own unique index
+        Index("uq_analytics_fleet_period", "period_year", "period_month", unique=True,
+              postgresql_where=text("vehicle_id IS NULL"), sqlite_where=text("vehicle_id IS NULL")),
     )
 
 
@@ -277,7 +367,80 @@ class AutomationLog(Base):
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=_uuid)
     job_name: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
     status: Mapped[str] = mapped_column(String(20), nullable=False)  # success, error, skipped
+    records_scanned: Mapped[int] = mapped_column(Integer, default=0)
     records_processed: Mapped[int] = mapped_column(Integer, default=0)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
     duration_ms: Mapped[int] = mapped_column(Integer, default=0)
-    ran_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    ran_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_automation_logs_ran_id", "ran_at", "id"),   # list order / keyset cursor
+        Index("ix_automation_logs_job_ran_id", "job_name", "ran_at", "id"),
+    )
+
+
+# ── Read Model: Fleet Counters ────────────────────────────────────────────
+
+class FleetCounter(Base):
+    """Incrementally maintained KPI counter, e.g. "vehicles.active" or "fuel.total_cost"."""
+    __tablename__ = "fleet_counters"
+
+    key: Mapped[str] = mapped_column(String(100), primary_key=True)
+    value: Mapped[float] = mapped_column(Numeric(16, 2), default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+# ── Analytics: Daily Rollups ──────────────────────────────────────────────
+
+class DailyVehicleRollup(Base):
+    __tablename__ = "daily_vehicle_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    vehicle_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    distance_km: Mapped[float] = mapped_column(Float, default=0)
+    fuel_liters: Mapped[float] = mapped_column(Float, default=0)
+    fuel_cost: Mapped[float] = mapped_column(Numeric(14, 2), default=0)
+    maintenance_cost: Mapped[float] = mapped_column(Numeric(14, 2), default=0)
+    trip_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_daily_vehicle_rollups_vehicle_day", "vehicle_id", "day"),
+    )
+
+
+class DailyDriverRollup(Base):
+    __tablename__ = "daily_driver_rollups"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    driver_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    distance_km: Mapped[float] = mapped_column(Float, default=0)
+    fuel_liters: Mapped[float] = mapped_column(Float, default=0)   # as reported on completed trips
+    trip_cost: Mapped[float] = mapped_column(Numeric(14, 2), default=0)
+    trip_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_daily_driver_rollups_driver_day", "driver_id", "day"),
+    )
+
+
+class RollupDirtyDay(Base):
+    """A day whose rollups are stale: marked with the write, cleared by the rollup job."""
+    __tablename__ = "rollup_dirty_days"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    marked_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# ── Automation: Streaming Fuel Anomaly State ──────────────────────────────
+
+class VehicleFuelBucket(Base):
+    """Per-vehicle daily litres/km, updated incrementally by event handlers."""
+    __tablename__ = "vehicle_fuel_buckets"
+
+    vehicle_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    fuel_liters: Mapped[float] = mapped_column(Float, default=0)
+    distance_km: Mapped[float] = mapped_column(Float, default=0)   # completed trips, by actual departure day
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
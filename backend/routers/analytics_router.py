@@ -1,13 +1,16 @@
 """FleetFlow – Analytics / Dashboard KPI router."""
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, func
+from datetime import date, timedelta
+from math import ceil
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, func, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database import get_db
-from models.models import Vehicle, Driver, Trip, FuelLog, MaintenanceLog, User, VehicleStatus, DriverStatus, TripStatus
-from schemas.schemas import DashboardKPIs
+from models.models import User, DailyVehicleRollup, DailyDriverRollup
+from schemas.schemas import DashboardKPIs, TimeseriesPoint, TimeseriesResponse
 from auth.auth import get_current_user
+from automation.kpi_engine import kpi_cache
 
 router = APIRouter(prefix="/api/analytics", tags=["analytics"])
 
@@ -17,63 +20,71 @@ async def get_dashboard_kpis(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    # Vehicles
-    total_vehicles = (await db.execute(select(func.count(Vehicle.id)))).scalar() or 0
-    active_vehicles = (await db.execute(
-        select(func.count(Vehicle.id)).where(Vehicle.status == VehicleStatus.ACTIVE)
-    )).scalar() or 0
+    return await kpi_cache.get(db)
 
-    # Drivers
-    total_drivers = (await db.execute(select(func.count(Driver.id)))).scalar() or 0
-    available_drivers = (await db.execute(
-        select(func.count(Driver.id)).where(Driver.status == DriverStatus.AVAILABLE)
-    )).scalar() or 0
 
-    # Trips
-    total_trips = (await db.execute(select(func.count(Trip.id)))).scalar() or 0
-    completed_trips = (await db.execute(
-        select(func.count(Trip.id)).where(Trip.status == TripStatus.COMPLETED)
-    )).scalar() or 0
-    in_progress_trips = (await db.execute(
-        select(func.count(Trip.id)).where(Trip.status == TripStatus.IN_PROGRESS)
-    )).scalar() or 0
+@router.get("/timeseries", response_model=TimeseriesResponse)
+async def get_timeseries(
+    start: date | None = None,
+    end: date | None = None,
+    vehicle_id: str | None = None,
+    driver_id: str | None = None,
+    max_points: int = Query(120, ge=2, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Daily distance / fuel / maintenance / trip series served from the rollup tables.
 
-    # Costs
-    total_fuel_cost = (await db.execute(select(func.coalesce(func.sum(FuelLog.total_cost), 0)))).scalar() or 0
-    total_maintenance_cost = (await db.execute(
-        select(func.coalesce(func.sum(MaintenanceLog.cost), 0))
-    )).scalar() or 0
+    ``end`` is exclusive (defaults to tomorrow), ``start`` defaults to 30 days
+    earlier. Ranges longer than ``max_points`` days are downsampled into
+    equal multi-day buckets.
+    """
+    if vehicle_id and driver_id:
+        raise HTTPException(status_code=400, detail="Filter by vehicle_id or driver_id, not both")
+    end = end or date.today() + timedelta(days=1)
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
 
-    # Avg safety score
-    avg_safety = (await db.execute(
-        select(func.coalesce(func.avg(Driver.safety_score), 100))
-    )).scalar() or 100
+    bucket_days = max(1, ceil((end - start).days / max_points))
 
-    # Fleet utilization
-    fleet_util = (active_vehicles / total_vehicles * 100) if total_vehicles > 0 else 0
+    if driver_id:
+        r = DailyDriverRollup
+        query = select(
+            r.day, func.sum(r.distance_km), func.sum(r.fuel_liters),
+            literal(0), literal(0), func.sum(r.trip_count),
+        ).where(r.driver_id == driver_id)
+    else:
+        r = DailyVehicleRollup
+        query = select(
+            r.day, func.sum(r.distance_km), func.sum(r.fuel_liters),
+            func.sum(r.fuel_cost), func.sum(r.maintenance_cost), func.sum(r.trip_count),
+        )
+        if vehicle_id:
+            query = query.where(r.vehicle_id == vehicle_id)
+    query = query.where(r.day >= start, r.day < end).group_by(r.day)
 
-    # On-time delivery
-    on_time = 0.0
-    if completed_trips > 0:
-        on_time_count = (await db.execute(
-            select(func.count(Trip.id)).where(
-                Trip.status == TripStatus.COMPLETED,
-                Trip.actual_arrival <= Trip.scheduled_arrival,
+    buckets: dict[int, TimeseriesPoint] = {}
+    for day, distance, litres, fuel_cost, maint_cost, trips in (await db.execute(query)).all():
+        index = (day - start).days // bucket_days
+        point = buckets.get(index)
+        if point is None:
+            bucket_start = start + timedelta(days=index * bucket_days)
+            point = buckets[index] = TimeseriesPoint(
+                period_start=bucket_start,
+                period_end=min(bucket_start + timedelta(days=bucket_days), end),
             )
-        )).scalar() or 0
-        on_time = (on_time_count / completed_trips) * 100
+        point.distance_km += float(distance or 0)
+        point.fuel_liters += float(litres or 0)
+        point.fuel_cost += float(fuel_cost or 0)
+        point.maintenance_cost += float(maint_cost or 0)
+        point.trip_count += int(trips or 0)
 
-    return DashboardKPIs(
-        total_vehicles=total_vehicles,
-        active_vehicles=active_vehicles,
-        total_drivers=total_drivers,
-        available_drivers=available_drivers,
-        total_trips=total_trips,
-        completed_trips=completed_trips,
-        in_progress_trips=in_progress_trips,
-        total_fuel_cost=float(total_fuel_cost),
-        total_maintenance_cost=float(total_maintenance_cost),
-        avg_safety_score=round(float(avg_safety), 1),
-        fleet_utilization_pct=round(fleet_util, 1),
-        on_time_delivery_pct=round(on_time, 1),
+    return TimeseriesResponse(
+        start=start,
+        end=end,
+        bucket_days=bucket_days,
+        vehicle_id=vehicle_id,
+        driver_id=driver_id,
+        points=[buckets[i] for i in sorted(buckets)],
     )
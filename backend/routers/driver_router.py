@@ -3,12 +3,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from math import ceil
 
 from database import get_db
 from models.models import Driver, User, UserRole
 from schemas.schemas import DriverCreate, DriverUpdate, DriverOut
 from auth.auth import get_current_user, require_roles
+from services.pagination import CountMode, paginate
+from automation.kpi_engine import invalidate_dashboard_kpis
+from automation.fleet_counters import CounterDeltas, apply_counter_deltas, DRIVERS_SAFETY_SUM
 
 router = APIRouter(prefix="/api/drivers", tags=["drivers"])
 
@@ -17,6 +19,8 @@ router = APIRouter(prefix="/api/drivers", tags=["drivers"])
 async def list_drivers(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from a previous page; replaces page"),
+    count: CountMode | None = Query(None, description="exact (default without a cursor), estimated or none"),
     status: str | None = None,
     search: str | None = None,
     db: AsyncSession = Depends(get_db),
@@ -38,17 +42,10 @@ async def list_drivers(
             | Driver.employee_id.ilike(f"%{search}%")
         )
 
-    total = (await db.execute(count_query)).scalar() or 0
-    query = query.order_by(Driver.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    results = (await db.execute(query)).scalars().all()
-
-    return {
-        "items": [DriverOut.model_validate(d) for d in results],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": ceil(total / page_size) if total else 0,
-    }
+    result = await paginate(db, query, count_query, [Driver.created_at, Driver.id],
+                            page=page, page_size=page_size, cursor=cursor, count=count)
+    result["items"] = [DriverOut.model_validate(d) for d in result["items"]]
+    return result
 
 
 @router.get("/{driver_id}", response_model=DriverOut)
@@ -72,7 +69,13 @@ async def create_driver(
 ):
     driver = Driver(**body.model_dump())
     db.add(driver)
+
+    deltas = CounterDeltas()
+    deltas.status_change("drivers", None, driver.status)
+    deltas[DRIVERS_SAFETY_SUM] += driver.safety_score if driver.safety_score is not None else 100.0
+    await apply_counter_deltas(db, deltas)
     await db.commit()
+    invalidate_dashboard_kpis()
     await db.refresh(driver)
     return driver
 
@@ -89,10 +92,17 @@ async def update_driver(
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
 
+    old_status, old_score = driver.status, driver.safety_score
     update_data = body.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(driver, key, value)
+
+    deltas = CounterDeltas()
+    deltas.status_change("drivers", old_status, driver.status)
+    deltas[DRIVERS_SAFETY_SUM] += (driver.safety_score or 0) - (old_score or 0)
+    await apply_counter_deltas(db, deltas)
     await db.commit()
+    invalidate_dashboard_kpis()
     await db.refresh(driver)
     return driver
 
@@ -108,4 +118,10 @@ async def delete_driver(
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
     await db.delete(driver)
+
+    deltas = CounterDeltas()
+    deltas.status_change("drivers", driver.status, None)
+    deltas[DRIVERS_SAFETY_SUM] -= driver.safety_score or 0
+    await apply_counter_deltas(db, deltas)
     await db.commit()
+    invalidate_dashboard_kpis()
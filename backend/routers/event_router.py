@@ -0,0 +1,89 @@
+"""FleetFlow – Domain event outbox router."""
+
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select, or_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db
+from models.models import DomainEvent, User
+from auth.auth import get_current_user
+from schemas.schemas import OutboxMetricsOut, HandlerStatsOut, DomainEventOut, DomainEventPage
+from automation.outbox import event_outbox
+from automation.event_dispatcher import handler_stats
+from services.pagination import encode_cursor, decode_cursor, keyset_after
+
+router = APIRouter(prefix="/api/events", tags=["events"])
+
+# Payload keys that identify the entity an event is about
+ENTITY_KEYS = ("vehicle_id", "driver_id", "trip_id", "fuel_log_id", "maintenance_id")
+
+
+def _payload_matches(db: AsyncSession, key: str, value: str):
+    """payload[key] == value; a GIN-indexed ``@>`` containment test on PostgreSQL."""
+    if db.bind.dialect.name == "postgresql":
+        return type_coerce(DomainEvent.payload, JSONB).contains({key: value})
+    return DomainEvent.payload[key].as_string() == value
+
+
+@router.get("", response_model=DomainEventPage)
+async def list_events(
+    event_type: str | None = None,
+    vehicle_id: str | None = None,
+    driver_id: str | None = None,
+    trip_id: str | None = None,
+    entity_id: str | None = Query(None, description="match any of " + ", ".join(ENTITY_KEYS)),
+    since: datetime | None = Query(None, description="created_at lower bound (inclusive)"),
+    until: datetime | None = Query(None, description="created_at upper bound (exclusive)"),
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Audit trail of domain events, newest first, with keyset pagination."""
+    query = select(DomainEvent)
+    if event_type:
+        query = query.where(DomainEvent.event_type == event_type)
+    for key, value in (("vehicle_id", vehicle_id), ("driver_id", driver_id), ("trip_id", trip_id)):
+        if value:
+            query = query.where(_payload_matches(db, key, value))
+    if entity_id:
+        query = query.where(or_(*(_payload_matches(db, key, entity_id) for key in ENTITY_KEYS)))
+    if since:
+        query = query.where(DomainEvent.created_at >= since)
+    if until:
+        query = query.where(DomainEvent.created_at < until)
+    if cursor:
+        query = query.where(keyset_after([DomainEvent.created_at, DomainEvent.id], decode_cursor(cursor, 2)))
+
+    rows = (await db.execute(
+        query.order_by(DomainEvent.created_at.desc(), DomainEvent.id.desc()).limit(limit + 1)
+    )).scalars().all()
+
+    page, more = rows[:limit], len(rows) > limit
+    return DomainEventPage(
+        items=[DomainEventOut.model_validate(e) for e in page],
+        next_cursor=encode_cursor(page[-1].created_at, page[-1].id) if more else None,
+    )
+
+
+@router.get("/metrics", response_model=OutboxMetricsOut)
+async def get_outbox_metrics(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Outbox delivery throughput, lag and backlog."""
+    return OutboxMetricsOut(
+        workers_running=event_outbox.running,
+        **event_outbox.metrics.snapshot(),
+        **await event_outbox.backlog(db),
+    )
+
+
+@router.get("/handlers", response_model=list[HandlerStatsOut])
+async def get_handler_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """Per-handler call, failure, timeout and latency counters for this instance."""
+    return handler_stats()
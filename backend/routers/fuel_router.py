@@ -1,15 +1,22 @@
 """FleetFlow – Fuel & expense logs router."""
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from math import ceil
 
 from database import get_db
 from models.models import FuelLog, Vehicle, User, UserRole
 from schemas.schemas import FuelLogCreate, FuelLogUpdate, FuelLogOut
 from auth.auth import get_current_user, require_roles
-from automation.event_dispatcher import dispatch, Events
+from services.pagination import CountMode, paginate
+from automation.event_dispatcher import enqueue, Events
+from automation.kpi_engine import invalidate_dashboard_kpis
+from automation.fleet_counters import apply_counter_deltas, FUEL_COST
+from automation.cost_ledger import apply_cost_delta
+from automation.fuel_state import add_to_bucket
+from automation.recalc_queue import recalc_queue
+from automation.periods import month_of
+from automation.rollups import mark_rollup_days
 
 router = APIRouter(prefix="/api/fuel", tags=["fuel"])
 
@@ -18,6 +25,8 @@ router = APIRouter(prefix="/api/fuel", tags=["fuel"])
 async def list_fuel_logs(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from a previous page; replaces page"),
+    count: CountMode | None = Query(None, description="exact (default without a cursor), estimated or none"),
     vehicle_id: str | None = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -29,23 +38,15 @@ async def list_fuel_logs(
         query = query.where(FuelLog.vehicle_id == vehicle_id)
         count_query = count_query.where(FuelLog.vehicle_id == vehicle_id)
 
-    total = (await db.execute(count_query)).scalar() or 0
-    query = query.order_by(FuelLog.date.desc()).offset((page - 1) * page_size).limit(page_size)
-    results = (await db.execute(query)).scalars().all()
-
-    return {
-        "items": [FuelLogOut.model_validate(f) for f in results],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": ceil(total / page_size) if total else 0,
-    }
+    result = await paginate(db, query, count_query, [FuelLog.date, FuelLog.id],
+                            page=page, page_size=page_size, cursor=cursor, count=count)
+    result["items"] = [FuelLogOut.model_validate(f) for f in result["items"]]
+    return result
 
 
 @router.post("", response_model=FuelLogOut, status_code=201)
 async def create_fuel_log(
     body: FuelLogCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_roles(UserRole.FLEET_MANAGER, UserRole.DISPATCHER, UserRole.FINANCIAL_ANALYST)),
 ):
@@ -60,16 +61,27 @@ async def create_fuel_log(
     if body.odometer_reading > veh.odometer_km:
         veh.odometer_km = body.odometer_reading
 
-    await db.commit()
-    await db.refresh(log)
+    await apply_counter_deltas(db, {FUEL_COST: float(body.total_cost)})
+    await apply_cost_delta(db, log.vehicle_id, log.date, fuel=float(body.total_cost))
+    await add_to_bucket(db, log.vehicle_id, log.date, litres=float(body.quantity_liters))
+    await mark_rollup_days(db, log.date)
+    await db.flush()   # assigns log.id for the event payload
 
-    # Fire FuelLogged event (triggers cost aggregation + anomaly detection)
-    background_tasks.add_task(
-        dispatch,
+    # FuelLogged event (cost aggregation + anomaly detection), committed with the log
+    enqueue(
+        db,
         Events.FUEL_LOGGED,
-        {"fuel_log_id": log.id, "vehicle_id": log.vehicle_id, "total_cost": float(log.total_cost)},
+        {
+            "fuel_log_id": log.id,
+            "vehicle_id": log.vehicle_id,
+            "total_cost": float(log.total_cost),
+            "quantity_liters": float(log.quantity_liters),
+            "date": log.date.isoformat(),
+        },
         triggered_by=current_user.id,
     )
+    await db.commit()
+    await db.refresh(log)
     return log
 
 
@@ -85,10 +97,22 @@ async def update_fuel_log(
     if not log:
         raise HTTPException(status_code=404, detail="Fuel log not found")
 
+    old_cost = float(log.total_cost or 0)
+    old_litres = float(log.quantity_liters or 0)
+    old_date = log.date
     update_data = body.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(log, key, value)
+
+    cost_delta = float(log.total_cost or 0) - old_cost
+    await apply_counter_deltas(db, {FUEL_COST: cost_delta})
+    await apply_cost_delta(db, log.vehicle_id, log.date, fuel=cost_delta)
+    await add_to_bucket(db, log.vehicle_id, old_date, litres=-old_litres)
+    await add_to_bucket(db, log.vehicle_id, log.date, litres=float(log.quantity_liters or 0))
+    await mark_rollup_days(db, old_date, log.date)
     await db.commit()
+    invalidate_dashboard_kpis()
+    recalc_queue.mark_dirty(log.vehicle_id, *month_of(log.date))
     await db.refresh(log)
     return log
 
@@ -104,4 +128,10 @@ async def delete_fuel_log(
     if not log:
         raise HTTPException(status_code=404, detail="Fuel log not found")
     await db.delete(log)
+    await apply_counter_deltas(db, {FUEL_COST: -float(log.total_cost or 0)})
+    await apply_cost_delta(db, log.vehicle_id, log.date, fuel=-float(log.total_cost or 0))
+    await add_to_bucket(db, log.vehicle_id, log.date, litres=-float(log.quantity_liters or 0))
+    await mark_rollup_days(db, log.date)
     await db.commit()
+    invalidate_dashboard_kpis()
+    recalc_queue.mark_dirty(log.vehicle_id, *month_of(log.date))
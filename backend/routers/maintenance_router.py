@@ -1,15 +1,21 @@
 """FleetFlow – Maintenance logs router."""
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from math import ceil
 
 from database import get_db
 from models.models import MaintenanceLog, Vehicle, User, UserRole, MaintenanceStatus, VehicleStatus
 from schemas.schemas import MaintenanceCreate, MaintenanceUpdate, MaintenanceOut
 from auth.auth import get_current_user, require_roles
-from automation.event_dispatcher import dispatch, Events
+from services.pagination import CountMode, paginate
+from automation.event_dispatcher import enqueue, Events
+from automation.kpi_engine import invalidate_dashboard_kpis
+from automation.fleet_counters import CounterDeltas, apply_counter_deltas, MAINTENANCE_COST
+from automation.cost_ledger import apply_cost_delta
+from automation.recalc_queue import recalc_queue
+from automation.periods import month_of
+from automation.rollups import mark_rollup_days
 
 router = APIRouter(prefix="/api/maintenance", tags=["maintenance"])
 
@@ -18,6 +24,8 @@ router = APIRouter(prefix="/api/maintenance", tags=["maintenance"])
 async def list_maintenance(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from a previous page; replaces page"),
+    count: CountMode | None = Query(None, description="exact (default without a cursor), estimated or none"),
     vehicle_id: str | None = None,
     status: str | None = None,
     db: AsyncSession = Depends(get_db),
@@ -33,23 +41,15 @@ async def list_maintenance(
         query = query.where(MaintenanceLog.status == status)
         count_query = count_query.where(MaintenanceLog.status == status)
 
-    total = (await db.execute(count_query)).scalar() or 0
-    query = query.order_by(MaintenanceLog.scheduled_date.desc()).offset((page - 1) * page_size).limit(page_size)
-    results = (await db.execute(query)).scalars().all()
-
-    return {
-        "items": [MaintenanceOut.model_validate(m) for m in results],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": ceil(total / page_size) if total else 0,
-    }
+    result = await paginate(db, query, count_query, [MaintenanceLog.scheduled_date, MaintenanceLog.id],
+                            page=page, page_size=page_size, cursor=cursor, count=count)
+    result["items"] = [MaintenanceOut.model_validate(m) for m in result["items"]]
+    return result
 
 
 @router.post("", response_model=MaintenanceOut, status_code=201)
 async def create_maintenance(
     body: MaintenanceCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_roles(UserRole.FLEET_MANAGER, UserRole.SAFETY_OFFICER)),
 ):
@@ -62,17 +62,29 @@ async def create_maintenance(
     db.add(log)
 
     # Set vehicle to maintenance status
+    deltas = CounterDeltas()
+    deltas.status_change("vehicles", veh.status, VehicleStatus.MAINTENANCE)
+    deltas[MAINTENANCE_COST] += float(body.cost)
     veh.status = VehicleStatus.MAINTENANCE
-    await db.commit()
-    await db.refresh(log)
-
-    # Fire MaintenanceCreated event (triggers cost aggregation)
-    background_tasks.add_task(
-        dispatch,
+    await apply_counter_deltas(db, deltas)
+    await apply_cost_delta(db, log.vehicle_id, log.scheduled_date, maintenance=float(body.cost))
+    await mark_rollup_days(db, log.scheduled_date)
+    await db.flush()   # assigns log.id for the event payload
+
+    # MaintenanceCreated event (cost aggregation), committed with the log
+    enqueue(
+        db,
         Events.MAINTENANCE_CREATED,
-        {"maintenance_id": log.id, "vehicle_id": log.vehicle_id, "cost": float(log.cost)},
+        {
+            "maintenance_id": log.id,
+            "vehicle_id": log.vehicle_id,
+            "cost": float(log.cost),
+            "date": log.scheduled_date.isoformat(),
+        },
         triggered_by=current_user.id,
     )
+    await db.commit()
+    await db.refresh(log)
     return log
 
 
@@ -89,16 +101,28 @@ async def update_maintenance(
         raise HTTPException(status_code=404, detail="Maintenance log not found")
 
     update_data = body.model_dump(exclude_unset=True)
+    deltas = CounterDeltas()
+    old_cost = float(log.cost or 0)
+    old_date = log.scheduled_date
 
     # If completing maintenance, set vehicle back to active
     if body.status == MaintenanceStatus.COMPLETED:
         veh = (await db.execute(select(Vehicle).where(Vehicle.id == log.vehicle_id))).scalar_one_or_none()
         if veh and veh.status == VehicleStatus.MAINTENANCE:
+            deltas.status_change("vehicles", veh.status, VehicleStatus.ACTIVE)
             veh.status = VehicleStatus.ACTIVE
 
     for key, value in update_data.items():
         setattr(log, key, value)
+
+    cost_delta = float(log.cost or 0) - old_cost
+    deltas[MAINTENANCE_COST] += cost_delta
+    await apply_counter_deltas(db, deltas)
+    await apply_cost_delta(db, log.vehicle_id, log.scheduled_date, maintenance=cost_delta)
+    await mark_rollup_days(db, old_date, log.scheduled_date)
     await db.commit()
+    invalidate_dashboard_kpis()
+    recalc_queue.mark_dirty(log.vehicle_id, *month_of(log.scheduled_date))
     await db.refresh(log)
     return log
 
@@ -115,4 +139,9 @@ async def delete_maintenance(
         raise HTTPException(status_code=404, detail="Maintenance log not found")
 
     await db.delete(log)
+    await apply_counter_deltas(db, {MAINTENANCE_COST: -float(log.cost or 0)})
+    await apply_cost_delta(db, log.vehicle_id, log.scheduled_date, maintenance=-float(log.cost or 0))
+    await mark_rollup_days(db, log.scheduled_date)
     await db.commit()
+    invalidate_dashboard_kpis()
+    recalc_queue.mark_dirty(log.vehicle_id, *month_of(log.scheduled_date))
@@ -1,14 +1,18 @@
 """FleetFlow – Notification REST API router."""
 
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy import select, func, update
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from math import ceil
 
 from database import get_db
 from models.models import Notification, User, NotificationType
 from auth.auth import get_current_user
 from schemas.schemas import NotificationOut
+from services.pagination import CountMode, paginate
+from automation.read_state import (
+    read_through, is_read_clause, unread_clause, mark_read, move_watermark,
+    unread_counters, publish_read_change,
+)
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
@@ -17,33 +21,31 @@ router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 async def list_notifications(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from a previous page; replaces page"),
+    count: CountMode | None = Query(None, description="exact (default without a cursor), estimated or none"),
     type: str | None = None,
     unread_only: bool = False,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """List notifications with optional filters."""
-    query = select(Notification)
+    """List notifications with optional filters; ``is_read`` is the caller's own read state."""
+    watermark = await read_through(db, current_user.id)
+    query = select(Notification, is_read_clause(current_user.id, watermark).label("read"))
     count_query = select(func.count(Notification.id))
 
     if type:
         query = query.where(Notification.type == type)
         count_query = count_query.where(Notification.type == type)
     if unread_only:
-        query = query.where(Notification.is_read == False)
-        count_query = count_query.where(Notification.is_read == False)
+        query = query.where(unread_clause(current_user.id, watermark))
+        count_query = count_query.where(unread_clause(current_user.id, watermark))
 
-    total = (await db.execute(count_query)).scalar() or 0
-    query = query.order_by(Notification.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    results = (await db.execute(query)).scalars().all()
-
-    return {
-        "items": [NotificationOut.model_validate(n) for n in results],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": ceil(total / page_size) if total else 0,
-    }
+    result = await paginate(db, query, count_query, [Notification.created_at, Notification.id],
+                            page=page, page_size=page_size, cursor=cursor, count=count)
+    result["items"] = [
+        NotificationOut.model_validate(n).model_copy(update={"is_read": bool(read)}) for n, read in result["items"]
+    ]
+    return result
 
 
 @router.get("/unread-count")
@@ -51,11 +53,8 @@ async def get_unread_count(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Return count of unread notifications (used by the bell badge)."""
-    count = (await db.execute(
-        select(func.count(Notification.id)).where(Notification.is_read == False)
-    )).scalar() or 0
-    return {"unread_count": count}
+    """Return the caller's unread count (used by the bell badge); served from memory when cached."""
+    return {"unread_count": await unread_counters.get(current_user.id, db)}
 
 
 @router.patch("/{notification_id}/read", response_model=NotificationOut)
@@ -64,15 +63,14 @@ async def mark_as_read(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Mark a single notification as read."""
+    """Mark a single notification as read for the caller."""
     result = await db.execute(select(Notification).where(Notification.id == notification_id))
     notif = result.scalar_one_or_none()
     if not notif:
         raise HTTPException(status_code=404, detail="Notification not found")
-    notif.is_read = True
-    await db.commit()
-    await db.refresh(notif)
-    return notif
+    if await mark_read(db, current_user.id, notif):
+        await publish_read_change(current_user.id, delta=-1)
+    return NotificationOut.model_validate(notif).model_copy(update={"is_read": True})
 
 
 @router.patch("/read-all")
@@ -80,11 +78,9 @@ async def mark_all_read(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Mark all unread notifications as read."""
-    await db.execute(
-        update(Notification).where(Notification.is_read == False).values(is_read=True)
-    )
-    await db.commit()
+    """Mark everything up to now as read for the caller (one watermark update)."""
+    await move_watermark(db, current_user.id)
+    await publish_read_change(current_user.id, reset=True)
     return {"message": "All notifications marked as read"}
 
 
@@ -92,6 +88,8 @@ async def mark_all_read(
 async def list_automation_logs(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from a previous page; replaces page"),
+    count: CountMode | None = Query(None, description="exact (default without a cursor), estimated or none"),
     job_name: str | None = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
@@ -107,17 +105,10 @@ async def list_automation_logs(
         query = query.where(AutomationLog.job_name == job_name)
         count_query = count_query.where(AutomationLog.job_name == job_name)
 
-    total = (await db.execute(count_query)).scalar() or 0
-    query = query.order_by(AutomationLog.ran_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    results = (await db.execute(query)).scalars().all()
-
-    return {
-        "items": [AutomationLogOut.model_validate(r) for r in results],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": ceil(total / page_size) if total else 0,
-    }
+    result = await paginate(db, query, count_query, [AutomationLog.ran_at, AutomationLog.id],
+                            page=page, page_size=page_size, cursor=cursor, count=count)
+    result["items"] = [AutomationLogOut.model_validate(r) for r in result["items"]]
+    return result
 
 
 @router.get("/analytics-summary", response_model=dict)
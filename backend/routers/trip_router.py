@@ -2,16 +2,20 @@
 
 import uuid
 from datetime import datetime, timezone
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from math import ceil
 
 from database import get_db
 from models.models import Trip, Driver, Vehicle, User, UserRole, TripStatus, DriverStatus
 from schemas.schemas import TripCreate, TripUpdate, TripOut
 from auth.auth import get_current_user, require_roles
-from automation.event_dispatcher import dispatch, Events
+from services.pagination import CountMode, paginate
+from automation.event_dispatcher import enqueue, Events
+from automation.kpi_engine import invalidate_dashboard_kpis
+from automation.fuel_state import add_to_bucket
+from automation.fleet_counters import CounterDeltas, apply_counter_deltas, is_on_time, TRIPS_ON_TIME
+from automation.rollups import mark_rollup_days
 
 router = APIRouter(prefix="/api/trips", tags=["trips"])
 
@@ -28,6 +32,8 @@ VALID_TRANSITIONS = {
 async def list_trips(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from a previous page; replaces page"),
+    count: CountMode | None = Query(None, description="exact (default without a cursor), estimated or none"),
     status: str | None = None,
     search: str | None = None,
     db: AsyncSession = Depends(get_db),
@@ -51,17 +57,10 @@ async def list_trips(
             | Trip.destination.ilike(f"%{search}%")
         )
 
-    total = (await db.execute(count_query)).scalar() or 0
-    query = query.order_by(Trip.scheduled_departure.desc()).offset((page - 1) * page_size).limit(page_size)
-    results = (await db.execute(query)).scalars().all()
-
-    return {
-        "items": [TripOut.model_validate(t) for t in results],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": ceil(total / page_size) if total else 0,
-    }
+    result = await paginate(db, query, count_query, [Trip.scheduled_departure, Trip.id],
+                            page=page, page_size=page_size, cursor=cursor, count=count)
+    result["items"] = [TripOut.model_validate(t) for t in result["items"]]
+    return result
 
 
 @router.get("/{trip_id}", response_model=TripOut)
@@ -80,7 +79,6 @@ async def get_trip(
 @router.post("", response_model=TripOut, status_code=201)
 async def create_trip(
     body: TripCreate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_roles(UserRole.FLEET_MANAGER, UserRole.DISPATCHER)),
 ):
@@ -123,16 +121,21 @@ async def create_trip(
         dispatched_by=current_user.id,
     )
     db.add(trip)
-    await db.commit()
-    await db.refresh(trip)
 
-    # Fire domain event (non-blocking)
-    background_tasks.add_task(
-        dispatch,
+    deltas = CounterDeltas()
+    deltas.status_change("trips", None, trip.status or TripStatus.SCHEDULED)
+    await apply_counter_deltas(db, deltas)
+    await db.flush()   # assigns trip.id for the event payload
+
+    # Domain event, committed with the trip
+    enqueue(
+        db,
         Events.TRIP_DISPATCHED,
         {"trip_id": trip.id, "vehicle_id": trip.vehicle_id, "driver_id": trip.driver_id},
         triggered_by=current_user.id,
     )
+    await db.commit()
+    await db.refresh(trip)
     return trip
 
 
@@ -140,7 +143,6 @@ async def create_trip(
 async def update_trip(
     trip_id: str,
     body: TripUpdate,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_roles(UserRole.FLEET_MANAGER, UserRole.DISPATCHER)),
 ):
@@ -149,6 +151,10 @@ async def update_trip(
     if not trip:
         raise HTTPException(status_code=404, detail="Trip not found")
 
+    deltas = CounterDeltas()
+    old_status = trip.status
+    old_departure = trip.scheduled_departure
+
     # Validate status transition
     if body.status and body.status != trip.status:
         if body.status not in VALID_TRANSITIONS.get(trip.status, []):
@@ -162,6 +168,7 @@ async def update_trip(
             # Mark driver as on_trip
             drv = (await db.execute(select(Driver).where(Driver.id == trip.driver_id))).scalar_one_or_none()
             if drv:
+                deltas.status_change("drivers", drv.status, DriverStatus.ON_TRIP)
                 drv.status = DriverStatus.ON_TRIP
             if not body.actual_departure:
                 body.actual_departure = datetime.now(timezone.utc)
@@ -170,19 +177,21 @@ async def update_trip(
             # Mark driver as available, increment trip count
             drv = (await db.execute(select(Driver).where(Driver.id == trip.driver_id))).scalar_one_or_none()
             if drv:
+                deltas.status_change("drivers", drv.status, DriverStatus.AVAILABLE)
                 drv.status = DriverStatus.AVAILABLE
                 drv.total_trips += 1
             if not body.actual_arrival:
                 body.actual_arrival = datetime.now(timezone.utc)
-            # Fire TripCompleted event
-            background_tasks.add_task(
-                dispatch,
+            # TripCompleted event, committed with the status change
+            enqueue(
+                db,
                 Events.TRIP_COMPLETED,
                 {
                     "trip_id": trip.id,
                     "vehicle_id": trip.vehicle_id,
                     "driver_id": trip.driver_id,
                     "distance_km": body.distance_km or trip.distance_km,
+                    "date": (body.actual_departure or trip.actual_departure or body.actual_arrival).date().isoformat(),
                 },
                 triggered_by=current_user.id,
             )
@@ -190,12 +199,23 @@ async def update_trip(
         elif body.status == TripStatus.CANCELLED:
             drv = (await db.execute(select(Driver).where(Driver.id == trip.driver_id))).scalar_one_or_none()
             if drv and drv.status == DriverStatus.ON_TRIP:
+                deltas.status_change("drivers", drv.status, DriverStatus.AVAILABLE)
                 drv.status = DriverStatus.AVAILABLE
 
     update_data = body.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(trip, key, value)
+
+    deltas.status_change("trips", old_status, trip.status)
+    if trip.status == TripStatus.COMPLETED and old_status != TripStatus.COMPLETED and is_on_time(trip):
+        deltas[TRIPS_ON_TIME] += 1
+    await apply_counter_deltas(db, deltas)
+    if trip.status == TripStatus.COMPLETED and old_status != TripStatus.COMPLETED and trip.actual_departure:
+        # Fuel buckets move with the trip in this transaction, so retried events can't re-add the km
+        await add_to_bucket(db, trip.vehicle_id, trip.actual_departure.date(), km=float(trip.distance_km or 0))
+    await mark_rollup_days(db, old_departure, trip.scheduled_departure)
     await db.commit()
+    invalidate_dashboard_kpis()
     await db.refresh(trip)
     return trip
 
@@ -212,4 +232,14 @@ async def delete_trip(
         raise HTTPException(status_code=404, detail="Trip not found")
 
     await db.delete(trip)
+
+    deltas = CounterDeltas()
+    deltas.status_change("trips", trip.status, None)
+    if trip.status == TripStatus.COMPLETED and is_on_time(trip):
+        deltas[TRIPS_ON_TIME] -= 1
+    await apply_counter_deltas(db, deltas)
+    if trip.status == TripStatus.COMPLETED and trip.actual_departure:
+        await add_to_bucket(db, trip.vehicle_id, trip.actual_departure.date(), km=-float(trip.distance_km or 0))
+    await mark_rollup_days(db, trip.scheduled_departure)
     await db.commit()
+    invalidate_dashboard_kpis()
@@ -3,12 +3,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from math import ceil
 
 from database import get_db
 from models.models import Vehicle, User, UserRole
 from schemas.schemas import VehicleCreate, VehicleUpdate, VehicleOut
 from auth.auth import get_current_user, require_roles
+from services.pagination import CountMode, paginate
+from automation.kpi_engine import invalidate_dashboard_kpis
+from automation.fleet_counters import CounterDeltas, apply_counter_deltas
 
 router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
 
@@ -17,6 +19,8 @@ router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
 async def list_vehicles(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
+    cursor: str | None = Query(None, description="next_cursor from a previous page; replaces page"),
+    count: CountMode | None = Query(None, description="exact (default without a cursor), estimated or none"),
     status: str | None = None,
     search: str | None = None,
     db: AsyncSession = Depends(get_db),
@@ -40,17 +44,10 @@ async def list_vehicles(
             | Vehicle.model.ilike(f"%{search}%")
         )
 
-    total = (await db.execute(count_query)).scalar() or 0
-    query = query.order_by(Vehicle.created_at.desc()).offset((page - 1) * page_size).limit(page_size)
-    results = (await db.execute(query)).scalars().all()
-
-    return {
-        "items": [VehicleOut.model_validate(v) for v in results],
-        "total": total,
-        "page": page,
-        "page_size": page_size,
-        "total_pages": ceil(total / page_size) if total else 0,
-    }
+    result = await paginate(db, query, count_query, [Vehicle.created_at, Vehicle.id],
+                            page=page, page_size=page_size, cursor=cursor, count=count)
+    result["items"] = [VehicleOut.model_validate(v) for v in result["items"]]
+    return result
 
 
 @router.get("/{vehicle_id}", response_model=VehicleOut)
@@ -74,7 +71,12 @@ async def create_vehicle(
 ):
     vehicle = Vehicle(**body.model_dump())
     db.add(vehicle)
+
+    deltas = CounterDeltas()
+    deltas.status_change("vehicles", None, vehicle.status)
+    await apply_counter_deltas(db, deltas)
     await db.commit()
+    invalidate_dashboard_kpis()
     await db.refresh(vehicle)
     return vehicle
 
@@ -91,10 +93,16 @@ async def update_vehicle(
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
 
+    old_status = vehicle.status
     update_data = body.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(vehicle, key, value)
+
+    deltas = CounterDeltas()
+    deltas.status_change("vehicles", old_status, vehicle.status)
+    await apply_counter_deltas(db, deltas)
     await db.commit()
+    invalidate_dashboard_kpis()
     await db.refresh(vehicle)
     return vehicle
 
@@ -110,4 +118,9 @@ async def delete_vehicle(
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle not found")
     await db.delete(vehicle)
+
+    deltas = CounterDeltas()
+    deltas.status_change("vehicles", vehicle.status, None)
+    await apply_counter_deltas(db, deltas)
     await db.commit()
+    invalidate_dashboard_kpis()
@@ -1,11 +1,19 @@
 """FleetFlow – WebSocket router for real-time notifications."""
 
+import json
 import logging
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
+from datetime import datetime
+from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect, Query
 from jose import jwt, JWTError
 
 from config import get_settings
+from models.models import User
+from auth.auth import get_current_user
+from schemas.schemas import WebSocketStatsOut
 from automation.ws_manager import ws_manager
+from automation.pubsub import backplane
+from automation.ws_topics import parse_subscription
+from automation.ws_resume import resume_service
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -17,32 +25,77 @@ router = APIRouter(tags=["websocket"])
 async def notifications_ws(
     websocket: WebSocket,
     token: str = Query(...),
+    since_id: str | None = Query(None, description="last notification id the client saw"),
+    since: datetime | None = Query(None, description="resume from this timestamp when no id is known"),
 ):
     """
     Authenticated WebSocket endpoint.
     Client connects with: ws://localhost:8000/ws/notifications?token=<JWT>
+    and may then send a JSON ``{"action": "subscribe", ...}`` message to
+    choose which notifications it receives (see automation/ws_topics.py).
+
+    A reconnecting client passes ``since_id`` (or ``since``) to receive the
+    notifications it missed as one ``notification_replay`` frame before live
+    delivery resumes; a client that subscribes on connect puts the same
+    fields in its subscribe message instead, so the replay uses its topics.
     """
     user_id = "anonymous"
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id = payload.get("sub", "anonymous")
+        role = payload.get("role")
     except JWTError:
         await websocket.close(code=4001)
         logger.warning(f"[WS] Rejected connection – invalid token")
         return
 
-    await ws_manager.connect(websocket, user_id)
+    conn = await ws_manager.connect(websocket, user_id, role)
     logger.info(f"[WS] Client connected: user_id={user_id}")
+    if since_id or since:
+        await ws_manager.resume(conn, since, since_id)
 
     try:
-        # Keep connection alive; client can send pings
+        # Keep connection alive; client can send pings (replies go through the send queue)
         while True:
             data = await websocket.receive_text()
+            conn.touch()
+            if data == "pong":   # reply to a server heartbeat
+                continue
             if data == "ping":
-                await websocket.send_text("pong")
+                conn.enqueue("pong")
+                continue
+            try:
+                message = json.loads(data)
+                if not isinstance(message, dict) or message.get("action") != "subscribe":
+                    raise ValueError("expected {\"action\": \"subscribe\", ...}")
+                ws_manager.subscribe(conn, parse_subscription(message, role))
+                resume_since = datetime.fromisoformat(message["since"]) if message.get("since") else None
+                resume_id = message.get("since_id")
+                if resume_id is not None and not isinstance(resume_id, str):
+                    raise ValueError("'since_id' must be a string")
+            except (ValueError, TypeError) as exc:   # includes JSONDecodeError
+                conn.enqueue(json.dumps({"event": "error", "detail": str(exc)}))
+                continue
+            conn.enqueue(json.dumps({"event": "subscribed", "subscription": conn.subscription.to_dict()}))
+            if resume_id or resume_since:
+                await ws_manager.resume(conn, resume_since, resume_id)
     except WebSocketDisconnect:
         await ws_manager.disconnect(websocket, user_id)
         logger.info(f"[WS] Client disconnected: user_id={user_id}")
     except Exception as exc:
         logger.error(f"[WS] Error for user={user_id}: {exc}")
         await ws_manager.disconnect(websocket, user_id)
+
+
+@router.get("/api/ws/stats", response_model=WebSocketStatsOut)
+async def websocket_stats(
+    user_id: str | None = Query(None, description="also report this user's open sockets"),
+    current_user: User = Depends(get_current_user),
+):
+    """Connection, heartbeat, send-queue and backplane counters for this worker."""
+    return WebSocketStatsOut(
+        **ws_manager.stats(),
+        user_connections=ws_manager.user_connections(user_id) if user_id else None,
+        backplane=backplane.stats(),
+        resume=resume_service.stats(),
+    )
@@ -272,12 +272,32 @@ class DashboardKPIs(BaseModel):
     on_time_delivery_pct: float = 0
 
 
+class TimeseriesPoint(BaseModel):
+    period_start: date
+    period_end: date          # exclusive
+    distance_km: float = 0
+    fuel_liters: float = 0
+    fuel_cost: float = 0
+    maintenance_cost: float = 0
+    trip_count: int = 0
+
+
+class TimeseriesResponse(BaseModel):
+    start: date
+    end: date                 # exclusive
+    bucket_days: int
+    vehicle_id: Optional[str] = None
+    driver_id: Optional[str] = None
+    points: list[TimeseriesPoint]
+
+
 class PaginatedResponse(BaseModel):
     items: list
-    total: int
-    page: int
+    total: Optional[int] = None         # None with count=none
+    page: Optional[int] = None          # None on cursor pages
     page_size: int
-    total_pages: int
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None
 
 
 # ── Automation: Notifications ────────────────────────────────────────────
@@ -295,6 +315,8 @@ class NotificationOut(BaseModel):
     entity_id: Optional[str]
     is_read: bool
     created_at: datetime
+    occurrence_count: int = 1
+    last_occurred_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
 
@@ -325,6 +347,7 @@ class AutomationLogOut(BaseModel):
     id: str
     job_name: str
     status: str
+    records_scanned: int = 0
     records_processed: int
     error_message: Optional[str]
     duration_ms: int
@@ -332,3 +355,77 @@ class AutomationLogOut(BaseModel):
 
     model_config = {"from_attributes": True}
 
+
+
+# ── Automation: Domain Event Outbox ─────────────────────────────────────
+
+class OutboxMetricsOut(BaseModel):
+    workers_running: bool
+    # Delivery by this app instance (sliding window for rates and lag)
+    delivered_total: int
+    retried_total: int
+    failed_total: int
+    handler_errors_total: int
+    throughput_per_second: float
+    lag_avg_seconds: float
+    lag_p95_seconds: float
+    lag_max_seconds: float
+    # Outbox table, across all instances
+    pending: int
+    processing: int
+    failed: int
+    oldest_pending_age_seconds: float
+
+
+class HandlerStatsOut(BaseModel):
+    event_type: str
+    handler: str
+    calls: int
+    failures: int
+    timeouts: int
+    avg_ms: float
+    max_ms: float
+    last_error: Optional[str] = None
+
+
+class DomainEventOut(BaseModel):
+    id: str
+    event_type: str
+    payload: dict
+    triggered_by: Optional[str]
+    status: str
+    attempts: int
+    last_error: Optional[str]
+    created_at: datetime
+    processed_at: Optional[datetime]
+
+    model_config = {"from_attributes": True}
+
+
+class DomainEventPage(BaseModel):
+    items: list[DomainEventOut]
+    next_cursor: Optional[str] = None   # pass back as ?cursor= for the next (older) page
+
+
+# ── Automation: WebSocket Delivery ──────────────────────────────────────
+
+class WebSocketStatsOut(BaseModel):
+    connections: int
+    users: int
+    user_connections: int | None = None
+    connects_total: int
+    disconnects_total: int
+    pings_sent: int
+    reaped_total: int
+    heartbeat_interval_seconds: float
+    idle_timeout_seconds: float
+    queue_capacity: int
+    queued_total: int
+    queue_depth_max: int
+    dropped_total: int
+    resyncs_total: int
+    slow_disconnects_total: int
+    slow_consumer_policy: str
+    coalesce_pending: int
+    backplane: dict
+    resume: dict
@@ -0,0 +1,156 @@
+"""FleetFlow – Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on a page, serialised as URL-safe
+base64 JSON. The next page is ``WHERE (sort_col, id) < (:last_sort, :last_id)``
+in the same order, which the matching composite index serves without the
+cost of OFFSET growing with page depth.
+
+List endpoints take an optional ``cursor`` (keyset mode; ``page`` is then
+ignored) and always return ``next_cursor``, so a client can switch to
+cursors after an ordinary first page. The total is optional too: ``exact``
+runs COUNT(*), ``estimated`` asks PostgreSQL's statistics instead
+(``pg_class.reltuples`` for an unfiltered list, the planner's row estimate
+for a filtered one) and ``none`` skips it.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from math import ceil
+from typing import Any, Literal
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, select, text, literal
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+CountMode = Literal["exact", "estimated", "none"]
+
+
+def encode_cursor(*values: Any) -> str:
+    """Serialise the sort key of the last row on a page."""
+    def _plain(value):
+        if isinstance(value, datetime):
+            return {"$dt": value.isoformat()}
+        if isinstance(value, date):
+            return {"$d": value.isoformat()}
+        if hasattr(value, "value"):   # enums
+            return value.value
+        return value
+
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    """Parse a cursor produced by ``encode_cursor``; raises 400 if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong cursor size")
+        return [_typed(v) for v in values]
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _typed(value):
+    if isinstance(value, dict):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if "$d" in value:
+            return date.fromisoformat(value["$d"])
+        raise ValueError("unknown cursor value")
+    return value
+
+
+def keyset_after(columns: list, values: list, descending: bool = True):
+    """Row-value comparison placing rows strictly after ``values`` in the page order.
+
+    Expanded to OR/AND form so it works on every backend and matches
+    composite index scans on PostgreSQL.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal_prefix = [columns[j] == values[j] for j in range(i)]
+        beyond = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal_prefix, beyond))
+    return or_(*clauses)
+
+
+async def paginate(
+    db: AsyncSession,
+    query,
+    count_query,
+    order: list,
+    *,
+    page: int,
+    page_size: int,
+    cursor: str | None = None,
+    count: CountMode | None = None,
+) -> dict:
+    """Fetch one page of ``query``, newest first by ``order`` (sort column(s), then id).
+
+    Returns the usual page dict plus ``next_cursor``; ``items`` are ORM
+    objects, or rows when the query selects more than one entity/column.
+    ``count`` defaults to exact for offset pages and none for cursor pages.
+    """
+    if cursor:
+        query = query.where(keyset_after(order, decode_cursor(cursor, len(order))))
+    else:
+        query = query.offset((page - 1) * page_size)
+    result = await db.execute(query.order_by(*(c.desc() for c in order)).limit(page_size + 1))
+    rows = result.scalars().all() if len(query.column_descriptions) == 1 else result.all()
+    rows, more = rows[:page_size], len(rows) > page_size
+
+    next_cursor = None
+    if more:
+        last = rows[-1][0] if isinstance(rows[-1], Row) else rows[-1]
+        next_cursor = encode_cursor(*(getattr(last, c.key) for c in order))
+
+    total = await count_rows(db, count_query, count or ("none" if cursor else "exact"))
+    return {
+        "items": rows,
+        "total": total,
+        "page": None if cursor else page,
+        "page_size": page_size,
+        "total_pages": None if total is None else ceil(total / page_size),
+        "next_cursor": next_cursor,
+    }
+
+
+async def count_rows(db: AsyncSession, count_query, mode: CountMode) -> int | None:
+    """Total for a list, per ``mode``; estimates fall back to COUNT(*) off PostgreSQL."""
+    if mode == "none":
+        return None
+    if mode == "estimated" and db.bind.dialect.name == "postgresql":
+        estimate = await _estimated_count(db, count_query)
+        if estimate is not None:
+            return estimate
+    return (await db.execute(count_query)).scalar() or 0
+
+
+async def _estimated_count(db: AsyncSession, count_query) -> int | None:
+    table = count_query.get_final_froms()[0]
+    if count_query.whereclause is None:
+        reltuples = (await db.execute(
+            text("SELECT reltuples FROM pg_class WHERE oid = CAST(:table AS regclass)"), {"table": table.name}
+        )).scalar()
+        # -1 until the table has been vacuumed or analyzed
+        return int(reltuples) if reltuples is not None and reltuples >= 0 else None
+
+    # Filtered: the planner's row estimate for the same WHERE clause. EXPLAIN
+    # takes no bind parameters, so filter values are rendered inline and the
+    # SQL goes to the driver as-is (a ':' in a search term is not a bind).
+    scan = select(literal(1)).select_from(table).where(count_query.whereclause)
+    sql = str(scan.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+    try:
+        async with db.begin_nested():
+            conn = await db.connection()
+            plan = (await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    except SQLAlchemyError:
+        return None
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -125,7 +125,10 @@ export default function NotificationBell() {
                                             </p>
                                         </div>
                                         <p className="text-[12px] text-gray-500 dark:text-gray-400 mt-0.5 line-clamp-2">{n.message}</p>
-                                        <p className="text-[11px] text-gray-400 mt-1">{timeAgo(n.created_at)}</p>
+                                        <p className="text-[11px] text-gray-400 mt-1">
+                                            {timeAgo(n.last_occurred_at || n.created_at)}
+                                            {(n.occurrence_count ?? 1) > 1 && ` · ×${n.occurrence_count}`}
+                                        </p>
                                     </div>
                                     {!n.is_read && (
                                         <span className="w-2 h-2 bg-primary-500 rounded-full mt-2 flex-shrink-0" />
@@ -1,6 +1,8 @@
 /**
  * FleetFlow – useNotifications hook
  * Combines REST API polling for initial data + WebSocket for real-time updates.
+ * After a reconnect the socket replays only what was missed since the last
+ * notification seen, so clients don't all refetch at once.
  */
 
 import { useState, useEffect, useCallback, useRef } from 'react';
@@ -15,17 +17,55 @@ export interface Notification {
     entity_id?: string;
     is_read: boolean;
     created_at: string;
+    occurrence_count?: number;   // >1 when a repeated alert was folded into this one
+    last_occurred_at?: string;
 }
 
+// Live-update filter sent over the socket; omitted fields mean "any".
+// Without one, the server uses the defaults for the user's role.
+export interface NotificationSubscription {
+    types?: Notification['type'][];
+    severities?: Notification['severity'][];
+    roles?: ('fleet_manager' | 'dispatcher' | 'safety_officer' | 'financial_analyst')[];
+    entities?: { entity_type: string; entity_id?: string }[];
+}
+
+const toNotification = (msg: any): Notification => ({
+    id: msg.id,
+    type: msg.type,
+    severity: msg.severity,
+    title: msg.title,
+    message: msg.message,
+    entity_type: msg.entity_type,
+    entity_id: msg.entity_id,
+    is_read: msg.is_read ?? false,
+    created_at: msg.created_at,
+});
+
 const API_BASE = 'http://localhost:8000/api';
 const WS_BASE = 'ws://localhost:8000';
 
-export function useNotifications(token: string | null) {
+export function useNotifications(token: string | null, subscription?: NotificationSubscription) {
     const [notifications, setNotifications] = useState<Notification[]>([]);
     const [unreadCount, setUnreadCount] = useState(0);
     const [connected, setConnected] = useState(false);
     const wsRef = useRef<WebSocket | null>(null);
     const pingRef = useRef<ReturnType<typeof setInterval> | null>(null);
+    const subscriptionKey = subscription ? JSON.stringify(subscription) : null;
+    const seenIdsRef = useRef<Set<string>>(new Set());
+    const lastSeenRef = useRef<Notification | null>(null);
+
+    // Prepend notifications (newest first) that aren't already listed
+    const addNotifications = useCallback((incoming: Notification[]) => {
+        const fresh = incoming.filter(n => !seenIdsRef.current.has(n.id));
+        if (fresh.length === 0) return;
+        fresh.forEach(n => seenIdsRef.current.add(n.id));
+        for (const n of fresh) {
+            if (!lastSeenRef.current || n.created_at > lastSeenRef.current.created_at) lastSeenRef.current = n;
+        }
+        setNotifications(prev => [...fresh, ...prev].sort((a, b) => b.created_at.localeCompare(a.created_at)));
+        setUnreadCount(prev => prev + fresh.filter(n => !n.is_read).length);
+    }, []);
 
     // Fetch initial notifications from REST API
     const fetchNotifications = useCallback(async () => {
@@ -41,7 +81,10 @@ export function useNotifications(token: string | null) {
             ]);
             if (notifRes.ok) {
                 const data = await notifRes.json();
-                setNotifications(data.items || []);
+                const items: Notification[] = data.items || [];
+                seenIdsRef.current = new Set(items.map(n => n.id));
+                lastSeenRef.current = items[0] ?? null;
+                setNotifications(items);
             }
             if (countRes.ok) {
                 const data = await countRes.json();
@@ -89,13 +132,25 @@ export function useNotifications(token: string | null) {
         if (!token) return;
 
         fetchNotifications();
+        let reconnecting = false;
+        let stopped = false;
 
         const connect = () => {
-            const ws = new WebSocket(`${WS_BASE}/ws/notifications?token=${token}`);
+            // On reconnect, ask the server for what we missed since the newest notification we have
+            const sinceId = reconnecting ? lastSeenRef.current?.id : undefined;
+            const resume = sinceId && !subscriptionKey ? `&since_id=${encodeURIComponent(sinceId)}` : '';
+            const ws = new WebSocket(`${WS_BASE}/ws/notifications?token=${token}${resume}`);
             wsRef.current = ws;
 
             ws.onopen = () => {
                 setConnected(true);
+                if (subscriptionKey) {
+                    // Resume inside the subscribe message so the replay uses our topics
+                    ws.send(JSON.stringify({ action: 'subscribe', ...JSON.parse(subscriptionKey), ...(sinceId ? { since_id: sinceId } : {}) }));
+                }
+                // Nothing seen yet to resume from → fall back to REST
+                if (reconnecting && !sinceId) fetchNotifications();
+                reconnecting = true;
                 // Keepalive ping every 30s
                 pingRef.current = setInterval(() => {
                     if (ws.readyState === WebSocket.OPEN) ws.send('ping');
@@ -105,20 +160,29 @@ export function useNotifications(token: string | null) {
             ws.onmessage = (event) => {
                 try {
                     const msg = JSON.parse(event.data);
-                    if (msg.event === 'new_notification') {
-                        const notif: Notification = {
-                            id: msg.id,
-                            type: msg.type,
-                            severity: msg.severity,
-                            title: msg.title,
-                            message: msg.message,
-                            entity_type: msg.entity_type,
-                            entity_id: msg.entity_id,
-                            is_read: false,
-                            created_at: msg.created_at,
-                        };
-                        setNotifications(prev => [notif, ...prev]);
-                        setUnreadCount(prev => prev + 1);
+                    if (msg.event === 'ping') {
+                        // Server heartbeat; replying keeps the socket from being reaped as idle
+                        ws.send('pong');
+                    } else if (msg.event === 'new_notification') {
+                        addNotifications([toNotification(msg)]);
+                    } else if (msg.event === 'notification_replay') {
+                        // Missed while disconnected, oldest first
+                        addNotifications((msg.items || []).map(toNotification).reverse());
+                    } else if (msg.event === 'notification_batch') {
+                        // Many notifications in one frame → one state update / re-render
+                        const items: any[] = msg.items || [];
+                        if (items.some(item => item.event === 'notification_summary')) {
+                            // A storm was collapsed into counts → load the real rows once from REST
+                            fetchNotifications();
+                            return;
+                        }
+                        addNotifications(items.map(toNotification).reverse());
+                    } else if (msg.event === 'unread_count') {
+                        // Authoritative badge, e.g. after reading in another tab
+                        setUnreadCount(msg.count ?? 0);
+                    } else if (msg.event === 'resync') {
+                        // Server dropped frames we were too slow to read → reload from REST
+                        fetchNotifications();
                     }
                 } catch { /* ignore parse errors */ }
             };
@@ -126,8 +190,9 @@ export function useNotifications(token: string | null) {
             ws.onclose = () => {
                 setConnected(false);
                 if (pingRef.current) clearInterval(pingRef.current);
-                // Reconnect after 5 seconds
-                setTimeout(connect, 5000);
+                // Reconnect after 5–10 seconds (unless the subscription changed or we unmounted);
+                // the jitter spreads out clients that all dropped at once
+                if (!stopped) setTimeout(connect, 5000 + Math.random() * 5000);
             };
 
             ws.onerror = () => ws.close();
@@ -136,10 +201,11 @@ export function useNotifications(token: string | null) {
         connect();
 
         return () => {
+            stopped = true;
             if (pingRef.current) clearInterval(pingRef.current);
             wsRef.current?.close();
         };
-    }, [token]);
+    }, [token, subscriptionKey]);
 
     return { notifications, unreadCount, connected, markRead, markAllRead, refetch: fetchNotifications };
 }
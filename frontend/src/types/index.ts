@@ -134,8 +134,9 @@ export interface DashboardKPIs {
 
 export interface PaginatedResponse<T> {
     items: T[];
-    total: number;
-    page: number;
+    total: number | null;        // null when requested with count=none
+    page: number | null;         // null on cursor pages
     page_size: number;
-    total_pages: number;
+    total_pages: number | null;
+    next_cursor: string | null;  // pass back as ?cursor= for the next page
 }